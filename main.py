@@ -1,7 +1,38 @@
 import os
+import argparse
+import asyncio
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
-#openai_api_key = os.getenv("OPENAI_API_KEY")
\ No newline at end of file
+#openai_api_key = os.getenv("OPENAI_API_KEY")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VoiceAssistant-400Kの質問と回答を翻訳する")
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="前回の実行で失敗した行（<file>.failed.json）だけを再翻訳する",
+    )
+    parser.add_argument(
+        "--files",
+        nargs="+",
+        default=["dataset_questions.json", "dataset_answers.json"],
+        help="--retry-failedで再翻訳する出力ファイル",
+    )
+    args = parser.parse_args()
+
+    from scripts.dataset.dataset_maker import Dataset
+
+    dataset = Dataset()
+    if args.retry_failed:
+        for filename in args.files:
+            asyncio.run(dataset.retry_failed_translations(filename))
+    else:
+        asyncio.run(dataset.translation())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+音声やSNACトークンなどの生成物を内容のハッシュで保存するストア。
+
+- objects/ab/cd/<sha256><拡張子>: 内容のSHA-256をファイル名にした生成物。同じ内容は1つのファイルにまとめられる
+- refs/ab/cd/<入力のハッシュ>.json: 入力（テキスト・話者・パラメータ）から生成物への対応
+
+書き込みは同じディレクトリの一時ファイルに書いてから os.replace で置き換えるため、
+複数のワーカーが同時に書き込んでも、途中まで書かれたファイルを読むことはない。
+同じ入力や同じ内容を同時に書き込んだ場合も、どちらかの結果（同じ内容）が残るだけで衝突しない。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Optional, Tuple
+
+_BLOCK_SIZE = 1 << 20
+
+
+def input_key(**inputs) -> str:
+    """
+    生成物の入力からキーを作る。
+
+    Args:
+        **inputs: テキスト、話者、パラメータなど、生成物を決める値（JSONに変換できること）
+
+    Returns:
+        str: 入力を正規化したJSONのSHA-256（16進数）
+    """
+    canonical = json.dumps(inputs, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """
+    内容のハッシュで生成物を保存し、入力のキーから参照できるようにするクラス。
+
+    使用例:
+        store = ArtifactStore("output/artifacts")
+        key = input_key(kind="speech", text=text, model=model)
+        path = store.get(key)
+        if path is None:
+            path = store.put_file(synthesized_path, key=key)
+    """
+
+    def __init__(self, root: str = "output/artifacts"):
+        """
+        Args:
+            root (str, optional): ストアのディレクトリ。デフォルトは "output/artifacts"
+        """
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.refs_dir = os.path.join(root, "refs")
+        self.tmp_dir = os.path.join(root, "tmp")
+        for directory in (self.objects_dir, self.refs_dir, self.tmp_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _fan_out(directory: str, digest: str) -> str:
+        return os.path.join(directory, digest[:2], digest[2:4])
+
+    def object_path(self, digest: str, ext: str = "") -> str:
+        """
+        内容のハッシュから生成物のパスを求める。
+
+        Args:
+            digest (str): 内容のSHA-256
+            ext (str, optional): 拡張子（".wav" など）
+
+        Returns:
+            str: 生成物のパス
+        """
+        return os.path.join(self._fan_out(self.objects_dir, digest), digest + ext)
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self._fan_out(self.refs_dir, key), key + ".json")
+
+    def _atomic_write(self, path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def temp_path(self, suffix: str = "") -> str:
+        """
+        生成物を書き出すための一時ファイルのパスを作る。put_file(..., move=True) で取り込むこと。
+
+        Args:
+            suffix (str, optional): 拡張子
+
+        Returns:
+            str: ストア内の一時ファイルのパス（他のワーカーと重ならない）
+        """
+        fd, path = tempfile.mkstemp(dir=self.tmp_dir, suffix=suffix)
+        os.close(fd)
+        return path
+
+    def put_bytes(self, data: bytes, ext: str = "", key: Optional[str] = None, metadata: Optional[dict] = None) -> str:
+        """
+        生成物を保存する。同じ内容が既にあれば書き込まない。
+
+        Args:
+            data (bytes): 生成物の内容
+            ext (str, optional): 拡張子
+            key (str, optional): 指定した場合、このキーから生成物を参照できるようにする
+            metadata (dict, optional): 参照に一緒に記録する情報
+
+        Returns:
+            str: 生成物のパス
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest, ext)
+        if not os.path.exists(path):
+            self._atomic_write(path, data)
+        if key is not None:
+            self.link(key, digest, ext, metadata)
+        return path
+
+    def put_file(
+        self, src_path: str, ext: Optional[str] = None, key: Optional[str] = None, metadata: Optional[dict] = None,
+        move: bool = False,
+    ) -> str:
+        """
+        ファイルを生成物として保存する。同じ内容が既にあれば書き込まない。
+
+        Args:
+            src_path (str): 保存するファイル
+            ext (str, optional): 拡張子。デフォルトはsrc_pathの拡張子
+            key (str, optional): 指定した場合、このキーから生成物を参照できるようにする
+            metadata (dict, optional): 参照に一緒に記録する情報
+            move (bool, optional): Trueの場合、src_pathをストアに移動する（同じファイルシステムであればコピーしない）
+
+        Returns:
+            str: 生成物のパス
+        """
+        if ext is None:
+            ext = os.path.splitext(src_path)[1]
+        digest, _ = self._hash_file(src_path)
+        path = self.object_path(digest, ext)
+
+        if os.path.exists(path):
+            if move:
+                os.remove(src_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if move:
+                os.replace(src_path, path)
+            else:
+                tmp_path = self.temp_path(ext)
+                shutil.copyfile(src_path, tmp_path)
+                os.replace(tmp_path, path)
+
+        if key is not None:
+            self.link(key, digest, ext, metadata)
+        return path
+
+    @staticmethod
+    def _hash_file(path: str) -> Tuple[str, int]:
+        sha256 = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_BLOCK_SIZE), b""):
+                sha256.update(block)
+                size += len(block)
+        return sha256.hexdigest(), size
+
+    def link(self, key: str, digest: str, ext: str = "", metadata: Optional[dict] = None):
+        """
+        入力のキーから生成物への参照を記録する。
+
+        Args:
+            key (str): 入力のキー（input_keyの結果）
+            digest (str): 生成物の内容のSHA-256
+            ext (str, optional): 生成物の拡張子
+            metadata (dict, optional): 一緒に記録する情報
+        """
+        ref = {"digest": digest, "ext": ext, "metadata": metadata or {}}
+        self._atomic_write(self._ref_path(key), json.dumps(ref, ensure_ascii=False).encode("utf-8"))
+
+    def resolve(self, key: str) -> Optional[dict]:
+        """
+        入力のキーの参照を読み込む。
+
+        Args:
+            key (str): 入力のキー
+
+        Returns:
+            dict: "digest", "ext", "metadata", "path"。参照または生成物がなければNone
+        """
+        try:
+            with open(self._ref_path(key), "r", encoding="utf-8") as f:
+                ref = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        ref["path"] = self.object_path(ref["digest"], ref["ext"])
+        if not os.path.exists(ref["path"]):
+            return None
+        return ref
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        入力のキーに対応する生成物のパスを返す。
+
+        Args:
+            key (str): 入力のキー
+
+        Returns:
+            str: 生成物のパス。まだ生成されていなければNone
+        """
+        ref = self.resolve(key)
+        return ref["path"] if ref else None
+
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        """
+        入力のキーに対応する生成物の内容を返す。
+
+        Args:
+            key (str): 入力のキー
+
+        Returns:
+            bytes: 生成物の内容。まだ生成されていなければNone
+        """
+        path = self.get(key)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
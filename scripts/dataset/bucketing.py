@@ -0,0 +1,163 @@
+"""
+口語に変換したテキストの文字数から音声の長さを見積もり、長さの近いものをまとめるモジュール。
+
+データセットの順序のままでは短い回答と長い回答が混ざるため、まとめてSNACエンコードするとパディングが増え、
+並列に音声合成すると終わる時間がばらつく。ここでは見積もった長さでバケットに分け、
+音声合成の送信順序とSNACエンコードのバッチに使う。各項目は元の番号を持つため、結果は元の順序に戻せる。
+"""
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Sequence
+
+# 1文字あたりの秒数の目安（品質チェックの範囲 0.05〜0.35 秒の中ほど）
+DEFAULT_SEC_PER_CHAR = 0.15
+# バケットの境界（秒）。この値以下の長さのバケットに入る
+DEFAULT_BOUNDARIES = (2.0, 4.0, 8.0, 16.0, 32.0)
+
+
+def count_spoken_chars(text: Optional[str]) -> int:
+    """
+    読み上げる文字数を数える。品質チェック（AudioQualityGate）と同じく空白を除いて数える。
+
+    Args:
+        text (str): 口語に変換したテキスト。Noneの場合は0
+
+    Returns:
+        int: 空白を除いた文字数
+    """
+    return len("".join((text or "").split()))
+
+
+def estimate_duration(text: Optional[str], sec_per_char: float = DEFAULT_SEC_PER_CHAR) -> float:
+    """
+    テキストを読み上げた音声の長さを見積もる。
+
+    Args:
+        text (str): 口語に変換したテキスト
+        sec_per_char (float, optional): 1文字あたりの秒数。デフォルトは0.15
+
+    Returns:
+        float: 見積もった長さ（秒）
+    """
+    return count_spoken_chars(text) * sec_per_char
+
+
+@dataclass
+class BucketPlan:
+    """
+    長さのバケットに分けた項目の順序
+
+    Attributes:
+        durations (List[float]): 元の順序の、各項目の見積もった長さ（秒）
+        buckets (List[List[int]]): 各バケットの項目の元の番号（長いバケットから順に、バケット内も長い順）
+        bucket_of (List[int]): 元の順序の、各項目のバケットの番号（bucketsの位置）
+    """
+    durations: List[float]
+    buckets: List[List[int]]
+    bucket_of: List[int] = field(default_factory=list)
+
+    @property
+    def order(self) -> List[int]:
+        """バケットの順に並べた項目の元の番号"""
+        return [index for bucket in self.buckets for index in bucket]
+
+    def restore(self, values: Sequence) -> list:
+        """
+        orderの順に並んだ値を、元の順序に戻す。
+
+        Args:
+            values (Sequence): orderと同じ順序の値
+
+        Returns:
+            list: 元の順序の値
+        """
+        order = self.order
+        if len(values) != len(order):
+            raise ValueError("valuesの数が項目の数と一致しません。")
+        restored = [None] * len(self.durations)
+        for index, value in zip(order, values):
+            restored[index] = value
+        return restored
+
+    def batches(self, max_batch_size: int, max_batch_seconds: Optional[float] = None) -> Iterator[List[int]]:
+        """
+        同じバケットの項目をバッチに分ける。バッチはバケットをまたがない。
+
+        Args:
+            max_batch_size (int): 1つのバッチの最大の項目数
+            max_batch_seconds (float, optional): 1つのバッチのパディング込みの長さ
+                （最も長い項目の長さ x 項目数）の上限（秒）。デフォルトは制限なし
+
+        Yields:
+            List[int]: バッチの項目の元の番号
+        """
+        for bucket in self.buckets:
+            batch = []
+            for index in bucket:
+                # バケット内は長い順のため、バッチの最初の項目が最も長い
+                longest = self.durations[batch[0]] if batch else self.durations[index]
+                too_long = max_batch_seconds is not None and longest * (len(batch) + 1) > max_batch_seconds
+                if batch and (len(batch) >= max_batch_size or too_long):
+                    yield batch
+                    batch = []
+                batch.append(index)
+            if batch:
+                yield batch
+
+
+def bucket_by_length(
+    texts: Sequence[Optional[str]],
+    boundaries: Sequence[float] = DEFAULT_BOUNDARIES,
+    sec_per_char: float = DEFAULT_SEC_PER_CHAR,
+) -> BucketPlan:
+    """
+    テキストを見積もった音声の長さでバケットに分ける。
+
+    空のテキスト（翻訳に失敗した行など）は含めない。
+
+    Args:
+        texts (Sequence[Optional[str]]): 口語に変換したテキスト
+        boundaries (Sequence[float], optional): バケットの境界（秒）。最後の境界より長い項目は最後のバケットに入る
+        sec_per_char (float, optional): 1文字あたりの秒数。デフォルトは0.15
+
+    Returns:
+        BucketPlan: バケットに分けた項目の順序
+    """
+    boundaries = sorted(boundaries)
+    durations = [estimate_duration(text, sec_per_char) for text in texts]
+    by_bound: List[List[int]] = [[] for _ in range(len(boundaries) + 1)]
+    for index, (text, duration) in enumerate(zip(texts, durations)):
+        if not text:
+            continue
+        position = next((i for i, bound in enumerate(boundaries) if duration <= bound), len(boundaries))
+        by_bound[position].append(index)
+
+    # 長いバケットから送る（最後に長い項目だけが残って待たされないように）
+    buckets = []
+    bucket_of = [-1] * len(texts)
+    for members in reversed(by_bound):
+        if not members:
+            continue
+        members.sort(key=lambda i: durations[i], reverse=True)
+        for index in members:
+            bucket_of[index] = len(buckets)
+        buckets.append(members)
+    return BucketPlan(durations, buckets, bucket_of)
+
+
+def padding_ratio(durations: Sequence[float], batches: Sequence[Sequence[int]]) -> float:
+    """
+    バッチにまとめたときのパディングの割合を見積もる。
+
+    Args:
+        durations (Sequence[float]): 各項目の長さ
+        batches (Sequence[Sequence[int]]): バッチの項目の番号
+
+    Returns:
+        float: パディング込みの長さの合計に対する、パディングの長さの割合
+    """
+    padded = sum(max(durations[i] for i in batch) * len(batch) for batch in batches if batch)
+    if not padded:
+        return 0.0
+    actual = sum(durations[i] for batch in batches for i in batch)
+    return 1 - actual / padded
+
@@ -1,78 +1,264 @@
 from scripts.translation.translator import Translator, JSONWriter
 from scripts.snac.snac_module import SNACEncoder, SNACDecoder
+from scripts.snac.encode_pool import SNACEncodePool
 from scripts.synthesis.style_bert_vits2_infer import VoiceSynthesizer
-from scripts.utils.HF_dataset import DatasetModule
+from scripts.synthesis.quality import AudioQualityGate, QCThresholds
+from scripts.utils.HF_dataset import TEXT_COLUMNS, DatasetModule
+from scripts.utils.json_stream import count_records, iter_json_batches, iter_json_records
+from scripts.dataset.artifact_store import ArtifactStore, input_key
+from scripts.dataset.task_queue import TaskQueue, default_worker_id
+from scripts.dataset.ita_corpus import ITA_CORPUS_DIR, load_ita_corpus
+from scripts.dataset.bucketing import bucket_by_length
 
 import os
+import time
 import asyncio
+from collections import deque
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
 
+# 翻訳に失敗した行を記録するファイルの接尾辞（<出力ファイル>.failed.json）
+FAILED_SUFFIX = ".failed.json"
+# 話者を指定しない場合に使う音声合成のモデル
+DEFAULT_VOICE = "jvnv-M2-jp"
+
 class Dataset:
 
-    def __init__(self) -> None:
+    def __init__(self, qc_thresholds: Optional[QCThresholds] = None, artifact_dir: str = "output/artifacts") -> None:
         # 環境変数の読み込み
         load_dotenv()
         api_key = os.getenv("OPENAI_API_KEY")
 
         #必要なインスタンスの初期化
-        self.translator = Translator(api_key)
+        # OPENAI_TPM_LIMITを設定すると、翻訳のバッチを件数ではなくトークン数で分割する
+        tokens_per_minute = os.getenv("OPENAI_TPM_LIMIT")
+        # OPENAI_HEDGE_PERCENTILE（例: 0.95）を設定すると、このパーセンタイルより遅いリクエストをヘッジする
+        hedge_percentile = os.getenv("OPENAI_HEDGE_PERCENTILE")
+        self.translator = Translator(
+            api_key,
+            tokens_per_minute=int(tokens_per_minute) if tokens_per_minute else None,
+            hedge_percentile=float(hedge_percentile) if hedge_percentile else None,
+            hedge_budget=float(os.getenv("OPENAI_HEDGE_BUDGET", "0.05")),
+        )
         self.jsonwriter = JSONWriter()
         self.dataset_module = DatasetModule()
         self.synthesizer = VoiceSynthesizer()
         self.encoder = SNACEncoder()
         self.decoder = SNACDecoder()
+        self.quality_gate = AudioQualityGate(qc_thresholds)
+        # 音声とSNACトークンは入力のハッシュで保存し、同じ入力は再生成しない
+        self.artifact_store = ArtifactStore(artifact_dir)
+
+    def _artifact_key(self, kind: str, text: str, model: str) -> str:
+        """
+        生成物のキーを作る。出力に影響する値（テキスト・話者・合成の設定）をすべて含める
+
+        SNACトークンのキーには、エンコーダーの設定（SNACモデル・実行方式・量子化）も含める
+        """
+        inputs = {"kind": kind, "text": text, "model": model, "silent_interval_ms": self.synthesizer.silent_interval_ms}
+        if kind == "snac":
+            inputs["snac_model"] = self.encoder.model_name
+            inputs["snac_backend"] = self.encoder.backend
+            inputs["snac_quantize"] = self.encoder.quantize
+        return input_key(**inputs)
+
+    async def _synthesize_speech_artifact(
+        self, text: str, model: str, key: str, endpoint: str = None, segments: Optional[List[str]] = None
+    ) -> str:
+        """
+        音声を一時ファイルに合成し、ストアに取り込んでパスを返す
+
+        segments = VoiceSynthesizer.prepare_segmentsで分割・正規化済みのテキスト（複数の話者で使い回す場合）
+        """
+        tmp_path = self.artifact_store.temp_path(".wav")
+        try:
+            # テキストを音声合成する（リクエストはブロッキングなのでスレッドで実行）
+            await asyncio.to_thread(
+                self.synthesizer.synthesize, text, tmp_path, model, endpoint=endpoint, segments=segments
+            )
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        metadata = {"text": text, "model": model}
+        return await asyncio.to_thread(self.artifact_store.put_file, tmp_path, ".wav", key, metadata, True)
+
+    async def _translate_rows(self, items: List[dict]) -> Tuple[List[Optional[str]], List[dict]]:
+        """
+        行ごとに、失敗した段階（"en2ja" または "text2spoken_with_filler"）から翻訳する
+
+        items = {"index", "row_id", "stage", "input"} の辞書のリスト。inputはその段階に渡すテキスト
+
+        戻り値は口語に変換したテキストのリスト（失敗した行はNone）と、失敗した行の記録のリスト。
+        記録には失敗した段階、その段階の入力、例外のクラス名とメッセージ、試行回数が含まれる
+        """
+        en2ja_inputs = [item["input"] if item["stage"] == "en2ja" else None for item in items]
+        translated, en2ja_errors = await self.translator.en2ja_translator.batch_translate_with_errors(
+            en2ja_inputs, max_size=10
+        )
+        # 英日翻訳に失敗した行はNoneのまま次の段階に渡され、送信されない
+        spoken_inputs = [
+            translated[i] if item["stage"] == "en2ja" else item["input"] for i, item in enumerate(items)
+        ]
+        spoken, spoken_errors = await self.translator.text2spoken_with_filler_translator.batch_translate_with_errors(
+            spoken_inputs, max_size=10
+        )
+
+        failures = []
+        for i, item in enumerate(items):
+            if en2ja_errors[i] is not None:
+                stage, text, error = "en2ja", item["input"], en2ja_errors[i]
+            elif spoken_errors[i] is not None:
+                stage, text, error = "text2spoken_with_filler", spoken_inputs[i], spoken_errors[i]
+            else:
+                continue
+            failures.append({
+                "index": item["index"],
+                "row_id": item["row_id"],
+                "stage": stage,
+                "input": text,
+                "error": type(error).__name__,
+                "message": str(error),
+                "attempts": item.get("attempts", 0) + 1,
+            })
+        return spoken, failures
 
-    async def translate_texts(self, texts, filename):
+    async def translate_texts(self, texts, filename, row_ids=None):
         """
         テキストの翻訳を行う共通メソッド
+
+        失敗した行は出力ファイルにnullとして書き込み、<filename>.failed.json に元の行番号・失敗した段階・
+        例外のクラスを記録する。失敗した行は実行の最後に1度だけ自動で再翻訳し、
+        それでも失敗した行は retry_failed_translations で後から再翻訳できる
+
+        row_ids = 各テキストの元のデータセットの行番号。デフォルトはtextsの位置
         """
-        translated_text = await self.translator.batch_translate_en2ja(texts, max_size=10)
-        #await asyncio.sleep(5)
-        speech_text = await self.translator.batch_translate_text2spoken_with_filler(translated_text, max_size=10)
-        #await asyncio.sleep(10)
+        # 出力ファイルには追記するため、既存の行数を出力ファイル内の位置のオフセットにする
+        offset = count_records(filename, use_index=False) if os.path.exists(filename) else 0
+        row_ids = list(row_ids) if row_ids is not None else list(range(len(texts)))
+        items = [
+            {"index": offset + i, "row_id": row_id, "stage": "en2ja", "input": text}
+            for i, (text, row_id) in enumerate(zip(texts, row_ids))
+        ]
+        speech_text, failures = await self._translate_rows(items)
         results = JSONWriter.write_to_json(speech_text, filename=filename)
+        JSONWriter.write_to_json(failures, filename=filename + FAILED_SUFFIX)
         print(f"{filename}の書き込みが完了しました。")
+        if failures:
+            print(f"{len(failures)}件の翻訳に失敗しました。--retry-failed で再翻訳できます: {filename + FAILED_SUFFIX}")
+        hedge_stats = self.translator.get_hedge_stats()
+        if hedge_stats:
+            print("翻訳のヘッジ:", hedge_stats)
         return results
 
+    async def retry_failed_translations(self, filename: str) -> List[dict]:
+        """
+        <filename>.failed.json に記録された行だけを、失敗した段階から再翻訳する
+
+        成功した行は出力ファイルの同じ位置に書き込み、失敗の記録から取り除く。
+        成功済みの行は再翻訳しない
+
+        filename = translate_textsで書き込んだJSONファイル
+
+        戻り値はまだ失敗している行の記録のリスト
+        """
+        failed_filename = filename + FAILED_SUFFIX
+        if not os.path.exists(failed_filename):
+            print(f"失敗した行の記録がありません: {failed_filename}")
+            return []
+        records = self.dataset_module.load_text_from_json(failed_filename)
+        if not records:
+            return []
+
+        print(f"{filename}の{len(records)}件を再翻訳します。")
+        speech_text, failures = await self._translate_rows(records)
+
+        data = self.dataset_module.load_text_from_json(filename)
+        for record, text in zip(records, speech_text):
+            if text is not None:
+                data[record["index"]] = text
+        JSONWriter.replace_json(data, filename)
+        JSONWriter.replace_json(failures, failed_filename)
+        print(f"{len(records) - len(failures)}件の再翻訳に成功し、{len(failures)}件が失敗しました。")
+        return failures
+
     async def translation(self):
         """
         データセットの "question" と "answer を作成します
         """
 
         # データセットの読み込み
-        dataset = self.dataset_module.load_dataset("gpt-omni/VoiceAssistant-400k")
+        # 翻訳に必要なテキストの列だけを読み込む（音声の列は読み込まない）
+        dataset = self.dataset_module.load_dataset("gpt-omni/VoiceAssistant-400k", columns=TEXT_COLUMNS)
         filter_dataset = self.dataset_module.filter_dataset(dataset, "identity")
 
         async def translate_question():
             #データセットの読み込む
             questions = self.dataset_module.extract_questions(filter_dataset[1200:1500])
 
-            return await self.translate_texts(questions, filename="dataset_questions.json")
+            return await self.translate_texts(questions, filename="dataset_questions.json", row_ids=range(1200, 1500))
 
         async def translate_answer():
             #データセットの読み込む
             answers = self.dataset_module.extract_answers(filter_dataset[1200:1500])
 
-            return await self.translate_texts(answers, filename="dataset_answers.json")
+            return await self.translate_texts(answers, filename="dataset_answers.json", row_ids=range(1200, 1500))
     
         await translate_question()
         print("質問テキストを翻訳しました")
         await translate_answer()
         print("回答テキストを翻訳しました")
         
-    async def audio_maker(self, filename):
-        async def synthesize_audio(text, index, audio_paths):
+    async def audio_maker(
+        self,
+        filename,
+        is_random: bool = False,
+        concurrency: int = None,
+        start: int = 0,
+        stop: Optional[int] = None,
+        window_size: int = 1000,
+    ):
+        """
+        音声合成を行う
+
+        is_random = Trueの場合、model_list.jsonの話者を偏りなく割り当てる
+        concurrency = 1つのサーバーに同時に処理させるテキスト数の上限。
+                      実際のリクエスト数はVoiceSynthesizerがレイテンシに応じて自動調整する
+        start, stop = 音声合成する行の範囲。start行目へはインデックスでシークする（複数のワーカーで分担する場合に使用）
+        window_size = 一度に読み込んでジョブにするテキスト数。ファイル全体を一度にタスクにしない
+        """
+        if concurrency is None:
+            concurrency = self.synthesizer.max_concurrency
+
+        # 実行中の合成（同じテキストと話者の合成は1度だけ行う）
+        in_flight = {}
+
+        async def synthesize_audio(job, audio_paths, offset):
             """
-            音声合成を行う非同期関数
+            音声合成を行う非同期関数。既に同じ入力の音声があれば合成しない
             """
-            output_dir = "output"  # 保存先のディレクトリ名
-            os.makedirs(output_dir, exist_ok=True)  # ディレクトリが存在しない場合は作成
-
-            save_path = os.path.join(output_dir, f"answer_output_{index}.wav")  # 保存先のパスを修正
-            # テキストを音声合成する
-            self.synthesizer.synthesize(text, save_path,  "jvnv-M2-jp")
+            key = self._artifact_key("speech", job.text, job.model)
+            save_path = self.artifact_store.get(key)
+            if save_path is None:
+                if key not in in_flight:
+                    in_flight[key] = asyncio.ensure_future(
+                        self._synthesize_speech_artifact(job.text, job.model, key, endpoint=job.endpoint)
+                    )
+                save_path = await in_flight[key]
+            audio_paths[job.index - offset] = save_path
             return save_path  # 保存先のパスを返す
 
+        async def run_endpoint(jobs, audio_paths, offset):
+            """
+            1つのサーバーに割り当てられたジョブを、計画された順序で実行する
+            """
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run(job):
+                async with semaphore:
+                    return await synthesize_audio(job, audio_paths, offset)
+
+            return await asyncio.gather(*(run(job) for job in jobs))
+
         async def make_audio(filename: str):
             """
             音声合成を行うメイン関数
@@ -84,25 +270,435 @@ class Dataset:
             else:
                 print(f"ファイルが見つかりました: {filename}")
 
-            # 音声ファイルのパスを格納するリスト
+            # 音声ファイルのパスを格納するリスト（元の順序を保つ）
             audio_paths = []
+            scheduler = self.synthesizer.create_scheduler()
 
-            # テキストを読み込む
-            text_list = self.dataset_module.load_text_from_json(filename)
+            # テキストをwindow_size行ずつ読み込み、ウィンドウごとに合成する
+            window_start = start
+            for text_list in iter_json_batches(filename, window_size, start, stop):
+                audio_paths.extend([None] * len(text_list))
 
-            # 非同期タスクを作成
-            tasks = [synthesize_audio(text, i, audio_paths) for i, text in enumerate(text_list)]
-            
-            # タスクを並列に実行
-            results = await asyncio.gather(*tasks)
+                # 話者とサーバーを事前に割り当て、同じモデルのリクエストをまとめて送る
+                # 見積もった音声の長さの長い順に送り、同時に処理される音声の長さを揃える
+                durations = bucket_by_length(text_list).durations
+                jobs = scheduler.plan(
+                    text_list, model=None if is_random else DEFAULT_VOICE, is_random=is_random, lengths=durations
+                )
+                # 翻訳に失敗した行（null）は合成せず、パスもnullのままにする
+                jobs = [job for job in jobs if job.text]
+                for job in jobs:
+                    job.index += window_start
+                queues = scheduler.group_by_endpoint(jobs)
+
+                # サーバーごとに並列に実行
+                await asyncio.gather(
+                    *(run_endpoint(queue, audio_paths, offset=start) for queue in queues.values())
+                )
+                window_start += len(text_list)
+
+            print("サーバーごとの同時実行数とレイテンシ:", self.synthesizer.get_concurrency_stats())
 
             #音声ファイルのパスをリストとしてJSONファイルに出力
             self.jsonwriter.write_to_json(audio_paths, "audio_path.json")
 
-            return results
+            return audio_paths
             
          # make_audioを呼び出す
-        await make_audio(filename)
+        return await make_audio(filename)
+
+    async def ita_maker(
+        self,
+        corpus_dir: str = ITA_CORPUS_DIR,
+        output_dir: str = "output/ita",
+        subsets=("emotion", "recitation"),
+        models: Optional[List[str]] = None,
+        concurrency: int = None,
+        limit: Optional[int] = None,
+    ) -> dict:
+        """
+        ITAコーパスの各文を、model_list.jsonのすべての話者で音声合成する
+
+        テキストの分割と正規化は1文につき1度だけ行い、すべての話者で使い回す。
+        ジョブは話者ごとにまとめてサーバーに送り（ModelAffinityScheduler.plan_fan_out）、1度の実行ですべての話者を合成する。
+        音声はストアに保存するため、既に合成した文と話者の組み合わせは合成しない。
+
+        出力は1列を1つのJSON配列にした形式（dataset_questions.jsonやaudio_path.jsonと同じ）で、
+        output_dirに id.json, subset.json, text.json, yomi.json, speaker.json, audio_path.json を書き出す。
+        行は文の順、同じ文の中では話者の順に並ぶ。合成に失敗した行のaudio_pathはnull
+
+        corpus_dir = ITAコーパスをcloneしたディレクトリ
+        output_dir = 列のJSONファイルを書き出すディレクトリ
+        subsets = 読み込むサブセット（"emotion", "recitation"）
+        models = 使用する話者。デフォルトはmodel_list.jsonのすべての話者
+        concurrency = 1つのサーバーに同時に処理させるテキスト数の上限
+        limit = 指定した場合、先頭のlimit文だけを合成する
+
+        戻り値は列の名前と値のリストの辞書
+        """
+        if concurrency is None:
+            concurrency = self.synthesizer.max_concurrency
+        sentences = load_ita_corpus(corpus_dir, subsets)[:limit]
+        models = list(models) if models else self.synthesizer.get_usable_models()
+        texts = [sentence.text for sentence in sentences]
+
+        # テキストの分割と正規化は1文につき1度だけ行う
+        segments = [self.synthesizer.prepare_segments(text) for text in texts]
+
+        scheduler = self.synthesizer.create_scheduler()
+        jobs = scheduler.plan_fan_out(texts, models)
+        model_index = {model: i for i, model in enumerate(models)}
+        audio_paths = [None] * (len(sentences) * len(models))
+
+        async def synthesize_audio(job):
+            key = self._artifact_key("speech", job.text, job.model)
+            save_path = self.artifact_store.get(key)
+            if save_path is None:
+                save_path = await self._synthesize_speech_artifact(
+                    job.text, job.model, key, endpoint=job.endpoint, segments=segments[job.index]
+                )
+            return save_path
+
+        async def run_endpoint(queue):
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run(job):
+                async with semaphore:
+                    row = job.index * len(models) + model_index[job.model]
+                    try:
+                        audio_paths[row] = await synthesize_audio(job)
+                    except Exception as e:
+                        print(f"{sentences[job.index].id}（{job.model}）の音声合成に失敗しました: {e}")
+
+            await asyncio.gather(*(run(job) for job in queue))
+
+        await asyncio.gather(*(run_endpoint(queue) for queue in scheduler.group_by_endpoint(jobs).values()))
+        print("サーバーごとの同時実行数とレイテンシ:", self.synthesizer.get_concurrency_stats())
+
+        columns = {
+            "id": [sentence.id for sentence in sentences for _ in models],
+            "subset": [sentence.subset for sentence in sentences for _ in models],
+            "text": [sentence.text for sentence in sentences for _ in models],
+            "yomi": [sentence.yomi for sentence in sentences for _ in models],
+            "speaker": [model for _ in sentences for model in models],
+            "audio_path": audio_paths,
+        }
+        os.makedirs(output_dir, exist_ok=True)
+        for name, values in columns.items():
+            JSONWriter.replace_json(values, os.path.join(output_dir, f"{name}.json"))
+        print(f"{len(sentences)}文 x {len(models)}話者の音声を合成しました: {output_dir}")
+        return columns
+
+    async def snac_maker(
+        self,
+        filename: str,
+        output_filename: str = "answer_snac.json",
+        save_wav: bool = False,
+        manifest_filename: str = "answer_manifest.json",
+        max_retries: int = 2,
+        encode_workers: int = 0,
+        encode_batch_size: int = 0,
+        model: str = DEFAULT_VOICE,
+    ):
+        """
+        音声合成の結果をファイルに書き出さず、メモリ上でSNACエンコーダーに渡して
+        データセットの "answer_snac" を作成する
+
+        テキストは口語の文字数から見積もった音声の長さでバケットに分け、長いバケットから順に合成する。
+        結果は元の行の順序で書き出す。
+
+        エンコードの前に品質チェック（無音・クリップ・文字数に対する長さ）を行い、
+        不合格の音声はキューの末尾に戻して再合成する。各音声の統計量はマニフェストに記録する。
+        SNACトークンはテキストと話者のハッシュでストアに保存し、同じ入力の行は合成せずにストアから読み込む。
+
+        filename = 音声合成したい日本語テキストのJSONファイル
+        output_filename = SNACトークンを書き込むJSONファイル（不合格のままの行はnull）
+        save_wav = Trueの場合、確認用にoutput/answer_output_{i}.wavも書き出す
+        manifest_filename = 品質チェックの結果を書き込むJSONファイル
+        max_retries = 品質チェックに不合格だった場合に再合成する最大回数
+        encode_workers = 1以上の場合、SNACエンコードをこの数のワーカープロセスで行い、次の音声の合成と並行して進める。
+                         同時に進めるエンコードはencode_workers個（0の場合は1個）までで、空きがなければ合成を待つ
+        encode_batch_size = 2以上の場合、同じバケットの音声をこの数ずつまとめてSNACEncoder.encode_batchでエンコードする。
+                            長さの近い音声だけをまとめるため、パディングが少ない（encode_workersとは同時に使えない）
+        model = 音声合成に使う話者のモデル
+        """
+        if encode_workers > 0 and encode_batch_size > 1:
+            raise ValueError("encode_workersとencode_batch_sizeは同時に指定できません。")
+        if save_wav:
+            os.makedirs("output", exist_ok=True)
+
+        pool = None
+        if encode_workers > 0:
+            # ワーカーでもself.encoderと同じモデルを使う（トークンのキャッシュのキーと一致させるため）
+            pool = SNACEncodePool(
+                num_workers=encode_workers,
+                model_name=self.encoder.model_name,
+                backend=self.encoder.backend,
+                export_dir=self.encoder.export_dir,
+                quantize=self.encoder.quantize,
+            )
+        # エンコード待ちの音声がメモリに溜まらないよう、同時に進めるエンコードの数を制限する
+        # （プロセス内でエンコードする場合は、torchのスレッドを取り合わないよう1つずつ）
+        encode_slots = asyncio.Semaphore(encode_workers if pool is not None else 1)
+        pending = set()
+
+        def drain_finished():
+            """
+            終わったエンコードを取り除く（失敗していれば例外を送出する）
+            """
+            for task in [task for task in pending if task.done()]:
+                pending.discard(task)
+                task.result()
+
+        async def submit(coro):
+            """
+            エンコードの空きを待ってからタスクを作る
+            """
+            try:
+                await encode_slots.acquire()
+            except BaseException:
+                coro.close()
+                raise
+
+            async def run():
+                try:
+                    await coro
+                finally:
+                    encode_slots.release()
+
+            pending.add(asyncio.create_task(run()))
+            drain_finished()
+
+        async def encode(i, waveform, sample_rate):
+            """
+            合成した音声をエンコードする（イベントループはブロックしない）
+            """
+            if pool is not None:
+                tokens = await pool.encode(waveform, sample_rate)
+            else:
+                tokens = await asyncio.to_thread(self.encoder.encode_waveform, waveform, sample_rate)
+            store_tokens(i, tokens)
+
+        async def encode_batch(items):
+            """
+            同じバケットの音声をまとめてエンコードし、元の行の位置に書き込む
+            """
+            codes = await asyncio.to_thread(
+                self.encoder.encode_batch, [(waveform, sample_rate) for _, waveform, sample_rate in items], len(items)
+            )
+            for (i, _, _), tokens in zip(items, codes):
+                store_tokens(i, tokens)
+
+        def store_tokens(i, tokens):
+            snac_tokens_list[i] = self.encoder.make_snac_tokens(tokens)
+            key = self._artifact_key("snac", text_list[i], model)
+            self.artifact_store.put_bytes(snac_tokens_list[i].encode("utf-8"), ".txt", key, {"text": text_list[i]})
+
+        async def flush_batch():
+            if batch:
+                items = list(batch)
+                batch.clear()
+                await submit(encode_batch(items))
+
+        text_list = self.dataset_module.load_text_from_json(filename)
+
+        # 見積もった音声の長さでバケットに分ける（nullの行は含めない）
+        buckets = bucket_by_length(text_list)
+        snac_tokens_list = [None] * len(text_list)
+        manifest = [
+            {
+                "index": i, "text": text, "attempts": 0, "passed": False, "cached": False, "qc": None,
+                "bucket": buckets.bucket_of[i], "estimated_seconds": round(buckets.durations[i], 2),
+            }
+            for i, text in enumerate(text_list)
+        ]
+
+        # 長いバケットから順に、同じバケットの音声を続けて合成する
+        queue = deque(buckets.order)
+        batch = []
+        try:
+            while queue:
+                i = queue.popleft()
+                entry = manifest[i]
+
+                # 同じ入力のSNACトークンが既にあれば合成もエンコードもしない
+                cached = self.artifact_store.read_bytes(self._artifact_key("snac", text_list[i], model))
+                if cached is not None:
+                    snac_tokens_list[i] = cached.decode("utf-8")
+                    entry["passed"] = True
+                    entry["cached"] = True
+                    continue
+
+                entry["attempts"] += 1
+                save_path = os.path.join("output", f"answer_output_{i}.wav") if save_wav else None
+
+                # 合成したPCMをそのままエンコーダーに渡す
+                waveform, sample_rate = await asyncio.to_thread(
+                    self.synthesizer.synthesize_to_array, text_list[i], model, save_path=save_path
+                )
+
+                # 品質チェックに不合格の場合はエンコードせず、再合成のためにキューへ戻す
+                passed, stats = self.quality_gate.check(waveform, sample_rate, text_list[i])
+                entry["passed"] = passed
+                entry["qc"] = stats
+                if not passed:
+                    print(f"{i}番目の音声が品質チェックに不合格でした: {stats['failures']}")
+                    if entry["attempts"] <= max_retries:
+                        queue.append(i)
+                    continue
+
+                # エンコードに空きがあれば、完了を待たずに次の音声の合成に進む
+                if encode_batch_size > 1:
+                    # バケットが変わったら、前のバケットの音声を先にエンコードする
+                    if batch and buckets.bucket_of[batch[0][0]] != buckets.bucket_of[i]:
+                        await flush_batch()
+                    batch.append((i, waveform, sample_rate))
+                    if len(batch) >= encode_batch_size:
+                        await flush_batch()
+                else:
+                    await submit(encode(i, waveform, sample_rate))
+
+            await flush_batch()
+            await asyncio.gather(*pending)
+        finally:
+            if pool is not None:
+                pool.close()
+
+        self.jsonwriter.write_to_json(snac_tokens_list, output_filename)
+        self.jsonwriter.write_to_json(manifest, manifest_filename)
+
+        return snac_tokens_list
+
+    def enqueue_texts(
+        self,
+        queue: TaskQueue,
+        filename: str,
+        stage: str = "speech",
+        start: int = 0,
+        stop: Optional[int] = None,
+        priority: int = 0,
+    ) -> int:
+        """
+        JSONファイルのテキストを1行ずつタスクとしてキューに登録する。同じ行は二重に登録されない
+
+        queue = 登録先のキュー
+        filename = 音声合成したい日本語テキストのJSONファイル
+        stage = "speech"（音声を合成してストアに保存）または "snac"（合成・品質チェック・SNACエンコード）
+        start, stop = 登録する行の範囲
+        priority = ステージ内の優先度（大きいほど先に処理される）
+        """
+        items = (
+            (f"{filename}:{i}", {"filename": filename, "index": i, "text": text})
+            for i, text in enumerate(iter_json_records(filename, start, stop), start)
+            if text
+        )
+        return queue.enqueue_many(stage, items, priority)
+
+    async def _speech_task(self, payload: dict) -> str:
+        """
+        "speech" ステージのタスク。合成した音声のパスを返す
+        """
+        model = payload.get("model", DEFAULT_VOICE)
+        key = self._artifact_key("speech", payload["text"], model)
+        path = self.artifact_store.get(key)
+        if path is None:
+            path = await self._synthesize_speech_artifact(payload["text"], model, key)
+        return path
+
+    async def _snac_task(self, payload: dict) -> str:
+        """
+        "snac" ステージのタスク。品質チェックに合格した音声のSNACトークンを返す
+        """
+        text = payload["text"]
+        model = payload.get("model", DEFAULT_VOICE)
+        key = self._artifact_key("snac", text, model)
+        cached = self.artifact_store.read_bytes(key)
+        if cached is not None:
+            return cached.decode("utf-8")
+
+        waveform, sample_rate = await asyncio.to_thread(self.synthesizer.synthesize_to_array, text, model)
+        passed, stats = self.quality_gate.check(waveform, sample_rate, text)
+        if not passed:
+            # 失敗として記録し、キューから再配布させる
+            raise ValueError(f"品質チェックに不合格でした: {stats['failures']}")
+
+        tokens = await asyncio.to_thread(self.encoder.encode_waveform, waveform, sample_rate)
+        snac_tokens = self.encoder.make_snac_tokens(tokens)
+        self.artifact_store.put_bytes(snac_tokens.encode("utf-8"), ".txt", key, {"text": text})
+        return snac_tokens
+
+    async def queue_worker(
+        self,
+        queue: TaskQueue,
+        stages=("speech", "snac"),
+        worker_id: Optional[str] = None,
+        concurrency: int = 1,
+        idle_timeout: float = 30.0,
+        poll_interval: float = 1.0,
+    ) -> int:
+        """
+        キューからタスクを取り出して処理する。複数のプロセス・ホストで同じキューを使うと負荷が自動で分散される
+
+        処理中のタスクはハートビートでリースを延長する。プロセスが止まった場合、リースの期限が切れたタスクは
+        他のワーカーに再配布される。失敗したタスクはキューのmax_attemptsまで再配布される。
+
+        queue = 使用するキュー
+        stages = 処理するステージ（キューのステージごとの優先度の高いものから取り出す）
+        worker_id = ワーカーのID。デフォルトはホスト名とプロセスIDから作る
+        concurrency = このワーカーで同時に処理するタスクの数
+        idle_timeout = 取り出せるタスクがない状態がこの秒数続いたら終了する
+        poll_interval = タスクがないときに再確認する間隔（秒）
+
+        戻り値は完了したタスクの数
+        """
+        handlers = {"speech": self._speech_task, "snac": self._snac_task}
+        worker_id = worker_id or default_worker_id()
+        completed = 0
+
+        async def run():
+            nonlocal completed
+            idle_since = None
+            while True:
+                tasks = await asyncio.to_thread(queue.claim, worker_id, list(stages))
+                if not tasks:
+                    idle_since = idle_since or time.monotonic()
+                    if time.monotonic() - idle_since >= idle_timeout:
+                        return
+                    await asyncio.sleep(poll_interval)
+                    continue
+                idle_since = None
+
+                task = tasks[0]
+                with queue.keep_alive(task, worker_id):
+                    try:
+                        result = await handlers[task.stage](task.payload)
+                    except Exception as e:
+                        print(f"{task.stage}のタスク{task.key}に失敗しました: {e}")
+                        await asyncio.to_thread(queue.fail, task, worker_id, f"{type(e).__name__}: {e}")
+                        continue
+                if await asyncio.to_thread(queue.complete, task, worker_id, result):
+                    completed += 1
+
+        await asyncio.gather(*(run() for _ in range(concurrency)))
+        return completed
+
+    def write_queue_results(self, queue: TaskQueue, stage: str, filename: str, output_filename: str) -> list:
+        """
+        キューで処理した結果を、元のJSONファイルの行の順序で書き出す（未完了の行はnull）
+        既存のファイルには追記せず置き換えるため、途中で何度呼び出してもよい
+
+        queue = 使用したキュー
+        stage = 結果を書き出すステージ
+        filename = enqueue_textsで登録したJSONファイル
+        output_filename = 書き出すJSONファイル
+        """
+        results = [None] * count_records(filename)
+        prefix = f"{filename}:"
+        for key, result in queue.results(stage).items():
+            if key.startswith(prefix):
+                results[int(key[len(prefix):])] = result
+        self.jsonwriter.replace_json(results, output_filename)
+        return results
 
     def snac_encode(self):
         """
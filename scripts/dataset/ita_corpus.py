@@ -0,0 +1,116 @@
+"""
+ITAコーパス（https://github.com/mmorise/ita-corpus）の文章を読み込むモジュール。
+
+コーパスの書き起こしは1行に1文で、`<ID>:<漢字かな交じり文>,<読み（カタカナ）>` の形式になっている。
+
+    EMOTION100_001:えっ嘘でしょ。,エッウソデショ。
+    RECITATION324_001:女の子がキッキッ嬉しそう。,オンナノコガキッキッウレシソー。
+"""
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+ITA_CORPUS_DIR = "data/ITA_corpus/ref/ita-corpus"
+
+# サブセットの名前と書き起こしのファイル名
+TRANSCRIPT_FILES: Dict[str, str] = {
+    "emotion": "emotion_transcript_utf8.txt",
+    "recitation": "recitation_transcript_utf8.txt",
+}
+
+
+@dataclass
+class ITASentence:
+    """
+    ITAコーパスの1文
+
+    Attributes:
+        id (str): 文のID（例: "EMOTION100_001"）
+        text (str): 漢字かな交じり文
+        yomi (str): 読み（カタカナ）。書き起こしにない場合は空文字列
+        subset (str): サブセットの名前（"emotion" または "recitation"）
+    """
+    id: str
+    text: str
+    yomi: str
+    subset: str
+
+
+def parse_transcript_line(line: str, subset: str = "") -> Optional[ITASentence]:
+    """
+    書き起こしの1行をパースする。
+
+    文には読点（、）は含まれるが半角カンマは含まれないため、最後の半角カンマで文と読みを分ける。
+
+    Args:
+        line (str): `<ID>:<文>,<読み>` の形式の行
+        subset (str, optional): サブセットの名前
+
+    Returns:
+        Optional[ITASentence]: パースした文。空行の場合はNone
+
+    Raises:
+        ValueError: IDの区切り（:）がない場合
+    """
+    line = line.strip().lstrip("\ufeff")
+    if not line:
+        return None
+    sentence_id, sep, body = line.partition(":")
+    if not sep or not sentence_id:
+        raise ValueError(f"ITAコーパスの形式ではありません: {line}")
+    text, _, yomi = body.rpartition(",")
+    if not text:
+        # 読みがない行
+        text, yomi = body, ""
+    return ITASentence(sentence_id.strip(), text.strip(), yomi.strip(), subset)
+
+
+def load_transcript(filename: str, subset: str = "") -> List[ITASentence]:
+    """
+    書き起こしのファイルを読み込む。
+
+    Args:
+        filename (str): 書き起こしのファイル
+        subset (str, optional): サブセットの名前
+
+    Returns:
+        List[ITASentence]: ファイルの順序の文のリスト
+    """
+    sentences = []
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            sentence = parse_transcript_line(line, subset)
+            if sentence is not None:
+                sentences.append(sentence)
+    return sentences
+
+
+def load_ita_corpus(
+    corpus_dir: str = ITA_CORPUS_DIR, subsets: Sequence[str] = ("emotion", "recitation")
+) -> List[ITASentence]:
+    """
+    ITAコーパスの文を読み込む。
+
+    Args:
+        corpus_dir (str, optional): ITAコーパスをcloneしたディレクトリ。デフォルトは "data/ITA_corpus/ref/ita-corpus"
+        subsets (Sequence[str], optional): 読み込むサブセット。デフォルトは ("emotion", "recitation")
+
+    Returns:
+        List[ITASentence]: サブセットの順に並べた文のリスト
+
+    Raises:
+        FileNotFoundError: 書き起こしのファイルがない場合
+        ValueError: 不明なサブセットが指定された場合
+    """
+    sentences = []
+    for subset in subsets:
+        if subset not in TRANSCRIPT_FILES:
+            raise ValueError(f"不明なサブセットです: {subset}（{', '.join(TRANSCRIPT_FILES)}）")
+        filename = os.path.join(corpus_dir, TRANSCRIPT_FILES[subset])
+        if not os.path.exists(filename):
+            raise FileNotFoundError(
+                f"書き起こしのファイルがありません: {filename}\n"
+                f"https://github.com/mmorise/ita-corpus を {corpus_dir} にcloneしてください。"
+            )
+        sentences.extend(load_transcript(filename, subset))
+    return sentences
@@ -0,0 +1,411 @@
+"""
+SQLiteを使ったローカルのタスクキュー。
+
+複数のDatasetのワーカープロセスが同じキューから行単位のタスクを取り出して処理することで、
+[1200:1500] のような固定のスライスで分担するよりも、速いワーカーが遊ばずに済む。
+
+- タスクはステージ（"speech", "snac" など）と行のキーで登録する。同じキーは二重に登録されない
+- ワーカーはタスクをリース（期限付きで占有）して取り出し、処理中はハートビートでリースを延長する
+- ワーカーが止まってリースの期限が切れたタスクは、他のワーカーに再配布される
+- ステージごと・タスクごとの優先度が高いものから取り出す
+
+同じホストのプロセス間ではWALモードで使う。ストレージを共有する複数のホストで使う場合は、
+WALが使えないファイルシステムが多いため `wal=False` を指定すること。
+
+python -m scripts.dataset.task_queue stats --db output/tasks.sqlite
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    stage TEXT PRIMARY KEY,
+    priority INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stage TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (stage, key)
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (status, lease_expires);
+"""
+
+
+def default_worker_id() -> str:
+    """ホスト名とプロセスIDからワーカーのIDを作る。"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+@dataclass
+class Task:
+    """
+    リースしたタスク。
+
+    Attributes:
+        id (int): タスクのID
+        stage (str): ステージ
+        key (str): ステージ内で行を識別するキー
+        payload (Any): 登録時に渡した値
+        attempts (int): これまでにリースされた回数（今回を含む）
+        lease_expires (float): リースの期限（UNIX時間）
+    """
+    id: int
+    stage: str
+    key: str
+    payload: Any
+    attempts: int
+    lease_expires: float
+
+
+class TaskQueue:
+    """
+    リースとハートビートで行単位のタスクを配布するキュー。
+
+    使用例:
+        queue = TaskQueue("output/tasks.sqlite")
+        queue.enqueue_many("speech", [(str(i), {"index": i, "text": text}) for i, text in enumerate(texts)])
+
+        # 各ワーカー
+        while (tasks := queue.claim(worker_id, stages=["speech"])):
+            for task in tasks:
+                with queue.keep_alive(task, worker_id):
+                    result = process(task.payload)
+                queue.complete(task, worker_id, result)
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 120.0, max_attempts: int = 3, wal: bool = True):
+        """
+        Args:
+            path (str): SQLiteのデータベースファイル
+            lease_seconds (float, optional): リースの長さ（秒）。デフォルトは120
+            max_attempts (int, optional): 1つのタスクをリースする最大回数。超えたタスクは失敗にする。デフォルトは3
+            wal (bool, optional): TrueであればWALモードを使う。共有ストレージではFalseにすること
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.wal = wal
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            if wal:
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # スレッドやプロセスをまたいで使えるよう、操作ごとに接続する
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=60000")
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        try:
+            # 書き込みのロックを先に取り、2つのワーカーが同じタスクをリースしないようにする
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def set_stage_priority(self, stage: str, priority: int):
+        """
+        ステージの優先度を設定する。優先度が高いステージのタスクから取り出される。
+
+        Args:
+            stage (str): ステージ
+            priority (int): 優先度（大きいほど先）
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO stages (stage, priority) VALUES (?, ?) "
+                "ON CONFLICT (stage) DO UPDATE SET priority = excluded.priority",
+                (stage, priority),
+            )
+
+    def enqueue(self, stage: str, key: str, payload: Any, priority: int = 0) -> bool:
+        """
+        タスクを登録する。
+
+        Args:
+            stage (str): ステージ
+            key (str): ステージ内で行を識別するキー
+            payload (Any): タスクの値（JSONに変換できること）
+            priority (int, optional): ステージ内の優先度（大きいほど先）。デフォルトは0
+
+        Returns:
+            bool: 登録した場合はTrue、同じキーが既にある場合はFalse
+        """
+        return self.enqueue_many(stage, [(key, payload)], priority) == 1
+
+    def enqueue_many(self, stage: str, items: Iterable[Tuple[str, Any]], priority: int = 0) -> int:
+        """
+        複数のタスクを1つのトランザクションで登録する。既にあるキーは無視する。
+
+        Args:
+            stage (str): ステージ
+            items (Iterable[Tuple[str, Any]]): (キー, 値) のタプル
+            priority (int, optional): ステージ内の優先度。デフォルトは0
+
+        Returns:
+            int: 新しく登録したタスクの数
+        """
+        now = time.time()
+        rows = [(stage, str(key), json.dumps(payload, ensure_ascii=False), priority, now, now) for key, payload in items]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (stage, key, payload, priority, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return conn.total_changes - before
+
+    def claim(self, worker_id: str, stages: Optional[Sequence[str]] = None, limit: int = 1) -> List[Task]:
+        """
+        タスクをリースして取り出す。
+
+        未処理のタスクと、リースの期限が切れたタスク（ワーカーが止まった場合）が対象になる。
+        リースの回数がmax_attemptsに達していたタスクは失敗にする。
+
+        Args:
+            worker_id (str): ワーカーのID
+            stages (Sequence[str], optional): 取り出すステージ。デフォルトはすべて
+            limit (int, optional): 取り出す最大数。デフォルトは1
+
+        Returns:
+            List[Task]: リースしたタスク。取り出せるタスクがなければ空のリスト
+        """
+        now = time.time()
+        stage_filter = ""
+        params: list = [PENDING, LEASED, now]
+        if stages:
+            stage_filter = f"AND t.stage IN ({', '.join('?' for _ in stages)})"
+            params += list(stages)
+
+        with self._transaction() as conn:
+            # 再配布の上限に達したタスクを失敗にする
+            conn.execute(
+                "UPDATE tasks SET status = ?, error = COALESCE(error, 'lease expired'), lease_owner = NULL, updated = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                f"""
+                SELECT t.id, t.stage, t.key, t.payload, t.attempts FROM tasks t
+                LEFT JOIN stages s ON s.stage = t.stage
+                WHERE (t.status = ? OR (t.status = ? AND t.lease_expires < ?)) {stage_filter}
+                ORDER BY COALESCE(s.priority, 0) DESC, t.priority DESC, t.id
+                LIMIT ?
+                """,
+                params + [limit],
+            ).fetchall()
+
+            expires = now + self.lease_seconds
+            conn.executemany(
+                "UPDATE tasks SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated = ? "
+                "WHERE id = ?",
+                [(LEASED, worker_id, expires, now, row[0]) for row in rows],
+            )
+
+        return [
+            Task(id=task_id, stage=stage, key=key, payload=json.loads(payload), attempts=attempts + 1, lease_expires=expires)
+            for task_id, stage, key, payload, attempts in rows
+        ]
+
+    def heartbeat(self, task: Task, worker_id: str) -> bool:
+        """
+        リースを延長する。
+
+        Args:
+            task (Task): リースしているタスク
+            worker_id (str): ワーカーのID
+
+        Returns:
+            bool: 延長できた場合はTrue。期限切れで他のワーカーに再配布された場合はFalse
+        """
+        now = time.time()
+        expires = now + self.lease_seconds
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                (expires, now, task.id, LEASED, worker_id),
+            ).rowcount
+        if updated:
+            task.lease_expires = expires
+        return bool(updated)
+
+    @contextmanager
+    def keep_alive(self, task: Task, worker_id: str, interval: Optional[float] = None):
+        """
+        ブロック内の処理中、バックグラウンドのスレッドでハートビートを送る。
+
+        Args:
+            task (Task): リースしているタスク
+            worker_id (str): ワーカーのID
+            interval (float, optional): ハートビートの間隔（秒）。デフォルトはリースの長さの1/3
+        """
+        interval = interval or self.lease_seconds / 3
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                if not self.heartbeat(task, worker_id):
+                    return
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield task
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(self, task: Task, worker_id: str, result: Any = None) -> bool:
+        """
+        タスクを完了にする。
+
+        Args:
+            task (Task): リースしているタスク
+            worker_id (str): ワーカーのID
+            result (Any, optional): 結果（JSONに変換できること）
+
+        Returns:
+            bool: 完了にできた場合はTrue。リースを失っていた場合はFalse（結果は他のワーカーのものが使われる）
+        """
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (DONE, json.dumps(result, ensure_ascii=False), time.time(), task.id, LEASED, worker_id),
+            ).rowcount
+        return bool(updated)
+
+    def fail(self, task: Task, worker_id: str, error: str, retry: bool = True) -> bool:
+        """
+        タスクの処理に失敗したことを記録する。
+
+        Args:
+            task (Task): リースしているタスク
+            worker_id (str): ワーカーのID
+            error (str): エラーの内容
+            retry (bool, optional): Trueでmax_attemptsに達していなければ、未処理に戻して再配布する
+
+        Returns:
+            bool: 記録できた場合はTrue。リースを失っていた場合はFalse
+        """
+        status = PENDING if retry and task.attempts < self.max_attempts else FAILED
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (status, error, time.time(), task.id, LEASED, worker_id),
+            ).rowcount
+        return bool(updated)
+
+    def requeue_failed(self, stage: Optional[str] = None) -> int:
+        """
+        失敗したタスクを未処理に戻す（リースの回数もリセットする）。
+
+        Args:
+            stage (str, optional): 対象のステージ。デフォルトはすべて
+
+        Returns:
+            int: 戻したタスクの数
+        """
+        query = "UPDATE tasks SET status = ?, attempts = 0, updated = ? WHERE status = ?"
+        params: list = [PENDING, time.time(), FAILED]
+        if stage:
+            query += " AND stage = ?"
+            params.append(stage)
+        with self._transaction() as conn:
+            return conn.execute(query, params).rowcount
+
+    def results(self, stage: str) -> Dict[str, Any]:
+        """
+        完了したタスクの結果を返す。
+
+        Args:
+            stage (str): ステージ
+
+        Returns:
+            Dict[str, Any]: キーから結果への辞書
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT key, result FROM tasks WHERE stage = ? AND status = ?", (stage, DONE)).fetchall()
+        finally:
+            conn.close()
+        return {key: json.loads(result) for key, result in rows}
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        ステージごと・状態ごとのタスクの数を返す。
+
+        Returns:
+            Dict[str, Dict[str, int]]: {ステージ: {状態: 数}}
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT stage, status, COUNT(*) FROM tasks GROUP BY stage, status").fetchall()
+        finally:
+            conn.close()
+        stats: Dict[str, Dict[str, int]] = {}
+        for stage, status, count in rows:
+            stats.setdefault(stage, {})[status] = count
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="タスクキューの状態を確認・操作します。")
+    parser.add_argument("command", choices=["stats", "requeue-failed", "priority"])
+    parser.add_argument("--db", default="output/tasks.sqlite")
+    parser.add_argument("--stage", default=None)
+    parser.add_argument("--priority", type=int, default=0)
+    args = parser.parse_args()
+
+    queue = TaskQueue(args.db)
+    if args.command == "stats":
+        for stage, counts in sorted(queue.stats().items()):
+            print(f"{stage}: " + ", ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+    elif args.command == "requeue-failed":
+        print(f"{queue.requeue_failed(args.stage)}件のタスクを未処理に戻しました。")
+    else:
+        if not args.stage:
+            parser.error("--stage を指定してください。")
+        queue.set_stage_priority(args.stage, args.priority)
+        print(f"{args.stage}の優先度を{args.priority}にしました。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.dataset.artifact_store import ArtifactStore, input_key
+
+
+def test_input_key_is_canonical():
+    assert input_key(text="こんにちは", model="a") == input_key(model="a", text="こんにちは")
+    assert input_key(text="こんにちは", model="a") != input_key(text="こんにちは", model="b")
+
+def test_put_and_get(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    key = input_key(kind="speech", text="こんにちは")
+    assert store.get(key) is None
+
+    path = store.put_bytes(b"RIFF-data", ".wav", key, {"text": "こんにちは"})
+    assert store.get(key) == path
+    assert store.read_bytes(key) == b"RIFF-data"
+    assert store.resolve(key)["metadata"] == {"text": "こんにちは"}
+
+    # 2階層のディレクトリに分けて保存する
+    digest = os.path.basename(path)[:-4]
+    assert path == os.path.join(str(tmp_path), "objects", digest[:2], digest[2:4], digest + ".wav")
+
+def test_identical_content_is_deduplicated(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first = store.put_bytes(b"same", ".wav", input_key(text="a"))
+    src = tmp_path / "synth.wav"
+    src.write_bytes(b"same")
+    second = store.put_file(str(src), key=input_key(text="b"), move=True)
+    assert first == second
+    assert not src.exists()
+    objects = [name for _, _, names in os.walk(store.objects_dir) for name in names]
+    assert len(objects) == 1
+
+def test_missing_object_is_not_returned(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    key = input_key(text="a")
+    os.remove(store.put_bytes(b"data", ".txt", key))
+    assert store.get(key) is None
+
+def test_parallel_writers(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+
+    def write(i):
+        # 同じ内容と同じキーを多数のスレッドから同時に書き込む
+        return store.put_bytes(b"x" * 100000 + bytes([i % 2]), ".bin", input_key(n=i % 2))
+
+    with ThreadPoolExecutor(8) as pool:
+        paths = list(pool.map(write, range(64)))
+
+    assert len(set(paths)) == 2
+    for n in range(2):
+        assert store.read_bytes(input_key(n=n)) == b"x" * 100000 + bytes([n])
+    assert not [name for name in os.listdir(store.tmp_dir)]
+    leftovers = [name for _, _, names in os.walk(str(tmp_path)) for name in names if name.startswith(".tmp-")]
+    assert not leftovers
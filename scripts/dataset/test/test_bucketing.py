@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from scripts.dataset.bucketing import bucket_by_length, count_spoken_chars, estimate_duration, padding_ratio
+
+
+def test_estimate_duration_ignores_whitespace():
+    assert count_spoken_chars("こんにちは 世界\n") == 7
+    assert count_spoken_chars(None) == 0
+    assert estimate_duration("あ" * 10, sec_per_char=0.2) == pytest.approx(2.0)
+
+def test_buckets_are_longest_first_and_skip_empty_rows():
+    texts = ["あ" * 5, None, "あ" * 100, "", "あ" * 20, "あ" * 6]
+    plan = bucket_by_length(texts, boundaries=(1.0, 5.0), sec_per_char=0.15)
+    assert plan.buckets == [[2], [4], [5, 0]]
+    assert plan.order == [2, 4, 5, 0]
+    assert plan.bucket_of == [2, -1, 0, -1, 1, 2]
+
+def test_restore_returns_original_order():
+    texts = ["あ" * n for n in (3, 50, 10, 80, 1)]
+    plan = bucket_by_length(texts)
+    restored = plan.restore([f"result {i}" for i in plan.order])
+    assert restored == [f"result {i}" for i in range(len(texts))]
+    with pytest.raises(ValueError):
+        plan.restore([])
+
+def test_batches_stay_within_buckets():
+    texts = ["あ" * n for n in (3, 4, 5, 60, 70, 80, 90)]
+    plan = bucket_by_length(texts, boundaries=(1.0, 5.0))
+    batches = list(plan.batches(max_batch_size=2))
+    assert sorted(i for batch in batches for i in batch) == list(range(len(texts)))
+    for batch in batches:
+        assert len(batch) <= 2
+        assert len({plan.bucket_of[i] for i in batch}) == 1
+
+def test_batches_respect_padded_seconds():
+    plan = bucket_by_length(["あ" * 100] * 4, boundaries=(1.0,))
+    assert [len(batch) for batch in plan.batches(max_batch_size=8, max_batch_seconds=30.0)] == [2, 2]
+
+def test_bucketing_reduces_padding():
+    rng = random.Random(0)
+    texts = ["あ" * rng.choice([rng.randint(5, 20), rng.randint(100, 400)]) for _ in range(200)]
+    plan = bucket_by_length(texts)
+    dataset_order = [list(range(i, i + 8)) for i in range(0, len(texts), 8)]
+    assert padding_ratio(plan.durations, list(plan.batches(8))) < padding_ratio(plan.durations, dataset_order) / 2
@@ -0,0 +1,39 @@
+import pytest
+
+from scripts.dataset.ita_corpus import TRANSCRIPT_FILES, ITASentence, load_ita_corpus, parse_transcript_line
+
+
+def test_parse_transcript_line():
+    sentence = parse_transcript_line("EMOTION100_001:えっ嘘でしょ。,エッウソデショ。\n", "emotion")
+    assert sentence == ITASentence("EMOTION100_001", "えっ嘘でしょ。", "エッウソデショ。", "emotion")
+
+def test_parse_keeps_japanese_commas_in_text():
+    sentence = parse_transcript_line("RECITATION324_002:はい、そうです。,ハイ、ソーデス。")
+    assert sentence.text == "はい、そうです。"
+    assert sentence.yomi == "ハイ、ソーデス。"
+
+def test_parse_without_yomi_and_blank_lines():
+    assert parse_transcript_line("ID_1:読みのない文。").yomi == ""
+    assert parse_transcript_line("   \n") is None
+    assert parse_transcript_line("\ufeffID_2:文,ブン").id == "ID_2"
+    with pytest.raises(ValueError):
+        parse_transcript_line("区切りのない行")
+
+def test_load_ita_corpus(tmp_path):
+    (tmp_path / TRANSCRIPT_FILES["emotion"]).write_text(
+        "EMOTION100_001:えっ嘘でしょ。,エッウソデショ。\nEMOTION100_002:シュシュ、ジャージ。,シュシュ、ジャージ。\n",
+        encoding="utf-8",
+    )
+    (tmp_path / TRANSCRIPT_FILES["recitation"]).write_text(
+        "RECITATION324_001:女の子がキッキッ嬉しそう。,オンナノコガキッキッウレシソー。\n", encoding="utf-8"
+    )
+    sentences = load_ita_corpus(str(tmp_path))
+    assert [s.id for s in sentences] == ["EMOTION100_001", "EMOTION100_002", "RECITATION324_001"]
+    assert [s.subset for s in sentences] == ["emotion", "emotion", "recitation"]
+    assert len(load_ita_corpus(str(tmp_path), subsets=("recitation",))) == 1
+
+def test_missing_corpus(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_ita_corpus(str(tmp_path))
+    with pytest.raises(ValueError):
+        load_ita_corpus(str(tmp_path), subsets=("unknown",))
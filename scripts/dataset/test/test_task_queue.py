@@ -0,0 +1,131 @@
+import json
+import multiprocessing
+import time
+
+import pytest
+
+from scripts.dataset.task_queue import DONE, FAILED, TaskQueue
+
+
+def make_queue(tmp_path, **kwargs):
+    return TaskQueue(str(tmp_path / "tasks.sqlite"), **kwargs)
+
+def test_enqueue_is_idempotent(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.enqueue_many("speech", [(str(i), {"index": i}) for i in range(5)]) == 5
+    assert queue.enqueue_many("speech", [(str(i), {"index": i}) for i in range(7)]) == 2
+    assert not queue.enqueue("speech", "0", {"index": 0})
+    assert queue.stats() == {"speech": {"pending": 7}}
+
+def test_claim_order_uses_stage_and_task_priority(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue_many("speech", [("a", 1), ("b", 2)])
+    queue.enqueue("speech", "urgent", 3, priority=5)
+    queue.enqueue_many("snac", [("c", 4)])
+    queue.set_stage_priority("snac", 10)
+
+    order = [task.key for task in queue.claim("w", limit=10)]
+    assert order == ["c", "urgent", "a", "b"]
+    assert queue.claim("w") == []
+
+def test_claim_filters_stages(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("speech", "a", 1)
+    queue.enqueue("snac", "b", 2)
+    assert [task.key for task in queue.claim("w", stages=["snac"], limit=5)] == ["b"]
+
+def test_expired_lease_is_redelivered(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.2)
+    queue.enqueue("speech", "a", {"text": "こんにちは"})
+    (task,) = queue.claim("dead-worker")
+    assert queue.claim("w2") == []
+
+    time.sleep(0.3)
+    (again,) = queue.claim("w2")
+    assert again.id == task.id and again.attempts == 2
+    # リースを失ったワーカーは完了にできない
+    assert not queue.complete(task, "dead-worker", "late")
+    assert queue.complete(again, "w2", "ok")
+    assert queue.results("speech") == {"a": "ok"}
+
+def test_heartbeat_keeps_lease(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.3)
+    queue.enqueue("speech", "a", 1)
+    (task,) = queue.claim("w1")
+    with queue.keep_alive(task, "w1", interval=0.05):
+        time.sleep(0.6)
+        assert queue.claim("w2") == []
+    assert queue.complete(task, "w1")
+
+def test_fail_retries_until_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    queue.enqueue("snac", "a", 1)
+    (task,) = queue.claim("w")
+    assert queue.fail(task, "w", "ValueError: qc")
+    (task,) = queue.claim("w")
+    assert queue.fail(task, "w", "ValueError: qc")
+    assert queue.claim("w") == []
+    assert queue.stats() == {"snac": {FAILED: 1}}
+
+    assert queue.requeue_failed("snac") == 1
+    assert [task.attempts for task in queue.claim("w")] == [1]
+
+def test_expired_lease_over_max_attempts_fails(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05, max_attempts=1)
+    queue.enqueue("speech", "a", 1)
+    queue.claim("w1")
+    time.sleep(0.1)
+    assert queue.claim("w2") == []
+    assert queue.stats() == {"speech": {FAILED: 1}}
+
+def _worker(path, worker_id, results):
+    queue = TaskQueue(path)
+    while True:
+        tasks = queue.claim(worker_id, limit=3)
+        if not tasks:
+            return
+        for task in tasks:
+            queue.complete(task, worker_id, worker_id)
+            results.append(task.key)
+
+def test_workers_never_share_tasks(tmp_path):
+    path = str(tmp_path / "tasks.sqlite")
+    queue = TaskQueue(path)
+    queue.enqueue_many("speech", [(str(i), i) for i in range(200)])
+
+    with multiprocessing.Manager() as manager:
+        results = manager.list()
+        workers = [multiprocessing.Process(target=_worker, args=(path, f"w{i}", results)) for i in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        keys = list(results)
+
+    assert sorted(keys, key=int) == [str(i) for i in range(200)]
+    assert queue.stats() == {"speech": {DONE: 200}}
+
+def test_write_queue_results_overwrites(tmp_path):
+    pytest.importorskip("langchain_core")
+    from scripts.dataset.dataset_maker import Dataset
+    from scripts.translation.translator import JSONWriter
+
+    filename = str(tmp_path / "texts.json")
+    output_filename = str(tmp_path / "results.json")
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(["a", "b", "c"], f)
+    dataset = Dataset.__new__(Dataset)
+    dataset.jsonwriter = JSONWriter()
+    queue = make_queue(tmp_path)
+    dataset.enqueue_texts(queue, filename)
+
+    task = queue.claim("w1")[0]
+    queue.complete(task, "w1", "done-0")
+    dataset.write_queue_results(queue, "speech", filename, output_filename)
+    for task in queue.claim("w1", limit=2):
+        queue.complete(task, "w1", f"done-{task.payload['index']}")
+    dataset.write_queue_results(queue, "speech", filename, output_filename)
+
+    # 2回目の書き出しは追記されず、1回目の結果を置き換える
+    with open(output_filename, encoding="utf-8") as f:
+        assert json.load(f) == ["done-0", "done-1", "done-2"]
@@ -0,0 +1,157 @@
+"""
+SNACEncoder / SNACDecoderが使うモデルの実行方式（バックエンド）を切り替えるモジュール。
+
+- "eager": PyTorchのSNACモジュールをそのまま使う（デフォルト）
+- "torchscript": scripts/snac/export.py で書き出したTorchScriptを使う（CPUのみ）
+- "onnx": scripts/snac/export.py で書き出したONNXをonnxruntimeで実行する（CPUのみ）
+
+書き出したモデルはSNACと同じ `encode` / `decode` と、パディングの計算に必要な属性を持つため、
+encode_batchやチャンク処理からもeagerモードと同じように使える。
+"""
+import json
+import math
+import os
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+import torch
+
+from scripts.snac.export import (
+    DECODER_ONNX,
+    DECODER_TORCHSCRIPT,
+    ENCODER_ONNX,
+    ENCODER_TORCHSCRIPT,
+    METADATA_FILENAME,
+)
+from scripts.snac.model_registry import get_snac_model
+from scripts.snac.quantization import get_quantized_snac
+
+BACKENDS = ("eager", "torchscript", "onnx")
+
+
+class ExportedSNAC:
+    """
+    書き出したSNACモデルの共通部分。パディングはSNAC.preprocessと同じ方法でモデルの外で行う。
+    """
+
+    def __init__(self, export_dir: str):
+        with open(os.path.join(export_dir, METADATA_FILENAME), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        self.export_dir = export_dir
+        self.model_name = metadata["model_name"]
+        self.sampling_rate = metadata["sampling_rate"]
+        self.hop_length = metadata["hop_length"]
+        self.vq_strides = metadata["vq_strides"]
+        self.attn_window_size = metadata["attn_window_size"]
+        self.device = torch.device("cpu")
+
+    def preprocess(self, audio_data: torch.Tensor) -> torch.Tensor:
+        length = audio_data.shape[-1]
+        pad_to = self.hop_length * math.lcm(self.vq_strides[0], self.attn_window_size or 1)
+        right_pad = math.ceil(length / pad_to) * pad_to - length
+        return torch.nn.functional.pad(audio_data, (0, right_pad))
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        if torch.device(device).type != "cpu":
+            raise ValueError("書き出したモデルはCPUでのみ実行できます。")
+        return self
+
+
+class TorchScriptSNAC(ExportedSNAC):
+    """TorchScriptに書き出したSNACモデル。"""
+
+    def __init__(self, export_dir: str):
+        super().__init__(export_dir)
+        self.encoder = torch.jit.load(os.path.join(export_dir, ENCODER_TORCHSCRIPT), map_location="cpu").eval()
+        self.decoder = torch.jit.load(os.path.join(export_dir, DECODER_TORCHSCRIPT), map_location="cpu").eval()
+
+    def encode(self, audio_data: torch.Tensor) -> List[torch.Tensor]:
+        with torch.inference_mode():
+            return list(self.encoder(self.preprocess(audio_data.cpu())))
+
+    def decode(self, codes: List[torch.Tensor]) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.decoder(*[code.cpu() for code in codes])
+
+
+class OnnxSNAC(ExportedSNAC):
+    """ONNXに書き出したSNACモデル。onnxruntimeのCPUExecutionProviderで実行する。"""
+
+    def __init__(self, export_dir: str):
+        super().__init__(export_dir)
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("backend='onnx' を使用するには onnxruntime をインストールしてください: pip install onnxruntime")
+
+        providers = ["CPUExecutionProvider"]
+        self.encoder = onnxruntime.InferenceSession(os.path.join(export_dir, ENCODER_ONNX), providers=providers)
+        self.decoder = onnxruntime.InferenceSession(os.path.join(export_dir, DECODER_ONNX), providers=providers)
+
+    def encode(self, audio_data: torch.Tensor) -> List[torch.Tensor]:
+        audio = self.preprocess(audio_data.cpu()).numpy().astype(np.float32)
+        outputs = self.encoder.run(None, {"audio": audio})
+        return [torch.from_numpy(output) for output in outputs]
+
+    def decode(self, codes: List[torch.Tensor]) -> torch.Tensor:
+        inputs = {f"codes_{i}": code.cpu().numpy().astype(np.int64) for i, code in enumerate(codes)}
+        (audio,) = self.decoder.run(None, inputs)
+        return torch.from_numpy(audio)
+
+
+def get_model_device(model) -> torch.device:
+    """
+    モデルを実行するデバイスを返す。
+
+    書き出したモデルはパラメータを持たないため、device属性から取得する。
+
+    Args:
+        model: load_snac_backendが返すモデル
+
+    Returns:
+        torch.device: モデルのデバイス。パラメータもdevice属性もない場合はCPU
+    """
+    if hasattr(model, "device"):
+        return torch.device(model.device)
+    parameter = next(model.parameters(), None)
+    return parameter.device if parameter is not None else torch.device("cpu")
+
+
+@lru_cache(maxsize=None)
+def _load_exported(backend: str, export_dir: str) -> ExportedSNAC:
+    if backend == "torchscript":
+        return TorchScriptSNAC(export_dir)
+    return OnnxSNAC(export_dir)
+
+
+def load_snac_backend(
+    model_name: str, device: torch.device, backend: str = "eager", export_dir: str = None, quantize: str = None
+):
+    """
+    指定されたバックエンドでSNACモデルを取得する。同じモデルはプロセス内で共有される。
+
+    Args:
+        model_name (str): モデルの名前（eagerの場合に使用）
+        device (torch.device): デバイス（eagerの場合に使用。それ以外はCPUのみ）
+        backend (str, optional): "eager", "torchscript", "onnx" のいずれか。デフォルトは"eager"
+        export_dir (str, optional): 書き出したモデルのディレクトリ（torchscript / onnx の場合に必須）
+        quantize (str, optional): "dynamic" または "static" の場合、int8に量子化したモデルをCPUで使う（eagerのみ）
+
+    Returns:
+        SNAC | TorchScriptSNAC | OnnxSNAC: encode / decodeを持つモデル
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (choose from {', '.join(BACKENDS)})")
+    if quantize:
+        if backend != "eager":
+            raise ValueError("量子化はbackend='eager'でのみ使用できます。")
+        return get_quantized_snac(model_name, quantize)
+    if backend == "eager":
+        return get_snac_model(model_name, device)
+    if not export_dir:
+        raise ValueError(f"backend='{backend}' には export_dir の指定が必要です。")
+    return _load_exported(backend, os.path.abspath(export_dir))
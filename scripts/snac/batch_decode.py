@@ -0,0 +1,254 @@
+"""
+データセットのSNACトークン列をまとめて音声にデコードするモジュール。
+
+数千行の聞き取り確認や検証のために、次の処理を並行して行う。
+- トークン列の解析をバックグラウンドのワーカーで数バッチ分だけ先読みする
+- フレーム数の近い行を同じバッチにまとめ、1回のforwardで複数行をデコードする
+- WAVファイルの書き出しをバックグラウンドで行う
+
+処理時間は実時間係数（RTF = 処理時間 / 音声の長さ）で報告する。
+
+python -m scripts.snac.batch_decode --split-name identity --limit 1000 --output-dir output/decoded
+"""
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import soundfile as sf
+import torch
+
+from scripts.snac.backends import BACKENDS, get_model_device, load_snac_backend
+from scripts.utils.snac_utils import deinterleave_frames, get_pad_multiple, parse_snac_codes
+
+
+def count_frames(snac_tokens) -> int:
+    """
+    解析せずにトークン列のフレーム数を数える（バッチの組み分けに使う）。
+
+    Args:
+        snac_tokens: "#" 区切りの文字列、split済みのリスト、または (フレーム数, 7 | 15) の配列
+
+    Returns:
+        int: フレーム数。Noneの場合は0
+    """
+    if snac_tokens is None:
+        return 0
+    if isinstance(snac_tokens, str):
+        return snac_tokens.count("#")
+    if isinstance(snac_tokens, np.ndarray) and snac_tokens.ndim == 2:
+        return len(snac_tokens)
+    return sum(1 for token in snac_tokens if token == "#")
+
+
+def _parse(snac_tokens) -> Optional[np.ndarray]:
+    if snac_tokens is None:
+        return None
+    try:
+        return parse_snac_codes(snac_tokens)
+    except ValueError:
+        return None
+
+
+class BatchSNACDecoder:
+    """
+    データセットの複数行のSNACトークンをまとめてデコードし、WAVファイルに書き出すクラス。
+
+    バッチ内の行は末尾のフレームを繰り返して同じ長さに揃えてからデコードし、
+    各行の本来の長さに切り詰めて書き出す。行の末尾付近の音声は、1行ずつデコードした場合と
+    わずかに異なることがある。
+    """
+
+    def __init__(
+        self,
+        model_name: str = "hubertsiuzdak/snac_24khz",
+        device: Optional[torch.device] = None,
+        batch_size: Optional[int] = None,
+        parse_workers: int = 2,
+        write_workers: int = 2,
+        model=None,
+        backend: str = "eager",
+        export_dir: Optional[str] = None,
+        prefetch_batches: int = 2,
+    ):
+        """
+        Args:
+            model_name (str, optional): 使用するSNACモデルの名前。VoiceAssistant-400kの音声は24kHz。デフォルトは "hubertsiuzdak/snac_24khz"
+            device (torch.device, optional): デバイス。デフォルトはモデルのデバイス（モデルをロードする場合は
+                eagerでCUDAが使えればCUDA、それ以外はCPU）
+            batch_size (int, optional): 1回のforwardでデコードする行数。デフォルトはGPUでは8、CPUでは1
+                （CPUではバッチを大きくしても速くならないことが多い）
+            parse_workers (int, optional): トークン列を解析するワーカーの数。デフォルトは2
+            write_workers (int, optional): WAVファイルを書き出すワーカーの数。デフォルトは2
+            model (SNAC, optional): 使用するモデル。指定した場合はmodel_name・backend・export_dirは使わない
+            backend (str, optional): "eager", "torchscript", "onnx" のいずれか（scripts/snac/backends.py）。デフォルトは"eager"
+            export_dir (str, optional): scripts/snac/export.py で書き出したモデルのディレクトリ（torchscript / onnx の場合）
+            prefetch_batches (int, optional): デコード中に先に解析しておくバッチの数。デフォルトは2
+        """
+        if model is None:
+            if device is None:
+                device = torch.device("cuda" if torch.cuda.is_available() and backend == "eager" else "cpu")
+            model = load_snac_backend(model_name, device, backend, export_dir)
+        self.model = model
+        # 書き出したモデルはパラメータを持たないため、デバイスは引数またはモデルのdevice属性から決める
+        self.device = torch.device(device) if device is not None else get_model_device(model)
+        self.batch_size = batch_size or (8 if self.device.type == "cuda" else 1)
+        self.parse_workers = parse_workers
+        self.write_workers = write_workers
+        self.prefetch_batches = prefetch_batches
+        self.sample_rate = int(self.model.sampling_rate)
+        self.samples_per_frame = int(self.model.hop_length) * self.model.vq_strides[0]
+        # デコーダーのアテンションの窓に揃えるためのフレーム数
+        self.unit_frames = get_pad_multiple(self.model) // self.samples_per_frame
+
+    def plan_batches(self, rows: list) -> List[List[int]]:
+        """
+        フレーム数の近い行を同じバッチにまとめる。空の行は含めない。
+
+        Args:
+            rows (list): 各行のトークン列
+
+        Returns:
+            List[List[int]]: バッチごとの行番号のリスト
+        """
+        lengths = [count_frames(row) for row in rows]
+        order = sorted((i for i, length in enumerate(lengths) if length > 0), key=lambda i: lengths[i])
+        return [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+
+    def decode_frames(self, frames_list: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        複数行のフレームを1回のforwardでデコードする。
+
+        Args:
+            frames_list (List[np.ndarray]): 各行の (フレーム数, 7 | 15) の配列
+
+        Returns:
+            List[np.ndarray]: 各行の音声（float32の1次元配列）
+        """
+        max_frames = max(len(frames) for frames in frames_list)
+        padded_frames = -(-max_frames // self.unit_frames) * self.unit_frames
+
+        # 末尾のフレームを繰り返して同じ長さに揃える
+        batch = np.stack([
+            np.concatenate([frames, np.repeat(frames[-1:], padded_frames - len(frames), axis=0)])
+            for frames in frames_list
+        ])
+        layers = deinterleave_frames(batch.reshape(-1, batch.shape[-1]))
+        codes = [
+            torch.from_numpy(np.ascontiguousarray(layer, dtype=np.int64)).view(len(frames_list), -1).to(self.device)
+            for layer in layers
+        ]
+
+        with torch.inference_mode():
+            audio = self.model.decode(codes)
+
+        audio = audio[:, 0].cpu().numpy()
+        return [audio[row, :len(frames) * self.samples_per_frame] for row, frames in enumerate(frames_list)]
+
+    def decode_rows(self, rows: list, output_dir: str, filename_format: str = "row_{index}.wav") -> dict:
+        """
+        データセットの行をまとめてデコードし、WAVファイルに書き出す。
+
+        Args:
+            rows (list): DatasetModule.extract_snac_tokensなどが返すトークン列のリスト
+            output_dir (str): 出力先のディレクトリ
+            filename_format (str, optional): ファイル名の形式。{index}は行番号に置き換えられる
+
+        Returns:
+            dict: 行数、失敗した行番号、出力したファイル、音声の長さ（秒）、デコード時間と全体の時間（秒）、
+                それぞれのRTF
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        start = time.perf_counter()
+        batches = self.plan_batches(rows)
+
+        paths = [None] * len(rows)
+        failed = [i for i, row in enumerate(rows) if count_frames(row) == 0]
+        audio_seconds = 0.0
+        decode_seconds = 0.0
+        writes = []
+
+        with ThreadPoolExecutor(self.parse_workers) as parser, ThreadPoolExecutor(self.write_workers) as writer:
+            # デコード中に次のバッチの解析を進める。解析済みのフレームが溜まらないよう、先読みは数バッチ分まで
+            upcoming = iter(batches)
+            parsed = deque()
+
+            def prefetch():
+                batch = next(upcoming, None)
+                if batch is not None:
+                    parsed.append((batch, [parser.submit(_parse, rows[i]) for i in batch]))
+
+            for _ in range(self.prefetch_batches + 1):
+                prefetch()
+
+            while parsed:
+                batch, futures = parsed.popleft()
+                prefetch()
+                frames_list = [future.result() for future in futures]
+                valid = [(i, frames) for i, frames in zip(batch, frames_list) if frames is not None and len(frames)]
+                failed.extend(i for i, frames in zip(batch, frames_list) if frames is None or not len(frames))
+                if not valid:
+                    continue
+
+                decode_start = time.perf_counter()
+                audios = self.decode_frames([frames for _, frames in valid])
+                decode_seconds += time.perf_counter() - decode_start
+
+                for (i, _), audio in zip(valid, audios):
+                    paths[i] = os.path.join(output_dir, filename_format.format(index=i))
+                    audio_seconds += len(audio) / self.sample_rate
+                    writes.append(writer.submit(sf.write, paths[i], audio, self.sample_rate))
+
+            for future in writes:
+                future.result()
+
+        wall_seconds = time.perf_counter() - start
+        return {
+            "rows": len(rows),
+            "decoded": len(rows) - len(failed),
+            "failed": sorted(failed),
+            "paths": paths,
+            "audio_seconds": round(audio_seconds, 3),
+            "decode_seconds": round(decode_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "rtf_decode": round(decode_seconds / audio_seconds, 4) if audio_seconds else None,
+            "rtf_wall": round(wall_seconds / audio_seconds, 4) if audio_seconds else None,
+        }
+
+
+def main():
+    from scripts.utils.HF_dataset import DatasetModule
+
+    parser = argparse.ArgumentParser(description="データセットのSNACトークンをまとめて音声にデコードします。")
+    parser.add_argument("--dataset", default="gpt-omni/VoiceAssistant-400k")
+    parser.add_argument("--split-name", default="identity")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--output-dir", default="output/decoded")
+    parser.add_argument("--model-name", default="hubertsiuzdak/snac_24khz")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--backend", default="eager", choices=BACKENDS)
+    parser.add_argument("--export-dir", default=None)
+    args = parser.parse_args()
+
+    dataset_module = DatasetModule()
+    dataset = dataset_module.load_dataset(args.dataset, columns=["split_name", "answer_snac"])
+    if args.split_name:
+        dataset = dataset_module.filter_dataset(dataset, args.split_name)
+    rows = dataset_module.extract_snac_tokens(dataset.select(range(min(args.limit, len(dataset)))))
+
+    decoder = BatchSNACDecoder(
+        args.model_name, batch_size=args.batch_size, backend=args.backend, export_dir=args.export_dir
+    )
+    report = decoder.decode_rows(rows, args.output_dir)
+    print(
+        f"{report['decoded']}/{report['rows']}行をデコードしました（失敗: {len(report['failed'])}行）。"
+        f"音声 {report['audio_seconds']:.1f}秒, デコード {report['decode_seconds']:.1f}秒 (RTF {report['rtf_decode']}), "
+        f"全体 {report['wall_seconds']:.1f}秒 (RTF {report['rtf_wall']})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+複数のプロセスでSNACエンコードを行うモジュール。
+
+CPUのみのノードでは、1つのプロセスでPyTorchのスレッドを増やすよりも、コアを分け合った複数のプロセスで
+別々の音声をエンコードする方がスループットが高い。各ワーカーはモデルを1度だけロードし、
+割り当てられたスレッド数（torch.set_num_threads）でキューの音声を順に処理する。
+
+エンコードは別プロセスで行われるため、Datasetのasyncioのイベントループはブロックされない。
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from scripts.snac.backends import load_snac_backend
+from scripts.snac.streaming import encode_chunked
+from scripts.utils.audio_utils import prepare_snac_input
+
+
+# 各ワーカープロセスで保持するモデル
+_worker_model = None
+
+
+def available_cpus() -> int:
+    """このプロセスが使用できるCPUコア数を返す。"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _init_worker(model_name: str, num_threads: int, backend: str, export_dir: Optional[str], quantize: Optional[str]):
+    """ワーカーの初期化。スレッド数を設定し、指定されたバックエンドでモデルをロードする。"""
+    global _worker_model
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # 既に並列処理が始まっている場合は変更できない
+        pass
+    _worker_model = load_snac_backend(model_name, torch.device("cpu"), backend, export_dir, quantize)
+
+
+def _encode_in_worker(waveform: np.ndarray, sample_rate: int, chunk_seconds: Optional[float]) -> List[np.ndarray]:
+    waveform = prepare_snac_input(waveform, sample_rate, _worker_model.sampling_rate, "cpu")
+    if chunk_seconds:
+        codes = encode_chunked(_worker_model, waveform, chunk_seconds=chunk_seconds)
+    else:
+        with torch.inference_mode():
+            codes = _worker_model.encode(waveform)
+    # プロセス間ではNumPy配列として受け渡す
+    return [code.numpy() for code in codes]
+
+
+def _worker_info() -> Tuple[int, int]:
+    """ワーカーのプロセスIDとスレッド数を返す（確認用）。"""
+    return os.getpid(), torch.get_num_threads()
+
+
+class SNACEncodePool:
+    """
+    プロセスプールでSNACエンコードを行うクラス。
+
+    使用例:
+        with SNACEncodePool(num_workers=4) as pool:
+            tokens = await pool.encode(waveform, sample_rate)
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+        model_name: str = "hubertsiuzdak/snac_44khz",
+        chunk_seconds: Optional[float] = None,
+        backend: str = "eager",
+        export_dir: Optional[str] = None,
+        quantize: Optional[str] = None,
+    ):
+        """
+        Args:
+            num_workers (int, optional): ワーカープロセスの数。デフォルトは使用できるコア数
+            threads_per_worker (int, optional): 各ワーカーのPyTorchのスレッド数。デフォルトはコア数をワーカー数で割った値
+            model_name (str, optional): 使用するSNACモデルの名前。デフォルトは "hubertsiuzdak/snac_44khz"
+            chunk_seconds (float, optional): 指定した場合、長い音声をこの長さのチャンクに分けてエンコードする
+            backend (str, optional): モデルの実行方式。"eager", "torchscript", "onnx" のいずれか。デフォルトは"eager"
+            export_dir (str, optional): scripts/snac/export.py で書き出したモデルのディレクトリ（torchscript / onnx の場合）
+            quantize (str, optional): "dynamic" または "static" の場合、int8に量子化したモデルを使う
+        """
+        cpus = available_cpus()
+        self.num_workers = num_workers or cpus
+        self.threads_per_worker = threads_per_worker or max(cpus // self.num_workers, 1)
+        self.model_name = model_name
+        self.chunk_seconds = chunk_seconds
+        self.backend = backend
+        self.export_dir = export_dir
+        self.quantize = quantize
+
+        # CUDAやOpenMPの状態を引き継がないようにspawnで起動する
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, self.threads_per_worker, backend, export_dir, quantize),
+        )
+
+    def submit(self, waveform, sample_rate: int) -> Future:
+        """
+        音声をキューに追加する。
+
+        Args:
+            waveform (np.ndarray | torch.Tensor): 形状が (T,) または (C, T) の波形
+            sample_rate (int): 波形のサンプリングレート
+
+        Returns:
+            Future: 各階層のコードのNumPy配列のリストを返すFuture
+        """
+        if isinstance(waveform, torch.Tensor):
+            waveform = waveform.detach().cpu().numpy()
+        return self._executor.submit(_encode_in_worker, np.asarray(waveform, dtype=np.float32), sample_rate, self.chunk_seconds)
+
+    async def encode(self, waveform, sample_rate: int) -> List[torch.Tensor]:
+        """
+        音声をエンコードする。結果が出るまでイベントループをブロックせずに待つ。
+
+        Args:
+            waveform (np.ndarray | torch.Tensor): 形状が (T,) または (C, T) の波形
+            sample_rate (int): 波形のサンプリングレート
+
+        Returns:
+            List[torch.Tensor]: SNACEncoder.encode_waveformと同じ形式の各階層のコード
+        """
+        codes = await asyncio.wrap_future(self.submit(waveform, sample_rate))
+        return [torch.from_numpy(code) for code in codes]
+
+    async def encode_many(self, items: list) -> List[List[torch.Tensor]]:
+        """
+        複数の音声をまとめてキューに追加し、入力と同じ順序で結果を返す。
+
+        Args:
+            items (list): (waveform, sample_rate) のタプルのリスト
+
+        Returns:
+            List[List[torch.Tensor]]: 各音声の各階層のコード
+        """
+        return await asyncio.gather(*(self.encode(waveform, sample_rate) for waveform, sample_rate in items))
+
+    def worker_info(self) -> List[Tuple[int, int]]:
+        """
+        ワーカーのプロセスIDとスレッド数を返す。
+
+        Returns:
+            List[Tuple[int, int]]: 確認できたワーカーの (プロセスID, スレッド数) のリスト
+        """
+        futures = [self._executor.submit(_worker_info) for _ in range(self.num_workers * 2)]
+        return sorted(set(future.result() for future in futures))
+
+    def close(self):
+        """ワーカーを終了する。"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,314 @@
+"""
+SNACのエンコーダーとデコーダーをTorchScriptとONNXに書き出すモジュール。
+
+書き出したモデルは `SNACEncoder(backend="torchscript", export_dir=...)` などで読み込んで使う（scripts/snac/backends.py）。
+短い音声を大量にエンコードする場合、eagerモードのPythonのオーバーヘッドを減らせる。
+
+python -m scripts.snac.export --output-dir models/snac_44khz --format torchscript onnx
+"""
+import argparse
+import copy
+import json
+import os
+from typing import List
+
+import torch
+from snac.attention import LocalMHA
+from snac.layers import Snake1d
+from torch.nn.utils import parametrize
+
+from scripts.snac.model_registry import get_snac_model
+from scripts.utils.snac_utils import get_pad_multiple
+
+METADATA_FILENAME = "snac_export.json"
+ENCODER_TORCHSCRIPT = "encoder.ts"
+DECODER_TORCHSCRIPT = "decoder.ts"
+ENCODER_ONNX = "encoder.onnx"
+DECODER_ONNX = "decoder.onnx"
+
+
+class EncoderGraph(torch.nn.Module):
+    """
+    パディング済みの音声からコードを求める部分だけのモジュール。
+
+    SNAC.encodeのパディングは入力の長さからPythonで計算されるため、トレースすると長さが固定されてしまう。
+    パディングは書き出したモデルの外（backends.py）で行う。
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.encoder = model.encoder
+        self.quantizer = model.quantizer
+
+    def forward(self, audio: torch.Tensor):
+        z = self.encoder(audio)
+        _, codes = self.quantizer(z)
+        return tuple(codes)
+
+
+class DecoderGraph(torch.nn.Module):
+    """各階層のコードから音声を求めるモジュール。"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.quantizer = model.quantizer
+        self.decoder = model.decoder
+
+    def forward(self, *codes: torch.Tensor):
+        z_q = self.quantizer.from_codes(list(codes))
+        return self.decoder(z_q)
+
+
+class OnnxLocalMHA(torch.nn.Module):
+    """
+    ONNXに書き出すためのLocalMHA。計算はLocalMHAと同じ。
+
+    LocalMHAをそのまま書き出すと、einopsのrearrangeの-1やtorch.catのdim=-1が書き出し時の長さや誤った軸に
+    置き換えられ、書き出しと異なる長さの音声を扱えない。窓の数を入力の長さから明示的に求め、
+    回転位置埋め込みのcos/sinは窓の大きさで事前に計算しておく。
+    """
+
+    def __init__(self, module: LocalMHA):
+        super().__init__()
+        self.norm = module.norm
+        self.to_qkv = module.to_qkv
+        self.to_out = module.to_out
+        self.heads = module.heads
+        self.window_size = module.window_size
+        self.use_rel_pos = module.rel_pos is not None
+        if self.use_rel_pos:
+            # SNACはxposを使わないため、スケールは常に1
+            t = torch.arange(module.window_size).type_as(module.rel_pos.inv_freq)
+            freqs = torch.outer(t, module.rel_pos.inv_freq)
+            freqs = torch.cat((freqs, freqs), dim=-1)
+            self.register_buffer("cos", freqs.cos(), persistent=False)
+            self.register_buffer("sin", freqs.sin(), persistent=False)
+
+    def _split_windows(self, t: torch.Tensor) -> torch.Tensor:
+        # b (w n) (h d) -> b h w n d
+        B, T, C = t.shape
+        t = t.reshape(B, T // self.window_size, self.window_size, self.heads, C // self.heads)
+        return t.permute(0, 3, 1, 2, 4)
+
+    @staticmethod
+    def _rotate_half(t: torch.Tensor) -> torch.Tensor:
+        d = t.shape[-1] // 2
+        return torch.cat((-t[..., d:], t[..., :d]), dim=t.dim() - 1)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        residual = x
+        x = self.norm(x.transpose(1, 2))
+        q, k, v = (self._split_windows(t) for t in self.to_qkv(x).chunk(3, dim=-1))
+        if self.use_rel_pos:
+            q = q * self.cos + self._rotate_half(q) * self.sin
+            k = k * self.cos + self._rotate_half(k) * self.sin
+
+        # scaled_dot_product_attentionのONNXへの変換は4次元の入力を前提にしているため、ヘッドと窓をまとめる
+        B, H, W, N, D = q.shape
+        q, k, v = (t.reshape(B, H * W, N, D) for t in (q, k, v))
+        out = torch.nn.functional.scaled_dot_product_attention(q, k, v).reshape(B, H, W, N, D)
+        out = out.permute(0, 2, 3, 1, 4).reshape(B, W * N, H * D)
+        return self.to_out(out).transpose(1, 2) + residual
+
+
+class OnnxSnake1d(torch.nn.Module):
+    """
+    ONNXに書き出すためのSnake1d。
+
+    Snake1dのsnake関数はtorch.jit.scriptで変換されており、トレースすると入力の形が固定されてしまう。
+    """
+
+    def __init__(self, module: Snake1d):
+        super().__init__()
+        self.alpha = module.alpha
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return x + (self.alpha + 1e-9).reciprocal() * torch.sin(self.alpha * x).pow(2)
+
+
+def _plain_conv(module):
+    """weight normを適用したConv1d / ConvTranspose1dと同じ計算をする、通常のモジュールを作る。"""
+    kwargs = dict(
+        stride=module.stride,
+        padding=module.padding,
+        dilation=module.dilation,
+        groups=module.groups,
+        bias=module.bias is not None,
+    )
+    if isinstance(module, torch.nn.ConvTranspose1d):
+        plain = torch.nn.ConvTranspose1d(
+            module.in_channels, module.out_channels, module.kernel_size, output_padding=module.output_padding, **kwargs
+        )
+    else:
+        plain = torch.nn.Conv1d(module.in_channels, module.out_channels, module.kernel_size, **kwargs)
+
+    with torch.no_grad():
+        plain.weight.copy_(module.weight)
+        if module.bias is not None:
+            plain.bias.copy_(module.bias)
+    return plain
+
+
+def prepare_for_export(model):
+    """
+    書き出し用にモデルをコピーし、weight normを重みに畳み込む。
+
+    レジストリで共有されているモデルを書き換えないよう、必ずコピーに対して行う。
+    parametrize.remove_parametrizationsはコピー元と共有しているクラスを書き換えてしまうため、
+    weight normを適用した層は通常の層に置き換える。
+    """
+    model = copy.deepcopy(model).cpu().eval()
+    for name, module in list(model.named_modules()):
+        if parametrize.is_parametrized(module, "weight"):
+            parent_name, _, child_name = name.rpartition(".")
+            parent = model.get_submodule(parent_name) if parent_name else model
+            setattr(parent, child_name, _plain_conv(module))
+    return model
+
+
+def prepare_for_onnx(model):
+    """
+    prepare_for_exportで準備したモデルをコピーし、長さを可変にして書き出せない層をONNX用の層に置き換える。
+
+    TorchScriptの書き出しと量子化では元の層をそのまま使うため、ONNXの書き出しの時だけ行う。
+    """
+    model = copy.deepcopy(model)
+    for name, module in list(model.named_modules()):
+        parent_name, _, child_name = name.rpartition(".")
+        parent = model.get_submodule(parent_name) if parent_name else model
+        if isinstance(module, LocalMHA):
+            setattr(parent, child_name, OnnxLocalMHA(module))
+        elif isinstance(module, Snake1d):
+            setattr(parent, child_name, OnnxSnake1d(module))
+    return model
+
+
+def _example_inputs(model, seconds: float):
+    pad_to = get_pad_multiple(model)
+    length = max(round(seconds * model.sampling_rate / pad_to), 1) * pad_to
+    audio = torch.randn(1, 1, length) * 0.1
+    with torch.inference_mode():
+        codes = model.encode(audio)
+    return audio, tuple(code.clone() for code in codes)
+
+
+def write_metadata(model, output_dir: str, model_name: str, formats: List[str]):
+    """書き出したモデルの読み込みに必要な情報を保存する。"""
+    metadata = {
+        "model_name": model_name,
+        "sampling_rate": int(model.sampling_rate),
+        "hop_length": int(model.hop_length),
+        "vq_strides": list(model.vq_strides),
+        "attn_window_size": model.attn_window_size,
+        "formats": formats,
+    }
+    with open(os.path.join(output_dir, METADATA_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=4)
+
+
+def export_torchscript(model, output_dir: str, example_seconds: float = 1.0) -> List[str]:
+    """
+    エンコーダーとデコーダーをTorchScriptにトレースして保存する。
+
+    Args:
+        model (SNAC): prepare_for_exportで準備したモデル
+        output_dir (str): 出力先のディレクトリ
+        example_seconds (float, optional): トレースに使う音声の長さ（秒）。デフォルトは1.0
+
+    Returns:
+        List[str]: 保存したファイルのパス
+    """
+    audio, codes = _example_inputs(model, example_seconds)
+    paths = [os.path.join(output_dir, ENCODER_TORCHSCRIPT), os.path.join(output_dir, DECODER_TORCHSCRIPT)]
+    with torch.no_grad():
+        encoder = torch.jit.trace(EncoderGraph(model), audio, check_trace=False)
+        decoder = torch.jit.trace(DecoderGraph(model), codes, check_trace=False)
+    torch.jit.save(encoder, paths[0])
+    torch.jit.save(decoder, paths[1])
+    return paths
+
+
+def export_onnx(model, output_dir: str, example_seconds: float = 1.0, opset_version: int = 17) -> List[str]:
+    """
+    エンコーダーとデコーダーをONNXに書き出す。バッチと長さの次元は可変にする。
+
+    Args:
+        model (SNAC): prepare_for_exportで準備したモデル
+        output_dir (str): 出力先のディレクトリ
+        example_seconds (float, optional): 書き出しに使う音声の長さ（秒）。デフォルトは1.0
+        opset_version (int, optional): ONNXのopsetのバージョン。デフォルトは17
+
+    Returns:
+        List[str]: 保存したファイルのパス
+    """
+    audio, codes = _example_inputs(model, example_seconds)
+    model = prepare_for_onnx(model)
+    code_names = [f"codes_{i}" for i in range(len(codes))]
+    paths = [os.path.join(output_dir, ENCODER_ONNX), os.path.join(output_dir, DECODER_ONNX)]
+
+    with torch.no_grad():
+        torch.onnx.export(
+            EncoderGraph(model),
+            (audio,),
+            paths[0],
+            input_names=["audio"],
+            output_names=code_names,
+            dynamic_axes={"audio": {0: "batch", 2: "samples"}, **{name: {0: "batch", 1: name} for name in code_names}},
+            opset_version=opset_version,
+            dynamo=False,
+        )
+        torch.onnx.export(
+            DecoderGraph(model),
+            codes,
+            paths[1],
+            input_names=code_names,
+            output_names=["audio"],
+            dynamic_axes={"audio": {0: "batch", 2: "samples"}, **{name: {0: "batch", 1: name} for name in code_names}},
+            opset_version=opset_version,
+            dynamo=False,
+        )
+    return paths
+
+
+def export_snac(model, output_dir: str, formats: List[str], model_name: str = "", example_seconds: float = 1.0) -> List[str]:
+    """
+    モデルを指定された形式で書き出す。
+
+    Args:
+        model (SNAC): 書き出すモデル（コピーしてから書き出すため、元のモデルは変更されない）
+        output_dir (str): 出力先のディレクトリ
+        formats (List[str]): "torchscript" と "onnx" のいずれか、または両方
+        model_name (str, optional): メタデータに記録するモデルの名前
+        example_seconds (float, optional): トレースに使う音声の長さ（秒）。デフォルトは1.0
+
+    Returns:
+        List[str]: 保存したファイルのパス
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    model = prepare_for_export(model)
+
+    paths = []
+    if "torchscript" in formats:
+        paths += export_torchscript(model, output_dir, example_seconds)
+    if "onnx" in formats:
+        paths += export_onnx(model, output_dir, example_seconds)
+    write_metadata(model, output_dir, model_name, formats)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SNACのエンコーダーとデコーダーをTorchScript/ONNXに書き出します。")
+    parser.add_argument("--model-name", default="hubertsiuzdak/snac_44khz")
+    parser.add_argument("--output-dir", default="models/snac_44khz")
+    parser.add_argument("--format", nargs="+", choices=["torchscript", "onnx"], default=["torchscript", "onnx"])
+    parser.add_argument("--example-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    model = get_snac_model(args.model_name, "cpu")
+    paths = export_snac(model, args.output_dir, args.format, args.model_name, args.example_seconds)
+    for path in paths:
+        print(f"{path}に保存しました。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+SNACモデルをプロセス内で共有するためのレジストリ。
+
+モデルは「モデル名とデバイス」の組ごとに1度だけロードされ、SNACEncoderとSNACDecoderで同じインスタンスを使う。
+メモリの上限を指定した場合は、最も長く使われていないモデルから解放する（LRU）。
+
+上限は環境変数 SNAC_REGISTRY_MAX_MB（MB単位）でも指定できる。
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple, Union
+
+import torch
+from snac import SNAC
+
+
+def _load_snac(model_name: str, device: torch.device) -> SNAC:
+    return SNAC.from_pretrained(model_name).eval().to(device)
+
+
+def get_model_size(model: torch.nn.Module) -> int:
+    """
+    モデルのパラメータとバッファの合計サイズ（バイト）を返す。
+
+    Args:
+        model (torch.nn.Module): 対象のモデル
+
+    Returns:
+        int: 合計サイズ（バイト）
+    """
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+class SNACModelRegistry:
+    """
+    SNACモデルを遅延ロードして共有するクラス。
+
+    スレッドセーフで、同じキーのモデルが同時に要求された場合もロードは1回だけ行う。
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: Optional[int] = None,
+        loader: Optional[Callable[[str, torch.device], torch.nn.Module]] = None,
+    ):
+        """
+        Args:
+            max_memory_bytes (int, optional): ロード済みモデルの合計サイズの上限（バイト）。Noneの場合は上限なし
+            loader (Callable, optional): (モデル名, デバイス) からモデルをロードする関数。デフォルトはSNAC.from_pretrained
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self._loader = loader or _load_snac
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(model_name: str, device: Union[str, torch.device, None]) -> Tuple[str, str]:
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        return model_name, str(torch.device(device))
+
+    def get(self, model_name: str, device: Union[str, torch.device, None] = None) -> torch.nn.Module:
+        """
+        モデルを取得する。未ロードの場合はロードしてから返す。
+
+        Args:
+            model_name (str): モデルの名前（例: "hubertsiuzdak/snac_44khz"）
+            device (str | torch.device, optional): デバイス。Noneの場合はCUDAが使えればCUDA、それ以外はCPU
+
+        Returns:
+            torch.nn.Module: 評価モードのモデル
+        """
+        key = self._key(model_name, device)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            model = self._loader(key[0], torch.device(key[1]))
+            self.loads += 1
+            self._models[key] = model
+            self._sizes[key] = get_model_size(model)
+            self._evict(keep=key)
+            return model
+
+    def _evict(self, keep: Tuple[str, str]):
+        """上限を超えている間、最も長く使われていないモデルを解放する。直前にロードしたモデルは残す。"""
+        if self.max_memory_bytes is None:
+            return
+        while self.memory_bytes() > self.max_memory_bytes and len(self._models) > 1:
+            key = next(iter(self._models))
+            if key == keep:
+                break
+            del self._models[key]
+            del self._sizes[key]
+            self.evictions += 1
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def memory_bytes(self) -> int:
+        """ロード済みモデルの合計サイズ（バイト）を返す。"""
+        return sum(self._sizes.values())
+
+    def loaded(self) -> list:
+        """ロード済みモデルの (モデル名, デバイス) のリストを、古く使われた順に返す。"""
+        with self._lock:
+            return list(self._models)
+
+    def clear(self):
+        """ロード済みのモデルをすべて解放する。"""
+        with self._lock:
+            self._models.clear()
+            self._sizes.clear()
+
+
+def _default_max_memory() -> Optional[int]:
+    value = os.getenv("SNAC_REGISTRY_MAX_MB")
+    return int(float(value) * 1024 * 1024) if value else None
+
+
+_registry = SNACModelRegistry(max_memory_bytes=_default_max_memory())
+
+
+def get_registry() -> SNACModelRegistry:
+    """プロセス全体で共有されるレジストリを返す。"""
+    return _registry
+
+
+def get_snac_model(model_name: str, device: Union[str, torch.device, None] = None) -> torch.nn.Module:
+    """
+    共有レジストリからSNACモデルを取得する。
+
+    Args:
+        model_name (str): モデルの名前
+        device (str | torch.device, optional): デバイス
+
+    Returns:
+        torch.nn.Module: 評価モードのSNACモデル
+    """
+    return _registry.get(model_name, device)
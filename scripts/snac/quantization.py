@@ -0,0 +1,221 @@
+"""
+SNACモデルをint8に量子化してCPUで実行するモジュール。
+
+- "dynamic": Linear層（局所アテンション）の重みをint8にし、活性はその場で量子化する（キャリブレーション不要）
+- "static": "dynamic" に加えて、Conv1d層を1層ずつ量子化・逆量子化で挟み、キャリブレーション用の音声で
+  活性の範囲を求めてからint8で実行する。Snakeなどの活性化関数や転置畳み込みはfp32のまま
+
+量子化はレジストリで共有されているモデルのコピーに対して行う。
+速度と品質のトレードオフは、fp32とのコードの一致率と、エンコード→decode_to_audio_44kHzを通した波形のSNRで確認する。
+
+python -m scripts.snac.quantization --mode dynamic static --audio data/test_input_audio.wav
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+import soundfile as sf
+import torch
+import torchaudio
+from torch.ao.quantization import DeQuantStub, QuantStub, convert, get_default_qconfig, prepare, quantize_dynamic
+
+from scripts.snac.export import prepare_for_export
+from scripts.snac.model_registry import get_snac_model
+from scripts.utils.audio_utils import prepare_snac_input
+
+QUANTIZATION_MODES = ("dynamic", "static")
+
+# キャリブレーション用の音声を指定しない場合に共有する量子化済みモデル
+_quantized_models = {}
+
+
+class _QuantizedLayer(torch.nn.Module):
+    """1つの層の入力を量子化し、出力を逆量子化して、前後の層をfp32のまま使えるようにする。"""
+
+    def __init__(self, layer: torch.nn.Module):
+        super().__init__()
+        self.quant = QuantStub()
+        self.layer = layer
+        self.dequant = DeQuantStub()
+
+    def forward(self, x):
+        return self.dequant(self.layer(self.quant(x)))
+
+
+def _quantized_engine() -> str:
+    engines = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in engines:
+            return engine
+    raise RuntimeError("int8量子化に対応したバックエンドがありません。")
+
+
+def default_calibration_audio(sample_rate: int = 44100, seconds: float = 2.0) -> List[torch.Tensor]:
+    """
+    キャリブレーション用の合成音声（正弦波のスイープ、ノイズ、無音を含む）を作成する。
+
+    実際のデータセットの音声を使った方が活性の範囲を正確に求められるため、可能であれば音声を指定すること。
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    sweep = np.sin(2 * np.pi * (100 + 2000 * t / seconds) * t)
+    clips = [0.5 * sweep, 0.1 * rng.standard_normal(t.size), 0.3 * sweep + 0.05 * rng.standard_normal(t.size), np.zeros(t.size)]
+    return [torch.from_numpy(clip.astype(np.float32)).view(1, 1, -1) for clip in clips]
+
+
+def quantize_snac(model, mode: str = "dynamic", calibration: Optional[List[torch.Tensor]] = None):
+    """
+    SNACモデルのint8量子化版を作成する。
+
+    Args:
+        model (SNAC): 量子化するモデル（コピーしてから量子化するため、元のモデルは変更されない）
+        mode (str, optional): "dynamic" または "static"。デフォルトは"dynamic"
+        calibration (List[torch.Tensor], optional): "static" で使う (1, 1, T) の音声のリスト。
+            モデルのサンプリングレートに揃えておくこと。デフォルトは合成音声
+
+    Returns:
+        SNAC: CPUで実行する量子化済みのモデル
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode} (choose from {', '.join(QUANTIZATION_MODES)})")
+
+    torch.backends.quantized.engine = _quantized_engine()
+    # weight normを畳み込んだコピー（量子化は通常のConv1d / Linearに対して行う）
+    model = prepare_for_export(model)
+
+    if mode == "static":
+        qconfig = get_default_qconfig(torch.backends.quantized.engine)
+        for name, module in list(model.named_modules()):
+            if type(module) is torch.nn.Conv1d:
+                parent_name, _, child_name = name.rpartition(".")
+                parent = model.get_submodule(parent_name) if parent_name else model
+                wrapper = _QuantizedLayer(module)
+                wrapper.qconfig = qconfig
+                setattr(parent, child_name, wrapper)
+
+        prepare(model, inplace=True)
+        # 活性の範囲を求めるため、エンコーダーとデコーダーの両方に音声を通す
+        with torch.inference_mode():
+            for audio in calibration or default_calibration_audio(model.sampling_rate):
+                model.decode(model.encode(audio))
+        convert(model, inplace=True)
+
+    quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model.eval()
+
+
+def get_quantized_snac(model_name: str, mode: str = "dynamic", calibration: Optional[List[torch.Tensor]] = None):
+    """
+    量子化済みのSNACモデルを取得する。キャリブレーション用の音声を指定しない場合は、プロセス内で共有する。
+
+    Args:
+        model_name (str): モデルの名前
+        mode (str, optional): "dynamic" または "static"。デフォルトは"dynamic"
+        calibration (List[torch.Tensor], optional): "static" で使う音声のリスト
+
+    Returns:
+        SNAC: 量子化済みのモデル
+    """
+    if calibration is not None:
+        return quantize_snac(get_snac_model(model_name, "cpu"), mode, calibration)
+
+    key = (model_name, mode)
+    if key not in _quantized_models:
+        _quantized_models[key] = quantize_snac(get_snac_model(model_name, "cpu"), mode)
+    return _quantized_models[key]
+
+
+def signal_to_noise_ratio(reference: np.ndarray, estimate: np.ndarray) -> float:
+    """
+    参照波形に対するSNR（dB）を求める。長さは短い方に揃える。
+    """
+    length = min(len(reference), len(estimate))
+    reference = reference[:length]
+    noise = reference - estimate[:length]
+    return float(10 * np.log10(np.sum(reference ** 2) / max(np.sum(noise ** 2), 1e-12)))
+
+
+def fidelity_report(clips: list, reference: tuple, candidate: tuple) -> dict:
+    """
+    量子化したエンコーダー・デコーダーをfp32と比較する。
+
+    - コードの一致率: 同じ音声をエンコードしたときに、fp32と同じコードになった割合（階層ごと）
+    - SNR: 入力音声に対する、エンコード→decode_to_audio_44kHz→読み込みを通した波形のSNR（dB）
+    - 時間: エンコードとデコードにかかった時間（秒）
+
+    Args:
+        clips (list): (waveform, sample_rate) のタプルのリスト
+        reference (tuple): fp32の (SNACEncoder, SNACDecoder)
+        candidate (tuple): 量子化した (SNACEncoder, SNACDecoder)
+
+    Returns:
+        dict: "code_agreement"（階層ごとの一致率）, "reference" と "candidate" の "snr_db", "encode_seconds", "decode_seconds"
+    """
+    matches, totals = None, None
+    results = {"reference": [], "candidate": []}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = os.path.join(tmpdir, "roundtrip.wav")
+        for waveform, sample_rate in clips:
+            source = prepare_snac_input(waveform, sample_rate, 44100, "cpu").flatten().numpy()
+
+            layer_codes = {}
+            for label, (encoder, decoder) in (("reference", reference), ("candidate", candidate)):
+                start = time.perf_counter()
+                codes = encoder.encode_waveform(waveform, sample_rate)
+                encode_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                decoder.decode_to_audio_44kHz(decoder.parse_snac_tokens(encoder.make_snac_tokens(codes)), output_path)
+                decode_seconds = time.perf_counter() - start
+
+                decoded, _ = sf.read(output_path, dtype="float32")
+                layer_codes[label] = codes
+                results[label].append((signal_to_noise_ratio(source, decoded), encode_seconds, decode_seconds))
+
+            pairs = list(zip(layer_codes["reference"], layer_codes["candidate"]))
+            clip_matches = [int((a.cpu() == b.cpu()).sum()) for a, b in pairs]
+            clip_totals = [a.numel() for a, _ in pairs]
+            matches = clip_matches if matches is None else [m + c for m, c in zip(matches, clip_matches)]
+            totals = clip_totals if totals is None else [t + c for t, c in zip(totals, clip_totals)]
+
+    report = {"code_agreement": [round(m / t, 4) for m, t in zip(matches, totals)]}
+    for label, values in results.items():
+        snr, encode_seconds, decode_seconds = zip(*values)
+        report[label] = {
+            "snr_db": round(float(np.mean(snr)), 2),
+            "encode_seconds": round(sum(encode_seconds), 3),
+            "decode_seconds": round(sum(decode_seconds), 3),
+        }
+    return report
+
+
+def main():
+    from scripts.snac.snac_module import SNACDecoder, SNACEncoder
+
+    parser = argparse.ArgumentParser(description="int8量子化したSNACとfp32を比較します。")
+    parser.add_argument("--mode", nargs="+", choices=QUANTIZATION_MODES, default=list(QUANTIZATION_MODES))
+    parser.add_argument("--audio", nargs="*", default=[], help="比較に使う音声ファイル（省略時は合成音声）")
+    args = parser.parse_args()
+
+    if args.audio:
+        clips = [tuple(torchaudio.load(path)) for path in args.audio]
+    else:
+        clips = [(audio.flatten().numpy(), 44100) for audio in default_calibration_audio(seconds=3.0)[:3]]
+
+    reference = (SNACEncoder(), SNACDecoder())
+    for mode in args.mode:
+        candidate = (SNACEncoder(quantize=mode), SNACDecoder(quantize=mode))
+        report = fidelity_report(clips, reference, candidate)
+        print(f"[{mode}]")
+        print(f"  code agreement per layer : {report['code_agreement']}")
+        for label in ("reference", "candidate"):
+            r = report[label]
+            print(f"  {label:<9}: SNR {r['snr_db']:6.2f} dB, encode {r['encode_seconds']:.2f} s, decode {r['decode_seconds']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
+import math
 import torch
 import soundfile as sf
 import torchaudio
 from snac import SNAC
-from scripts.utils.snac_utils import generate_audio_data, log_device_info
+from scripts.utils.snac_utils import (
+    generate_audio_data,
+    log_device_info,
+    get_code_lengths,
+    get_pad_multiple,
+    interleave_codes,
+    render_snac_tokens,
+)
+from scripts.utils.audio_utils import prepare_snac_input
+from scripts.snac.model_registry import get_snac_model
+from scripts.snac.backends import load_snac_backend
+from scripts.snac.streaming import encode_chunked, iter_decode_chunked
 
 
 class SNACDecoder:
@@ -13,14 +25,19 @@ class SNACDecoder:
     音声データを生成し、指定されたパスに保存します。
     """
 
-    def __init__(self):
+    def __init__(self, backend: str = "eager", export_dir: str = None, quantize: str = None):
         """
         クラスの初期化メソッド。
 
         Args:
-            model_name (str, optional): 使用するSNACモデルの名前。デフォルトは "hubertsiuzdak/snac_24khz"。
+            backend (str, optional): 44kHzモデルの実行方式。"eager", "torchscript", "onnx" のいずれか。デフォルトは"eager"
+            export_dir (str, optional): scripts/snac/export.py で書き出したモデルのディレクトリ（torchscript / onnx の場合）
+            quantize (str, optional): "dynamic" または "static" の場合、int8に量子化した44kHzモデルをCPUで使う
         """
         self.model_name = "hubertsiuzdak/snac_44khz"
+        self.backend = backend
+        self.export_dir = export_dir
+        self.quantize = quantize
         self.device = self._setup_device()
         self.snac_model = self._load_model()
 
@@ -29,11 +46,13 @@ class SNACDecoder:
         使用可能なデバイスを設定する。
 
         GPUが利用可能であればCUDAを、それ以外の場合はCPUを使用する。
+        書き出したモデル（torchscript / onnx）と量子化したモデルはCPUで実行する。
 
         Returns:
             torch.device: 設定されたデバイス。
         """
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        use_cuda = torch.cuda.is_available() and self.backend == "eager" and not self.quantize
+        device = torch.device("cuda" if use_cuda else "cpu")
         log_device_info(device)
         return device
 
@@ -41,11 +60,12 @@ class SNACDecoder:
         """
         事前学習済みのSNACモデルをロードする。
 
+        モデルはレジストリで共有されるため、SNACEncoderと同じインスタンスを使う。
+
         Returns:
             SNAC: ロードされたSNACモデル。
         """
-        model = SNAC.from_pretrained(self.model_name).eval().to(self.device)
-        return model
+        return load_snac_backend(self.model_name, self.device, self.backend, self.export_dir, self.quantize)
 
     def parse_snac_tokens(self, input_str: str) -> list:
         """
@@ -59,14 +79,19 @@ class SNACDecoder:
         """
         return input_str.split(" ")
 
-    def decode_to_audio_44kHz(self, snac_tokens: list, output_path: str) -> None:
+    def decode_to_audio_44kHz(self, snac_tokens: list, output_path: str, chunk_seconds: float = None) -> None:
         """
         SNACトークンを音声データにデコードし、ファイルに保存する。
 
         Args:
             snac_tokens (list): デコードするSNACトークンのリスト。
             output_path (str): 出力する音声ファイルのパス。
+            chunk_seconds (float, optional): 指定した場合、この長さのチャンクごとにデコードしてファイルに追記する。
         """
+        if chunk_seconds:
+            self._decode_chunked_to_file(snac_tokens, self.snac_model, output_path, 44100, chunk_seconds)
+            return
+
         # SNACトークンから音声データを生成する
         audio_hat = generate_audio_data(snac_tokens, self.snac_model, self.device)
 
@@ -79,16 +104,20 @@ class SNACDecoder:
 
         print(f"音声データを{output_path}に保存しました。")
     
-    def decode_to_audio_24kHz(self, snac_tokens: list, output_path: str) -> None:
+    def decode_to_audio_24kHz(self, snac_tokens: list, output_path: str, chunk_seconds: float = None) -> None:
         """
         SNACトークンを音声データにデコードし、ファイルに保存する。
 
         Args:
             snac_tokens (list): デコードするSNACトークンのリスト。
             output_path (str): 出力する音声ファイルのパス。
+            chunk_seconds (float, optional): 指定した場合、この長さのチャンクごとにデコードしてファイルに追記する。
         """
-
-        snacmodel = SNAC.from_pretrained("hubertsiuzdak/snac_24khz").eval().to(self.device)
+        # 24kHzモデルは初回の呼び出し時に1度だけロードされる
+        snacmodel = get_snac_model("hubertsiuzdak/snac_24khz", self.device)
+        if chunk_seconds:
+            self._decode_chunked_to_file(snac_tokens, snacmodel, output_path, 24000, chunk_seconds)
+            return
         # SNACトークンから音声データを生成する
         audio_hat = generate_audio_data(snac_tokens, snacmodel, self.device)
 
@@ -101,82 +130,144 @@ class SNACDecoder:
 
         print(f"音声データを{output_path}に保存しました。")
 
+    def _decode_chunked_to_file(self, snac_tokens: list, snacmodel: SNAC, output_path: str, sample_rate: int, chunk_seconds: float) -> None:
+        """
+        SNACトークンをチャンクごとにデコードし、デコードできた分から順にファイルに書き込む。
+
+        音声全体をメモリ上に持たないため、長い音声でもメモリ使用量はチャンクの長さで決まる。
+        """
+        with sf.SoundFile(output_path, "w", samplerate=sample_rate, channels=1) as f:
+            # 1チャンク分ずつデコードし、次のチャンクをデコードする前に書き込む
+            for audio in iter_decode_chunked(snacmodel, snac_tokens, chunk_seconds=chunk_seconds):
+                f.write(audio.squeeze(0).squeeze(0).cpu().numpy())
+
+        print(f"音声データを{output_path}に保存しました。")
+
 class SNACEncoder:
     """
     音声ファイルをSNACトークンにエンコードするクラス。
     """
 
-    def __init__(self):
+    def __init__(self, backend: str = "eager", export_dir: str = None, quantize: str = None):
         """
         初期化メソッド。
 
-        :param audio_path: 読み込む音声ファイルのパス
-        :param output_path: 出力する音声ファイルのパス
+        :param backend: モデルの実行方式。"eager", "torchscript", "onnx" のいずれか（torchscript / onnx はCPUのみ）
+        :param export_dir: scripts/snac/export.py で書き出したモデルのディレクトリ（torchscript / onnx の場合）
+        :param quantize: "dynamic" または "static" の場合、int8に量子化したモデルをCPUで使う
         """
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model = SNAC.from_pretrained("hubertsiuzdak/snac_44khz").eval().to(self.device)
+        use_cuda = torch.cuda.is_available() and backend == "eager" and not quantize
+        self.device = torch.device("cuda" if use_cuda else "cpu")
+        self.model_name = "hubertsiuzdak/snac_44khz"
+        self.backend = backend
+        self.export_dir = export_dir
+        self.quantize = quantize
+        self.model = load_snac_backend(self.model_name, self.device, backend, export_dir, quantize)
 
-    def encode_to_tokens(self, audio_path: str):
+    def encode_to_tokens(self, audio_path: str, chunk_seconds: float = None):
         """
         音声ファイルを処理し、エンコードを行うメソッド。
+
+        chunk_secondsを指定した場合は、長い音声をチャンクに分けてエンコードする（encode_waveformを参照）。
         """
         # 音声ファイルを読み込み
         waveform, sample_rate = torchaudio.load(audio_path)
-        waveform = waveform.unsqueeze(0).to(self.device)  # バッチ次元を追加してGPUに転送
         log_device_info(self.device)
 
+        return self.encode_waveform(waveform, sample_rate, chunk_seconds=chunk_seconds)
+
+    def encode_waveform(self, waveform, sample_rate: int, chunk_seconds: float = None):
+        """
+        メモリ上の波形を直接エンコードするメソッド。
+
+        モノラルへのダウンミックスと44.1kHzへのリサンプリングを行ってから
+        モデルに渡すため、音声合成の出力をファイルを経由せずに渡せる。
+
+        Args:
+            waveform (np.ndarray | torch.Tensor): 形状が (T,) または (C, T) の波形
+            sample_rate (int): 波形のサンプリングレート
+            chunk_seconds (float, optional): 指定した場合、この長さのチャンクに分けて順にエンコードする。
+                チャンクの境界はモデルのパディング単位に揃え、前後に重なりを付けるため、
+                1回でエンコードした場合と同じ長さのコードが得られ、メモリ使用量は音声の長さに依存しない
+
+        Returns:
+            list: 各階層のSNACコードのテンソルのリスト
+        """
+        waveform = prepare_snac_input(waveform, sample_rate, self.model.sampling_rate, self.device)
+        if chunk_seconds:
+            return encode_chunked(self.model, waveform, chunk_seconds=chunk_seconds)
 
         # モデルを使用してエンコード
         with torch.inference_mode():
             tokens = self.model.encode(waveform)
-        
+
         return tokens
-    
+
+    def encode_batch(self, inputs: list, max_batch_size: int = 8) -> list:
+        """
+        複数の音声をまとめてエンコードするメソッド。
+
+        音声を長さ順に並べて近い長さのものを同じバッチにまとめ、モデルのパディング単位に
+        揃えてから1回のforwardでエンコードする。各音声のコードは、単独でエンコードした場合と
+        同じフレーム数に切り詰めて返す。音声の末尾より後ろ（パディングのみ）のフレームは、
+        単独でエンコードした場合と値が異なることがある。
+
+        Args:
+            inputs (list): 音声ファイルのパス、または (waveform, sample_rate) のタプルのリスト
+            max_batch_size (int, optional): 1回のforwardでエンコードする音声の最大数。デフォルトは8
+
+        Returns:
+            list: 入力と同じ順序の、各音声のSNACコードのテンソルのリスト
+        """
+        waveforms = []
+        for item in inputs:
+            if isinstance(item, str):
+                waveform, sample_rate = torchaudio.load(item)
+            else:
+                waveform, sample_rate = item
+            # (1, 1, T) -> (1, T)
+            waveforms.append(prepare_snac_input(waveform, sample_rate, self.model.sampling_rate, self.device)[0])
+
+        pad_to = get_pad_multiple(self.model)
+        order = sorted(range(len(waveforms)), key=lambda i: waveforms[i].size(-1))
+        results = [None] * len(waveforms)
+
+        for start in range(0, len(order), max_batch_size):
+            bucket = order[start:start + max_batch_size]
+            padded_length = math.ceil(max(waveforms[i].size(-1) for i in bucket) / pad_to) * pad_to
+
+            # 同じ長さにゼロ埋めしてバッチを作る
+            batch = torch.zeros(len(bucket), 1, padded_length, device=self.device)
+            for row, i in enumerate(bucket):
+                batch[row, :, :waveforms[i].size(-1)] = waveforms[i]
+
+            with torch.inference_mode():
+                codes = self.model.encode(batch)
+
+            # 各音声の本来のフレーム数に切り詰める
+            for row, i in enumerate(bucket):
+                lengths = get_code_lengths(waveforms[i].size(-1), self.model)
+                results[i] = [code[row:row + 1, :length] for code, length in zip(codes, lengths)]
+
+        return results
+
     # テンソルのリストを一つの文字列に変換する関数
-    def make_snac_tokens(self, tensor_list:list):
+    def make_snac_tokens(self, tensor_list: list, as_array: bool = False):
         """
         音声からエンコードされたトークンを、データセット用に再構築するメソッド
+
+        4階層のコードをNumPyの1回の並べ替えでフレームごとに並べる。
+
+        Args:
+            tensor_list (list): encode_to_tokensなどが返す各階層のコード
+            as_array (bool, optional): Trueの場合、文字列にせず (フレーム数, 15) の整数配列を返す
+
+        Returns:
+            str | np.ndarray: "# t1 t2 ... # ..." 形式の文字列、または整数配列
         """
-        flattened_output = []
-
-        # 各テンソルから値を取り出してリストに格納
-        tensor1_values = tensor_list[0].cpu().tolist()[0]  # 28個の要素
-        tensor2_values = tensor_list[1].cpu().tolist()[0]  # 56個の要素
-        tensor3_values = tensor_list[2].cpu().tolist()[0]  # 112個の要素
-        tensor4_values = tensor_list[3].cpu().tolist()[0]  # 224個の要素
-
-        idx_t1 = 0
-        idx_t2 = 0
-        idx_t3 = 0
-        idx_t4 = 0
-
-        max_iterations = len(tensor1_values)  # ループ回数を28回に設定
-
-        for _ in range(max_iterations):
-            flattened_output.extend([
-                '#',
-                str(tensor1_values[idx_t1]),
-                str(tensor2_values[idx_t2]),
-                str(tensor3_values[idx_t3]),
-                str(tensor4_values[idx_t4]),
-                str(tensor4_values[idx_t4 + 1]),
-                str(tensor3_values[idx_t3 + 1]),
-                str(tensor4_values[idx_t4 + 2]),
-                str(tensor4_values[idx_t4 + 3]),
-                str(tensor2_values[idx_t2 + 1]),
-                str(tensor3_values[idx_t3 + 2]),
-                str(tensor4_values[idx_t4 + 4]),
-                str(tensor4_values[idx_t4 + 5]),
-                str(tensor3_values[idx_t3 + 3]),
-                str(tensor4_values[idx_t4 + 6]),
-                str(tensor4_values[idx_t4 + 7]),
-            ])
-
-            idx_t1 += 1
-            idx_t2 += 2
-            idx_t3 += 4
-            idx_t4 += 8
-
-        # flattened_outputリストをスペースで区切って1つの文字列に変換
-        result_string = ' '.join(flattened_output)
-        return result_string
\ No newline at end of file
+        frames = interleave_codes(tensor_list)
+        if as_array:
+            return frames
+
+        # "#"で始まるフレームをスペースで区切って1つの文字列に変換
+        return render_snac_tokens(frames)
@@ -0,0 +1,314 @@
+"""
+SNACトークンをバイナリ形式で保存・読み込みするモジュール。
+
+SNACのコードは12bit（0〜4095）に収まるため、10進数の文字列ではなく階層ごとのuint16配列として保存する。
+ファイルはメモリマップで開き、任意の行のコードにO(1)でアクセスできる。
+
+ファイルの構成:
+    - マジック (8バイト) b"SNACBIN1"
+    - ヘッダー長 (uint32, little endian) とJSONヘッダー（8バイト境界まで0埋め）
+    - フレームのオフセット (int64, 行数 + 1)
+    - codec="raw" の場合: 階層ごとのuint16配列（全行を連結）
+    - codec="zstd" の場合: 圧縮データのバイトオフセット (int64, 行数 + 1) と、行ごとのzstdフレーム
+
+python -m scripts.snac.snac_store to-bin data/dataset/answer_snac.json answer_snac.snacbin --codec zstd
+python -m scripts.snac.snac_store to-json answer_snac.snacbin answer_snac.json
+"""
+import argparse
+import json
+import struct
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from scripts.utils.snac_utils import deinterleave_frames, interleave_codes, parse_snac_codes, render_snac_tokens
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MAGIC = b"SNACBIN1"
+VERSION = 1
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImportError("codec='zstd' を使用するには zstandard をインストールしてください: pip install zstandard")
+
+
+def _align(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def write_snac_store(path: str, rows: Iterable, codec: str = "raw", level: int = 3) -> int:
+    """
+    SNACトークンの行をバイナリ形式で書き込む。
+
+    Args:
+        path (str): 出力するファイルのパス
+        rows (Iterable): 各行のトークン。"#"区切りの文字列、split済みのリスト、
+            (フレーム数, 7 | 15) の配列のいずれか。Noneの行はnullとして記録する
+        codec (str, optional): "raw" または "zstd"。デフォルトは"raw"
+        level (int, optional): zstdの圧縮レベル。デフォルトは3
+
+    Returns:
+        int: 書き込んだ行数
+    """
+    if codec not in ("raw", "zstd"):
+        raise ValueError(f"Unknown codec: {codec}")
+    if codec == "zstd":
+        _require_zstandard()
+
+    frames_list: List[Optional[np.ndarray]] = []
+    null_rows = []
+    frame_width = None
+    for i, row in enumerate(rows):
+        if row is None:
+            null_rows.append(i)
+            frames_list.append(None)
+            continue
+        frames = parse_snac_codes(row)
+        if frame_width is None:
+            frame_width = frames.shape[1]
+        elif frames.shape[1] != frame_width:
+            raise ValueError(f"Row {i} has {frames.shape[1]} tokens per frame, expected {frame_width}")
+        if frames.size and (frames.min() < 0 or frames.max() > 0xFFFF):
+            raise ValueError(f"Row {i} has codes outside the uint16 range")
+        frames_list.append(frames.astype(np.uint16))
+
+    frame_width = frame_width or 15
+    empty = np.empty((0, frame_width), dtype=np.uint16)
+    frames_list = [empty if frames is None else frames for frames in frames_list]
+
+    # 各階層で1フレームあたりのコード数 (1, 2, 4, (8))
+    per_frame = [len(layer) for layer in deinterleave_frames(np.zeros((1, frame_width), dtype=np.uint16))]
+    frame_offsets = np.zeros(len(frames_list) + 1, dtype=np.int64)
+    frame_offsets[1:] = np.cumsum([len(frames) for frames in frames_list])
+
+    header = {
+        "version": VERSION,
+        "codec": codec,
+        "frame_width": frame_width,
+        "per_frame": per_frame,
+        "n_rows": len(frames_list),
+        "null_rows": null_rows,
+    }
+
+    if codec == "raw":
+        layers = [deinterleave_frames(frames) for frames in frames_list]
+        payloads = [
+            np.concatenate([row_layers[k] for row_layers in layers]).astype("<u2") if layers else np.empty(0, "<u2")
+            for k in range(len(per_frame))
+        ]
+    else:
+        compressor = zstandard.ZstdCompressor(level=level)
+        blobs = [
+            compressor.compress(np.concatenate(deinterleave_frames(frames)).astype("<u2").tobytes())
+            for frames in frames_list
+        ]
+        byte_offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        byte_offsets[1:] = np.cumsum([len(blob) for blob in blobs])
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    index_offset = _align(len(MAGIC) + 4 + len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (index_offset - f.tell()))
+        f.write(frame_offsets.astype("<i8").tobytes())
+        if codec == "raw":
+            for payload in payloads:
+                f.write(payload.tobytes())
+        else:
+            f.write(byte_offsets.astype("<i8").tobytes())
+            for blob in blobs:
+                f.write(blob)
+
+    return len(frames_list)
+
+
+class SNACTokenStore:
+    """
+    バイナリ形式のSNACトークンをメモリマップで読み込むクラス。
+
+    codec="raw" の場合、各行のコードはファイル上の配列へのビューとして返され、コピーは発生しない。
+    codec="zstd" の場合は、指定された行のzstdフレームだけを展開する。
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): 読み込むファイルのパス
+        """
+        self.path = path
+        self._buffer = np.memmap(path, dtype=np.uint8, mode="r")
+
+        if self._buffer[: len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{path} はSNACトークンのバイナリファイルではありません")
+        (header_length,) = struct.unpack("<I", self._buffer[len(MAGIC): len(MAGIC) + 4].tobytes())
+        header_start = len(MAGIC) + 4
+        self.header = json.loads(self._buffer[header_start: header_start + header_length].tobytes())
+
+        self.codec = self.header["codec"]
+        self.frame_width = self.header["frame_width"]
+        self.per_frame = self.header["per_frame"]
+        self.n_rows = self.header["n_rows"]
+        self._null_rows = set(self.header["null_rows"])
+
+        offset = _align(header_start + header_length)
+        self.frame_offsets = np.frombuffer(self._buffer, dtype="<i8", count=self.n_rows + 1, offset=offset)
+        offset += self.frame_offsets.nbytes
+        total_frames = int(self.frame_offsets[-1])
+
+        if self.codec == "raw":
+            self._layers = []
+            for n in self.per_frame:
+                layer = np.frombuffer(self._buffer, dtype="<u2", count=total_frames * n, offset=offset)
+                self._layers.append(layer)
+                offset += layer.nbytes
+        else:
+            _require_zstandard()
+            self._byte_offsets = np.frombuffer(self._buffer, dtype="<i8", count=self.n_rows + 1, offset=offset)
+            self._data_offset = offset + self._byte_offsets.nbytes
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def __getitem__(self, index: int) -> Optional[List[np.ndarray]]:
+        return self.get_codes(index)
+
+    def is_null(self, index: int) -> bool:
+        """指定された行がnullとして記録されているかを返す。"""
+        return index in self._null_rows
+
+    def get_codes(self, index: int) -> Optional[List[np.ndarray]]:
+        """
+        指定された行の階層ごとのコードを取得する。
+
+        Args:
+            index (int): 行番号
+
+        Returns:
+            Optional[List[np.ndarray]]: 階層ごとのuint16配列のリスト。nullの行はNone
+        """
+        if index < 0:
+            index += self.n_rows
+        if not 0 <= index < self.n_rows:
+            raise IndexError(index)
+        if index in self._null_rows:
+            return None
+
+        start, end = int(self.frame_offsets[index]), int(self.frame_offsets[index + 1])
+        if self.codec == "raw":
+            return [layer[start * n: end * n] for layer, n in zip(self._layers, self.per_frame)]
+
+        blob_start = self._data_offset + int(self._byte_offsets[index])
+        blob_end = self._data_offset + int(self._byte_offsets[index + 1])
+        data = self._decompressor.decompress(self._buffer[blob_start:blob_end].tobytes())
+        codes = np.frombuffer(data, dtype="<u2")
+
+        layers = []
+        position = 0
+        for n in self.per_frame:
+            length = (end - start) * n
+            layers.append(codes[position: position + length])
+            position += length
+        return layers
+
+    def get_frames(self, index: int) -> Optional[np.ndarray]:
+        """
+        指定された行を (フレーム数, 7 | 15) の配列として取得する。
+
+        Args:
+            index (int): 行番号
+
+        Returns:
+            Optional[np.ndarray]: フレームごとに並べたコード。nullの行はNone
+        """
+        codes = self.get_codes(index)
+        if codes is None:
+            return None
+        if len(codes[0]) == 0:
+            return np.empty((0, self.frame_width), dtype=np.uint16)
+        return interleave_codes(codes)
+
+    def get_tokens(self, index: int) -> Optional[str]:
+        """
+        指定された行を、データセットと同じ "#" 区切りの文字列として取得する。
+
+        Args:
+            index (int): 行番号
+
+        Returns:
+            Optional[str]: SNACトークンの文字列。nullの行はNone
+        """
+        frames = self.get_frames(index)
+        if frames is None:
+            return None
+        return render_snac_tokens(frames)
+
+
+def convert_json_to_store(json_path: str, store_path: str, codec: str = "raw") -> int:
+    """
+    SNACトークン文字列のJSONファイル（answer_snac.jsonなど）をバイナリ形式に変換する。
+
+    Args:
+        json_path (str): 入力するJSONファイルのパス
+        store_path (str): 出力するバイナリファイルのパス
+        codec (str, optional): "raw" または "zstd"。デフォルトは"raw"
+
+    Returns:
+        int: 変換した行数
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    return write_snac_store(store_path, rows, codec=codec)
+
+
+def convert_store_to_json(store_path: str, json_path: str) -> int:
+    """
+    バイナリ形式のSNACトークンを、トークン文字列のJSONファイルに変換する。
+
+    Args:
+        store_path (str): 入力するバイナリファイルのパス
+        json_path (str): 出力するJSONファイルのパス
+
+    Returns:
+        int: 変換した行数
+    """
+    store = SNACTokenStore(store_path)
+    rows = [store.get_tokens(i) for i in range(len(store))]
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False, indent=4)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SNACトークンのJSONとバイナリ形式を相互に変換します。")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    to_bin = subparsers.add_parser("to-bin", help="JSON -> バイナリ")
+    to_bin.add_argument("json_path")
+    to_bin.add_argument("store_path")
+    to_bin.add_argument("--codec", choices=["raw", "zstd"], default="raw")
+
+    to_json = subparsers.add_parser("to-json", help="バイナリ -> JSON")
+    to_json.add_argument("store_path")
+    to_json.add_argument("json_path")
+
+    args = parser.parse_args()
+    if args.command == "to-bin":
+        n_rows = convert_json_to_store(args.json_path, args.store_path, codec=args.codec)
+        print(f"{n_rows}行を{args.store_path}に書き込みました。")
+    else:
+        n_rows = convert_store_to_json(args.store_path, args.json_path)
+        print(f"{n_rows}行を{args.json_path}に書き込みました。")
+
+
+if __name__ == "__main__":
+    main()
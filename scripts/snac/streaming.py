@@ -0,0 +1,256 @@
+"""
+長い音声をチャンクに分けてSNACでエンコード・デコードするモジュール。
+
+SNACは入力を `hop_length × lcm(vq_strides[0], attn_window_size)` サンプル（以下「ユニット」）単位に揃えて処理するため、
+チャンクの境界もユニット単位に揃える。こうすると局所アテンションの窓が1回で処理した場合と同じ位置になり、
+チャンクの前後に付けた重なり（コンテキスト）によって畳み込みの境界の影響だけを吸収できる。
+
+メモリ使用量はチャンクの長さで決まり、音声の長さには依存しない。
+"""
+import math
+from typing import Iterator, List
+
+import numpy as np
+import torch
+
+from scripts.snac.backends import get_model_device
+from scripts.utils.snac_utils import deinterleave_frames, get_code_lengths, get_pad_multiple, parse_snac_codes
+
+
+def _seconds_to_units(seconds: float, sample_rate: int, unit: int, minimum: int) -> int:
+    return max(math.ceil(seconds * sample_rate / unit), minimum)
+
+
+def iter_encode_chunks(model, waveform: torch.Tensor, chunk_seconds: float = 10.0, overlap_seconds: float = 0.5) -> Iterator[List[torch.Tensor]]:
+    """
+    波形をチャンクごとにエンコードし、各チャンクの本体部分のコードを順に返す。
+
+    Args:
+        model (SNAC): SNACモデル
+        waveform (torch.Tensor): prepare_snac_inputで変換済みの (1, 1, T) の波形
+        chunk_seconds (float, optional): 1チャンクの長さ（秒）。ユニット単位に切り上げる。デフォルトは10.0
+        overlap_seconds (float, optional): チャンクの前後に付けるコンテキストの長さ（秒）。デフォルトは0.5
+
+    Yields:
+        List[torch.Tensor]: 各階層の (1, n) のコード。すべて連結すると1回でエンコードした場合と同じ長さになる
+    """
+    unit = get_pad_multiple(model)
+    chunk = _seconds_to_units(chunk_seconds, model.sampling_rate, unit, 1) * unit
+    overlap = _seconds_to_units(overlap_seconds, model.sampling_rate, unit, 0) * unit
+    total = waveform.size(-1)
+    total_lengths = get_code_lengths(total, model)
+    # 各階層のコード1つあたりのサンプル数
+    samples_per_code = [int(model.hop_length) * stride for stride in model.vq_strides]
+    emitted = [0] * len(samples_per_code)
+
+    start = 0
+    while start < total:
+        end = min(start + chunk, total)
+        window_start = max(start - overlap, 0)
+        window_end = min(end + overlap, total)
+
+        with torch.inference_mode():
+            codes = model.encode(waveform[..., window_start:window_end])
+
+        chunk_codes = []
+        for k, (code, per_code) in enumerate(zip(codes, samples_per_code)):
+            offset = (start - window_start) // per_code
+            # 最後のチャンクは末尾のパディング分まで含める
+            length = (end - start) // per_code if end < total else total_lengths[k] - emitted[k]
+            chunk_codes.append(code[:, offset:offset + length])
+            emitted[k] += length
+        yield chunk_codes
+
+        start = end
+
+
+def encode_chunked(model, waveform: torch.Tensor, chunk_seconds: float = 10.0, overlap_seconds: float = 0.5) -> List[torch.Tensor]:
+    """
+    波形をチャンクに分けてエンコードし、コードを連結して返す。
+
+    Args:
+        model (SNAC): SNACモデル
+        waveform (torch.Tensor): prepare_snac_inputで変換済みの (1, 1, T) の波形
+        chunk_seconds (float, optional): 1チャンクの長さ（秒）。デフォルトは10.0
+        overlap_seconds (float, optional): チャンクの前後に付けるコンテキストの長さ（秒）。デフォルトは0.5
+
+    Returns:
+        List[torch.Tensor]: model.encodeと同じ形式の各階層のコード
+    """
+    chunks = list(iter_encode_chunks(model, waveform, chunk_seconds, overlap_seconds))
+    return [torch.cat(layer, dim=-1) for layer in zip(*chunks)]
+
+
+class StreamingSNACDecoder:
+    """
+    SNACトークンをフレーム単位で受け取り、チャンクごとにデコードするクラス。
+
+    十分なフレームが揃ったチャンクから順にデコードするため、トークン列全体が揃う前に
+    音声を出力し始められる。チャンクは前後のコンテキスト付きでデコードし、境界は
+    短いクロスフェードでつなぐ。
+    """
+
+    def __init__(self, model, chunk_seconds: float = 2.0, overlap_seconds: float = 0.3, crossfade_ms: float = 10.0):
+        """
+        Args:
+            model (SNAC): SNACモデル
+            chunk_seconds (float, optional): 1チャンクの長さ（秒）。デフォルトは2.0
+            overlap_seconds (float, optional): チャンクの前後に付けるコンテキストの長さ（秒）。デフォルトは0.3
+            crossfade_ms (float, optional): チャンクの境界のクロスフェードの長さ（ミリ秒）。デフォルトは10.0
+        """
+        self.model = model
+        self.device = get_model_device(model)
+        self.samples_per_frame = int(model.hop_length) * model.vq_strides[0]
+        # デコーダーのアテンションの窓に揃えるためのフレーム数
+        self.unit_frames = get_pad_multiple(model) // self.samples_per_frame
+
+        unit_seconds = get_pad_multiple(model) / model.sampling_rate
+        self.chunk_frames = max(math.ceil(chunk_seconds / unit_seconds), 1) * self.unit_frames
+        self.overlap_frames = max(math.ceil(overlap_seconds / unit_seconds), 1) * self.unit_frames
+        self.crossfade = min(
+            int(model.sampling_rate * crossfade_ms / 1000), self.overlap_frames * self.samples_per_frame
+        )
+        self.reset()
+
+    def reset(self):
+        """内部の状態を初期化する。"""
+        self._frames = None
+        self._offset = 0  # self._framesの先頭のフレーム番号
+        self._position = 0  # 次にデコードするチャンクの先頭のフレーム番号
+        self._tail = None
+
+    @property
+    def _n_frames(self) -> int:
+        return self._offset + (0 if self._frames is None else len(self._frames))
+
+    def push(self, snac_tokens) -> torch.Tensor:
+        """
+        フレームを追加し、デコードできた分の音声を返す。
+
+        Args:
+            snac_tokens: "#" 区切りの文字列、split済みのリスト、または (フレーム数, 7 | 15) の配列
+
+        Returns:
+            torch.Tensor: 新たに確定した (1, 1, サンプル数) の音声。まだ確定していない場合は長さ0
+        """
+        frames = parse_snac_codes(snac_tokens)
+        self._frames = frames if self._frames is None else np.concatenate([self._frames, frames])
+
+        outputs = []
+        while self._n_frames - (self._position + self.chunk_frames) > self.overlap_frames:
+            outputs.append(self._decode_chunk(self._position + self.chunk_frames, final=False))
+        return self._concat(outputs)
+
+    def flush(self) -> torch.Tensor:
+        """
+        残りのフレームをすべてデコードして返し、状態を初期化する。
+
+        Returns:
+            torch.Tensor: 残りの (1, 1, サンプル数) の音声
+        """
+        outputs = []
+        while self._frames is not None and self._position < self._n_frames:
+            end = self._position + self.chunk_frames
+            if self._n_frames - end > self.overlap_frames:
+                outputs.append(self._decode_chunk(end, final=False))
+            else:
+                # 残りが短い場合は最後のチャンクにまとめる
+                outputs.append(self._decode_chunk(self._n_frames, final=True))
+        self.reset()
+        return self._concat(outputs)
+
+    def _concat(self, outputs: list) -> torch.Tensor:
+        if not outputs:
+            return torch.zeros(1, 1, 0, device=self.device)
+        return torch.cat(outputs, dim=-1)
+
+    def _decode_window(self, start: int, end: int) -> torch.Tensor:
+        """フレーム [start, end) をデコードする。長さはユニット単位に末尾のフレームを繰り返して揃える。"""
+        frames = self._frames[start - self._offset:end - self._offset]
+        pad = -len(frames) % self.unit_frames
+        if pad:
+            frames = np.concatenate([frames, np.repeat(frames[-1:], pad, axis=0)])
+
+        codes = [
+            torch.from_numpy(np.ascontiguousarray(layer, dtype=np.int64)).unsqueeze(0).to(self.device)
+            for layer in deinterleave_frames(frames)
+        ]
+        with torch.inference_mode():
+            audio = self.model.decode(codes)
+        return audio[..., :(end - start) * self.samples_per_frame]
+
+    def _decode_chunk(self, end: int, final: bool) -> torch.Tensor:
+        start = self._position
+        window_start = max(start - self.overlap_frames, 0)
+        window_end = min(end + self.overlap_frames, self._n_frames)
+        audio = self._decode_window(window_start, window_end)
+
+        # チャンク本体と、次のチャンクとのクロスフェードに使う末尾
+        region_start = (start - window_start) * self.samples_per_frame
+        region_end = (end - window_start) * self.samples_per_frame + (0 if final else self.crossfade)
+        region = audio[..., region_start:region_end].clone()
+
+        if self._tail is not None and self.crossfade:
+            fade_in = torch.linspace(0.0, 1.0, self.crossfade, device=region.device)
+            region[..., :self.crossfade] = self._tail * (1.0 - fade_in) + region[..., :self.crossfade] * fade_in
+
+        if final:
+            self._tail = None
+            output = region
+        else:
+            self._tail = region[..., region.size(-1) - self.crossfade:]
+            output = region[..., :region.size(-1) - self.crossfade]
+
+        self._position = end
+        # 次のチャンクのコンテキストより前のフレームは不要
+        drop = max(self._position - self.overlap_frames - self._offset, 0)
+        self._frames = self._frames[drop:]
+        self._offset += drop
+        return output
+
+
+def iter_decode_chunked(model, snac_tokens, chunk_seconds: float = 2.0, overlap_seconds: float = 0.3, crossfade_ms: float = 10.0) -> Iterator[torch.Tensor]:
+    """
+    SNACトークンを1チャンク分のフレームずつデコーダーに渡し、確定した音声を順に返す。
+
+    トークン列全体を1度にpushすると、すべてのチャンクをデコードして連結した音声が返るため、
+    音声全体をメモリ上に持つことになる。ここではchunk_framesずつpushするため、
+    1回に返す音声は最大で1チャンク分（最後のflushのみ1チャンクとコンテキスト分）になる。
+
+    Args:
+        model (SNAC): SNACモデル
+        snac_tokens: "#" 区切りの文字列、split済みのリスト、または (フレーム数, 7 | 15) の配列
+        chunk_seconds (float, optional): 1チャンクの長さ（秒）。デフォルトは2.0
+        overlap_seconds (float, optional): チャンクの前後に付けるコンテキストの長さ（秒）。デフォルトは0.3
+        crossfade_ms (float, optional): チャンクの境界のクロスフェードの長さ（ミリ秒）。デフォルトは10.0
+
+    Yields:
+        torch.Tensor: (1, 1, サンプル数) の音声。長さ0のものは返さない
+    """
+    decoder = StreamingSNACDecoder(model, chunk_seconds, overlap_seconds, crossfade_ms)
+    frames = parse_snac_codes(snac_tokens)
+    for start in range(0, len(frames), decoder.chunk_frames):
+        audio = decoder.push(frames[start:start + decoder.chunk_frames])
+        if audio.size(-1):
+            yield audio
+    audio = decoder.flush()
+    if audio.size(-1):
+        yield audio
+
+
+def decode_chunked(model, snac_tokens, chunk_seconds: float = 2.0, overlap_seconds: float = 0.3, crossfade_ms: float = 10.0) -> torch.Tensor:
+    """
+    SNACトークンをチャンクに分けてデコードする。
+
+    Args:
+        model (SNAC): SNACモデル
+        snac_tokens: "#" 区切りの文字列、split済みのリスト、または (フレーム数, 7 | 15) の配列
+        chunk_seconds (float, optional): 1チャンクの長さ（秒）。デフォルトは2.0
+        overlap_seconds (float, optional): チャンクの前後に付けるコンテキストの長さ（秒）。デフォルトは0.3
+        crossfade_ms (float, optional): チャンクの境界のクロスフェードの長さ（ミリ秒）。デフォルトは10.0
+
+    Returns:
+        torch.Tensor: (1, 1, サンプル数) の音声
+    """
+    decoder = StreamingSNACDecoder(model, chunk_seconds, overlap_seconds, crossfade_ms)
+    return torch.cat([decoder.push(snac_tokens), decoder.flush()], dim=-1)
@@ -0,0 +1,54 @@
+"""
+SNACEncoderの1件ずつのエンコードとバッチエンコードのスループット（clips/s）を比較するベンチマークです。
+
+python -m scripts.snac.test.bench_encode_batch
+"""
+import time
+import argparse
+import numpy as np
+import torch
+
+from scripts.snac.snac_module import SNACEncoder
+
+
+def make_clips(num_clips: int, min_seconds: float, max_seconds: float, sample_rate: int = 44100):
+    """ベンチマーク用にランダムな長さの音声を作成する"""
+    rng = np.random.default_rng(0)
+    clips = []
+    for seconds in rng.uniform(min_seconds, max_seconds, size=num_clips):
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        waveform = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(t.size)
+        clips.append((waveform.astype(np.float32), sample_rate))
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-clips", type=int, default=32)
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    parser.add_argument("--max-seconds", type=float, default=8.0)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    encoder = SNACEncoder()
+    clips = make_clips(args.num_clips, args.min_seconds, args.max_seconds)
+    print(f"torch threads: {torch.get_num_threads()}, clips: {len(clips)}")
+
+    # ウォームアップ
+    encoder.encode_waveform(*clips[0])
+
+    start = time.perf_counter()
+    for waveform, sample_rate in clips:
+        encoder.encode_waveform(waveform, sample_rate)
+    elapsed = time.perf_counter() - start
+    print(f"one-by-one        : {len(clips) / elapsed:.2f} clips/s ({elapsed:.2f} s)")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        encoder.encode_batch(clips, max_batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"batch (size {batch_size:>3}) : {len(clips) / elapsed:.2f} clips/s ({elapsed:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+SNACEncodePoolのワーカー数を1からNまで変えて、エンコードのスループット（clips/s）を比較するベンチマークです。
+各ワーカーのスレッド数は、使用できるコア数をワーカー数で割った値になります。
+
+python -m scripts.snac.test.bench_encode_pool --max-workers 8
+"""
+import time
+import asyncio
+import argparse
+
+from scripts.snac.encode_pool import SNACEncodePool, available_cpus
+from scripts.snac.test.bench_encode_batch import make_clips
+
+
+async def run(pool: SNACEncodePool, clips: list) -> float:
+    start = time.perf_counter()
+    await pool.encode_many(clips)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-clips", type=int, default=32)
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    parser.add_argument("--max-seconds", type=float, default=8.0)
+    parser.add_argument("--max-workers", type=int, default=available_cpus())
+    args = parser.parse_args()
+
+    clips = make_clips(args.num_clips, args.min_seconds, args.max_seconds)
+    print(f"cpus: {available_cpus()}, clips: {len(clips)}")
+
+    baseline = None
+    num_workers = 1
+    while num_workers <= args.max_workers:
+        with SNACEncodePool(num_workers=num_workers) as pool:
+            # ウォームアップ（ワーカーの起動とモデルのロード）
+            asyncio.run(run(pool, clips[:num_workers]))
+            elapsed = asyncio.run(run(pool, clips))
+
+        throughput = len(clips) / elapsed
+        baseline = baseline or throughput
+        print(
+            f"workers {num_workers:>2} x threads {pool.threads_per_worker:>2} : "
+            f"{throughput:.2f} clips/s ({elapsed:.2f} s, x{throughput / baseline:.2f})"
+        )
+        num_workers *= 2
+
+
+if __name__ == "__main__":
+    main()
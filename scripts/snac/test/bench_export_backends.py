@@ -0,0 +1,56 @@
+"""
+SNACEncoderのバックエンド（eager / torchscript / onnx）ごとのエンコードのスループット（clips/s）を比較するベンチマークです。
+eager以外は、事前に `python -m scripts.snac.export --output-dir models/snac_44khz` で書き出したモデルを使います。
+
+python -m scripts.snac.test.bench_export_backends --export-dir models/snac_44khz
+"""
+import time
+import argparse
+
+import torch
+
+from scripts.snac.snac_module import SNACEncoder
+from scripts.snac.test.bench_encode_batch import make_clips
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--export-dir", default="models/snac_44khz")
+    parser.add_argument("--num-clips", type=int, default=32)
+    parser.add_argument("--min-seconds", type=float, default=0.5)
+    parser.add_argument("--max-seconds", type=float, default=3.0)
+    parser.add_argument("--backends", nargs="+", default=["eager", "torchscript", "onnx"])
+    args = parser.parse_args()
+
+    clips = make_clips(args.num_clips, args.min_seconds, args.max_seconds)
+    print(f"torch threads: {torch.get_num_threads()}, clips: {len(clips)}")
+
+    reference = None
+    for backend in args.backends:
+        try:
+            encoder = SNACEncoder(backend=backend, export_dir=args.export_dir)
+        except (ImportError, FileNotFoundError, OSError) as e:
+            print(f"{backend:<12}: skipped ({e})")
+            continue
+
+        # ウォームアップ
+        encoder.encode_waveform(*clips[0])
+
+        start = time.perf_counter()
+        results = [encoder.encode_waveform(waveform, sample_rate) for waveform, sample_rate in clips]
+        elapsed = time.perf_counter() - start
+
+        # eagerモードと同じコードになっているかを確認
+        if reference is None:
+            reference = results
+            parity = "reference"
+        else:
+            same = all(
+                torch.equal(a.cpu(), b.cpu()) for codes, expected in zip(results, reference) for a, b in zip(codes, expected)
+            )
+            parity = "identical codes" if same else "codes differ"
+        print(f"{backend:<12}: {len(clips) / elapsed:.2f} clips/s ({elapsed:.2f} s, {parity})")
+
+
+if __name__ == "__main__":
+    main()
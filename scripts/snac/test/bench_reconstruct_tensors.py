@@ -0,0 +1,145 @@
+"""
+reconstruct_tensors の旧実装（ループごとにテンソルを再構築するため二乗時間）と
+NumPyによる実装を、data/dataset/answer_snac.json のトークン列で比較するベンチマークです。
+
+python -m scripts.snac.test.bench_reconstruct_tensors
+"""
+import json
+import time
+import argparse
+import torch
+
+from scripts.utils.snac_utils import reconstruct_tensors
+
+
+def legacy_reconstruct_tensors(flattened_output, device=None):
+    """以前のreconstruct_tensorsの実装（比較用）"""
+
+    if device is None:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    def count_elements_between_hashes(lst):
+        try:
+            # Find the index of the first '#'
+            first_index = lst.index("#")
+            # Find the index of the second '#' after the first
+            second_index = lst.index("#", first_index + 1)
+            # Count the elements between the two indices
+            return second_index - first_index - 1
+        
+        except ValueError:
+            # Handle the case where there aren't enough '#' symbols
+            return "List does not contain two '#' symbols"
+
+    def remove_elements_before_hash(flattened_list):
+        try:
+            # Find the index of the first '#'
+            first_hash_index = flattened_list.index("#")
+            # Return the list starting from the first '#'
+            return flattened_list[first_hash_index:]
+
+        except ValueError:
+            # Handle the case where there is no '#'
+            return "List does not contain the symbol '#'"
+
+    def list_to_torch_tensor(tensor1):
+        # Convert the list to a torch tensor
+        tensor = torch.tensor(tensor1)
+        # Reshape the tensor to have size (1, n)
+        tensor = tensor.unsqueeze(0)
+        return tensor
+
+    flattened_output = remove_elements_before_hash(flattened_output)
+    codes = []
+    tensor1 = []
+    tensor2 = []
+    tensor3 = []
+    tensor4 = []
+
+    n_tensors = count_elements_between_hashes(flattened_output)
+    if n_tensors == 7:
+        for i in range(0, len(flattened_output), 8):
+
+            tensor1.append(int(flattened_output[i + 1]))
+            tensor2.append(int(flattened_output[i + 2]))
+            tensor3.append(int(flattened_output[i + 3]))
+            tensor3.append(int(flattened_output[i + 4]))
+
+            tensor2.append(int(flattened_output[i + 5]))
+            tensor3.append(int(flattened_output[i + 6]))
+            tensor3.append(int(flattened_output[i + 7]))
+            codes = [
+                list_to_torch_tensor(tensor1).to(device),
+                list_to_torch_tensor(tensor2).to(device),
+                list_to_torch_tensor(tensor3).to(device),
+            ]
+
+    if n_tensors == 15:
+        for i in range(0, len(flattened_output), 16):
+
+            tensor1.append(int(flattened_output[i + 1]))
+            tensor2.append(int(flattened_output[i + 2]))
+            tensor3.append(int(flattened_output[i + 3]))
+            tensor4.append(int(flattened_output[i + 4]))
+            tensor4.append(int(flattened_output[i + 5]))
+            tensor3.append(int(flattened_output[i + 6]))
+            tensor4.append(int(flattened_output[i + 7]))
+            tensor4.append(int(flattened_output[i + 8]))
+
+            tensor2.append(int(flattened_output[i + 9]))
+            tensor3.append(int(flattened_output[i + 10]))
+            tensor4.append(int(flattened_output[i + 11]))
+            tensor4.append(int(flattened_output[i + 12]))
+            tensor3.append(int(flattened_output[i + 13]))
+            tensor4.append(int(flattened_output[i + 14]))
+            tensor4.append(int(flattened_output[i + 15]))
+
+            codes = [
+                list_to_torch_tensor(tensor1).to(device),
+                list_to_torch_tensor(tensor2).to(device),
+                list_to_torch_tensor(tensor3).to(device),
+                list_to_torch_tensor(tensor4).to(device),
+            ]
+
+    return codes
+
+def load_sequences(path: str) -> list:
+    """answer_snac.jsonのトークン列をリストとして読み込む"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [row.split(" ") for row in json.load(f)]
+
+
+def timeit(func, repeat: int) -> float:
+    """funcをrepeat回実行した平均時間（秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="data/dataset/answer_snac.json")
+    # 長い音声を想定して、各トークン列を繰り返して長さを伸ばす
+    parser.add_argument("--tiles", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cpu = torch.device("cpu")
+    for row, tokens in enumerate(load_sequences(args.path)):
+        for tiles in args.tiles:
+            sequence = tokens * tiles
+            legacy_codes = legacy_reconstruct_tensors(sequence, cpu)
+            codes = reconstruct_tensors(sequence, cpu)
+            assert all(torch.equal(a, b) for a, b in zip(legacy_codes, codes))
+
+            legacy = timeit(lambda: legacy_reconstruct_tensors(sequence, cpu), args.repeat)
+            vectorized = timeit(lambda: reconstruct_tensors(sequence, cpu), args.repeat)
+            print(
+                f"row {row} x{tiles:<3} ({len(sequence):>7} tokens): "
+                f"legacy {legacy * 1000:9.2f} ms | vectorized {vectorized * 1000:7.2f} ms ({legacy / vectorized:6.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+SNACEncoder.make_snac_tokens の旧実装（Pythonループ）とNumPyによる実装を比較するマイクロベンチマークです。
+モデルは使用せず、ランダムなコードで計測します。
+
+python -m scripts.snac.test.bench_snac_tokens
+"""
+import time
+import argparse
+import torch
+
+from scripts.utils.snac_utils import interleave_codes, render_snac_tokens
+
+# 44kHzモデルの設定。最も粗い階層のフレームは hop_length (2*3*8*8 = 384) * vq_strides[0] (8) サンプルごと（約14.4Hz）
+SAMPLING_RATE = 44100
+HOP_LENGTH = 384
+COARSE_STRIDE = 8
+
+
+def legacy_make_snac_tokens(tensor_list: list) -> str:
+    """以前のmake_snac_tokensの実装（比較用）"""
+    flattened_output = []
+
+    tensor1_values = tensor_list[0].cpu().tolist()[0]
+    tensor2_values = tensor_list[1].cpu().tolist()[0]
+    tensor3_values = tensor_list[2].cpu().tolist()[0]
+    tensor4_values = tensor_list[3].cpu().tolist()[0]
+
+    idx_t1 = 0
+    idx_t2 = 0
+    idx_t3 = 0
+    idx_t4 = 0
+
+    for _ in range(len(tensor1_values)):
+        flattened_output.extend([
+            '#',
+            str(tensor1_values[idx_t1]),
+            str(tensor2_values[idx_t2]),
+            str(tensor3_values[idx_t3]),
+            str(tensor4_values[idx_t4]),
+            str(tensor4_values[idx_t4 + 1]),
+            str(tensor3_values[idx_t3 + 1]),
+            str(tensor4_values[idx_t4 + 2]),
+            str(tensor4_values[idx_t4 + 3]),
+            str(tensor2_values[idx_t2 + 1]),
+            str(tensor3_values[idx_t3 + 2]),
+            str(tensor4_values[idx_t4 + 4]),
+            str(tensor4_values[idx_t4 + 5]),
+            str(tensor3_values[idx_t3 + 3]),
+            str(tensor4_values[idx_t4 + 6]),
+            str(tensor4_values[idx_t4 + 7]),
+        ])
+
+        idx_t1 += 1
+        idx_t2 += 2
+        idx_t3 += 4
+        idx_t4 += 8
+
+    return ' '.join(flattened_output)
+
+
+def random_codes(n_frames: int, seed: int = 0) -> list:
+    """44kHzモデルと同じ形状 (1, n), (1, 2n), (1, 4n), (1, 8n) のランダムなコードを作成する"""
+    generator = torch.Generator().manual_seed(seed)
+    return [torch.randint(0, 4096, (1, n_frames * 2 ** i), generator=generator) for i in range(4)]
+
+
+def frames_for_seconds(seconds: float) -> int:
+    """音声の長さ（秒）に対応する、最も粗い階層のフレーム数"""
+    return round(seconds * SAMPLING_RATE / (HOP_LENGTH * COARSE_STRIDE))
+
+
+def timeit(func, repeat: int) -> float:
+    """funcをrepeat回実行した平均時間（秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    # 1分、5分、10分の音声に相当するフレーム数
+    parser.add_argument("--frames", type=int, nargs="+", default=[frames_for_seconds(s) for s in (60, 300, 600)])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    for n_frames in args.frames:
+        codes = random_codes(n_frames)
+        assert legacy_make_snac_tokens(codes) == render_snac_tokens(interleave_codes(codes))
+
+        legacy = timeit(lambda: legacy_make_snac_tokens(codes), args.repeat)
+        array_only = timeit(lambda: interleave_codes(codes), args.repeat)
+        rendered = timeit(lambda: render_snac_tokens(interleave_codes(codes)), args.repeat)
+        print(
+            f"{n_frames:>6} frames: legacy {legacy * 1000:8.2f} ms | "
+            f"array {array_only * 1000:8.2f} ms ({legacy / array_only:6.1f}x) | "
+            f"array+string {rendered * 1000:8.2f} ms ({legacy / rendered:4.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+from snac import SNAC
+
+from scripts.snac.batch_decode import BatchSNACDecoder, count_frames
+from scripts.utils.snac_utils import render_snac_tokens
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    # 24kHzモデルと同じ構成（hop 512, vq_strides [4, 2, 1], アテンションなし）の小さなモデル。
+    # デコード結果を比較するため、ノイズは無効にする
+    torch.manual_seed(0)
+    model = SNAC(
+        sampling_rate=24000,
+        encoder_dim=4,
+        encoder_rates=[2, 4, 8, 8],
+        decoder_dim=64,
+        decoder_rates=[8, 8, 4, 2],
+        attn_window_size=None,
+        vq_strides=[4, 2, 1],
+        noise=False,
+    )
+    return model.eval()
+
+def make_rows():
+    rng = np.random.default_rng(0)
+    rows = [render_snac_tokens(rng.integers(0, 4096, size=(n, 7))) for n in (30, 5, 12, 31, 8)]
+    # 空の行と解析できない行を含める
+    rows.insert(2, None)
+    rows.insert(4, "1 2 3")
+    return rows
+
+def test_count_frames():
+    rows = make_rows()
+
+    assert [count_frames(row) for row in rows] == [30, 5, 0, 12, 0, 31, 8]
+    assert count_frames(rows[0].split(" ")) == 30
+
+def test_plan_batches_groups_similar_lengths(small_model):
+    decoder = BatchSNACDecoder(model=small_model, batch_size=2)
+
+    # 短い順に2行ずつまとめ、空の行は含めない
+    assert decoder.plan_batches(make_rows()) == [[1, 6], [3, 0], [5]]
+
+def test_decode_rows(small_model, tmp_path):
+    rows = make_rows()
+    decoder = BatchSNACDecoder(model=small_model, batch_size=3)
+
+    report = decoder.decode_rows(rows, str(tmp_path))
+
+    assert report["decoded"] == 5
+    assert report["failed"] == [2, 4]
+    assert report["paths"][2] is None and report["paths"][4] is None
+    assert report["rtf_decode"] > 0 and report["rtf_wall"] > 0
+
+    for i in (0, 1, 3, 5, 6):
+        audio, sample_rate = sf.read(report["paths"][i])
+        assert sample_rate == 24000
+        assert len(audio) == count_frames(rows[i]) * 512 * 4
+
+def test_batched_decode_matches_single_rows(small_model):
+    rng = np.random.default_rng(1)
+    frames_list = [rng.integers(0, 4096, size=(n, 7)) for n in (16, 12)]
+    decoder = BatchSNACDecoder(model=small_model)
+
+    batched = decoder.decode_frames(frames_list)
+    single = [decoder.decode_frames([frames])[0] for frames in frames_list]
+
+    # 最も長い行は1行ずつデコードした場合と同じになる
+    np.testing.assert_allclose(batched[0], single[0], atol=1e-5)
+    # 短い行も、パディングの影響を受ける末尾の数フレーム以外は同じになる
+    tail = 3 * 512 * 4
+    np.testing.assert_allclose(batched[1][:-tail], single[1][:-tail], atol=1e-5)
+
+class ParameterlessSNAC:
+    # 書き出したモデル（TorchScript / ONNX）と同じく、パラメータを持たずdevice属性を持つモデル
+    def __init__(self, model):
+        self._model = model
+        self.sampling_rate = model.sampling_rate
+        self.hop_length = model.hop_length
+        self.vq_strides = model.vq_strides
+        self.attn_window_size = model.attn_window_size
+        self.device = torch.device("cpu")
+
+    def decode(self, codes):
+        return self._model.decode(codes)
+
+def test_device_of_parameterless_model(small_model, tmp_path):
+    decoder = BatchSNACDecoder(model=ParameterlessSNAC(small_model))
+    assert decoder.device == torch.device("cpu")
+
+    report = decoder.decode_rows(make_rows(), str(tmp_path))
+    assert report["decoded"] == 5
+
+def test_parse_prefetch_is_bounded(small_model, tmp_path, monkeypatch):
+    import scripts.snac.batch_decode as batch_decode
+
+    rng = np.random.default_rng(2)
+    rows = [render_snac_tokens(rng.integers(0, 4096, size=(8, 7))) for _ in range(10)]
+    decoder = BatchSNACDecoder(model=small_model, batch_size=1, parse_workers=4, prefetch_batches=2)
+
+    parsed = []
+    decoded = []
+    parse = batch_decode._parse
+    decode_frames = decoder.decode_frames
+    monkeypatch.setattr(batch_decode, "_parse", lambda row: parsed.append(row) or parse(row))
+
+    def record(frames_list):
+        decoded.append(len(parsed))
+        return decode_frames(frames_list)
+
+    monkeypatch.setattr(decoder, "decode_frames", record)
+    report = decoder.decode_rows(rows, str(tmp_path))
+
+    assert report["decoded"] == 10
+    # k番目のバッチのデコード時に解析が投入されているのは、k番目から先読みの2バッチ分まで
+    assert all(count <= k + 1 + 2 for k, count in enumerate(decoded))
@@ -0,0 +1,71 @@
+import asyncio
+import numpy as np
+import pytest
+import torch
+from snac import SNAC
+
+from scripts.snac.backends import load_snac_backend
+from scripts.snac.encode_pool import SNACEncodePool
+from scripts.snac.export import export_snac
+from scripts.snac.snac_module import SNACEncoder
+from scripts.utils.audio_utils import prepare_snac_input
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with SNACEncodePool(num_workers=2, threads_per_worker=1) as pool:
+        yield pool
+
+def make_waveform(seconds: float, sample_rate: int = 22050):
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    return np.sin(2 * np.pi * 440 * t) * 0.5, sample_rate
+
+def test_pool_matches_encoder(pool):
+    waveform, sample_rate = make_waveform(1.0)
+
+    codes = asyncio.run(pool.encode(waveform, sample_rate))
+    expected = SNACEncoder().encode_waveform(waveform, sample_rate)
+
+    # 別プロセスでエンコードしても同じコードになる
+    assert [code.shape for code in codes] == [code.shape for code in expected]
+    assert all(torch.equal(a, b.cpu()) for a, b in zip(codes, expected))
+
+def test_pool_encode_many_keeps_order(pool):
+    items = [make_waveform(seconds) for seconds in (2.0, 0.5, 1.0)]
+
+    results = asyncio.run(pool.encode_many(items))
+
+    assert len(results) == 3
+    # 長い音声ほどコードが長い
+    assert results[0][0].shape[-1] > results[2][0].shape[-1] >= results[1][0].shape[-1]
+
+def test_pool_sets_threads_per_worker(pool):
+    info = pool.worker_info()
+
+    assert all(threads == 1 for _, threads in info)
+
+def test_pool_uses_exported_backend(tmp_path):
+    torch.manual_seed(0)
+    model = SNAC(
+        sampling_rate=44100,
+        encoder_dim=4,
+        encoder_rates=[2, 3, 8, 8],
+        decoder_dim=64,
+        decoder_rates=[8, 8, 3, 2],
+        attn_window_size=32,
+        vq_strides=[8, 4, 2, 1],
+        noise=False,
+    ).eval()
+    export_snac(model, str(tmp_path), ["torchscript"], "small")
+    waveform, sample_rate = make_waveform(1.0)
+
+    # ワーカーも既定のモデルではなく、指定されたバックエンドのモデルを使う
+    with SNACEncodePool(
+        num_workers=1, threads_per_worker=1, model_name="small", backend="torchscript", export_dir=str(tmp_path)
+    ) as pool:
+        codes = asyncio.run(pool.encode(waveform, sample_rate))
+    exported = load_snac_backend("small", torch.device("cpu"), "torchscript", str(tmp_path))
+    expected = exported.encode(prepare_snac_input(waveform, sample_rate, exported.sampling_rate, "cpu"))
+
+    assert [code.shape for code in codes] == [code.shape for code in expected]
+    assert all(torch.equal(a, b) for a, b in zip(codes, expected))
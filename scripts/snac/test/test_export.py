@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import torch
+from snac import SNAC
+
+from scripts.snac.backends import load_snac_backend
+from scripts.snac.export import export_snac, prepare_for_export, prepare_for_onnx
+from scripts.snac.streaming import encode_chunked
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    # 44kHzモデルと同じ構成の小さなモデル。デコード結果を比較するため、ノイズは無効にする
+    torch.manual_seed(0)
+    model = SNAC(
+        sampling_rate=44100,
+        encoder_dim=4,
+        encoder_rates=[2, 3, 8, 8],
+        decoder_dim=64,
+        decoder_rates=[8, 8, 3, 2],
+        attn_window_size=32,
+        vq_strides=[8, 4, 2, 1],
+        noise=False,
+    )
+    return model.eval()
+
+@pytest.fixture(scope="module")
+def clips():
+    rng = np.random.default_rng(0)
+    clips = []
+    # パディング単位に揃わない長さを含める
+    for length in (12288, 20000, 44100, 70001):
+        t = torch.arange(length) / 44100
+        noise = torch.from_numpy(rng.standard_normal(length).astype(np.float32))
+        clips.append((0.3 * torch.sin(2 * np.pi * 220 * t) + 0.05 * noise).view(1, 1, -1))
+    return clips
+
+def check_parity(exported, model, clips):
+    for clip in clips:
+        with torch.inference_mode():
+            expected = model.encode(clip)
+            expected_audio = model.decode(expected)
+        codes = exported.encode(clip)
+
+        # eagerモードと同じコードになる
+        assert [code.shape for code in codes] == [code.shape for code in expected]
+        assert all(torch.equal(a, b) for a, b in zip(codes, expected))
+
+        audio = exported.decode(codes)
+        assert audio.shape == expected_audio.shape
+        assert torch.allclose(audio, expected_audio, atol=1e-4)
+
+def test_torchscript_parity(small_model, clips, tmp_path):
+    export_snac(small_model, str(tmp_path), ["torchscript"], "small")
+    exported = load_snac_backend("small", torch.device("cpu"), "torchscript", str(tmp_path))
+
+    check_parity(exported, small_model, clips)
+
+def test_torchscript_batch_and_chunked(small_model, clips, tmp_path):
+    export_snac(small_model, str(tmp_path), ["torchscript"], "small")
+    exported = load_snac_backend("small", torch.device("cpu"), "torchscript", str(tmp_path))
+
+    # バッチでもチャンク処理でも使える
+    batch = torch.cat([clips[0], clips[0] * 0.5])
+    codes = exported.encode(batch)
+    assert codes[0].shape[0] == 2
+    chunked = encode_chunked(exported, clips[3], chunk_seconds=0.5, overlap_seconds=0.5)
+    with torch.inference_mode():
+        expected = small_model.encode(clips[3])
+    assert all(torch.equal(a, b) for a, b in zip(chunked, expected))
+
+def test_export_does_not_modify_model(small_model, clips, tmp_path):
+    state = {k: v.clone() for k, v in small_model.state_dict().items()}
+    with torch.inference_mode():
+        expected = small_model.encode(clips[0])
+    export_snac(small_model, str(tmp_path), ["torchscript"], "small")
+
+    # weight normの畳み込みはコピーに対して行われ、元のモデルはそのまま使える
+    assert small_model.state_dict().keys() == state.keys()
+    assert all(torch.equal(small_model.state_dict()[k], v) for k, v in state.items())
+    with torch.inference_mode():
+        assert all(torch.equal(a, b) for a, b in zip(small_model.encode(clips[0]), expected))
+
+def test_onnx_layers_match_eager(small_model, clips):
+    # ONNX用に置き換えた層もeagerモードと同じ結果になる
+    model = prepare_for_onnx(prepare_for_export(small_model))
+    for clip in clips[:2]:
+        with torch.inference_mode():
+            expected = small_model.encode(clip)
+            codes = model.encode(clip)
+            assert all(torch.equal(a, b) for a, b in zip(codes, expected))
+            assert torch.allclose(model.decode(codes), small_model.decode(expected), atol=1e-4)
+
+def test_onnx_parity(small_model, clips, tmp_path):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    export_snac(small_model, str(tmp_path), ["onnx"], "small")
+    exported = load_snac_backend("small", torch.device("cpu"), "onnx", str(tmp_path))
+
+    check_parity(exported, small_model, clips)
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        load_snac_backend("small", torch.device("cpu"), "tensorrt")
+    with pytest.raises(ValueError):
+        load_snac_backend("small", torch.device("cpu"), "torchscript")
@@ -0,0 +1,58 @@
+import torch
+
+from scripts.snac.model_registry import SNACModelRegistry, get_model_size
+
+
+def make_registry(max_memory_bytes=None):
+    calls = []
+
+    def loader(model_name, device):
+        calls.append((model_name, str(device)))
+        # 1000パラメータ（4000バイト）の小さなモデルで代用する
+        return torch.nn.Linear(10, 100, bias=False).to(device)
+
+    return SNACModelRegistry(max_memory_bytes=max_memory_bytes, loader=loader), calls
+
+def test_registry_loads_once_per_key():
+    registry, calls = make_registry()
+
+    first = registry.get("hubertsiuzdak/snac_24khz", "cpu")
+    for _ in range(10):
+        assert registry.get("hubertsiuzdak/snac_24khz", torch.device("cpu")) is first
+
+    assert calls == [("hubertsiuzdak/snac_24khz", "cpu")]
+    assert registry.loads == 1
+
+def test_registry_separates_models():
+    registry, calls = make_registry()
+
+    a = registry.get("hubertsiuzdak/snac_24khz", "cpu")
+    b = registry.get("hubertsiuzdak/snac_44khz", "cpu")
+
+    assert a is not b
+    assert registry.loads == 2
+    assert registry.memory_bytes() == get_model_size(a) + get_model_size(b) == 8000
+
+def test_registry_lru_eviction():
+    registry, calls = make_registry(max_memory_bytes=8000)
+
+    registry.get("a", "cpu")
+    registry.get("b", "cpu")
+    # "a"を使うと"b"が最も古くなる
+    registry.get("a", "cpu")
+    registry.get("c", "cpu")
+
+    assert registry.loaded() == [("a", "cpu"), ("c", "cpu")]
+    assert registry.evictions == 1
+    assert registry.memory_bytes() <= 8000
+
+    # 解放したモデルは次の取得で再ロードされる
+    registry.get("b", "cpu")
+    assert calls.count(("b", "cpu")) == 2
+
+def test_registry_keeps_model_larger_than_limit():
+    registry, _ = make_registry(max_memory_bytes=1000)
+
+    model = registry.get("a", "cpu")
+    assert registry.get("a", "cpu") is model
+    assert registry.loads == 1
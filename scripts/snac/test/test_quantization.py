@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+import torch
+from snac import SNAC
+
+from scripts.snac.quantization import quantize_snac, signal_to_noise_ratio
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    # 44kHzモデルと同じ構成の小さなモデル
+    torch.manual_seed(0)
+    model = SNAC(
+        sampling_rate=44100,
+        encoder_dim=4,
+        encoder_rates=[2, 3, 8, 8],
+        decoder_dim=64,
+        decoder_rates=[8, 8, 3, 2],
+        attn_window_size=32,
+        vq_strides=[8, 4, 2, 1],
+        noise=False,
+    )
+    return model.eval()
+
+@pytest.fixture(scope="module")
+def clip():
+    t = torch.arange(44100) / 44100
+    return (0.3 * torch.sin(2 * np.pi * 220 * t)).view(1, 1, -1)
+
+@pytest.mark.parametrize("mode", ["dynamic", "static"])
+def test_quantized_model_encodes_and_decodes(small_model, clip, mode):
+    quantized = quantize_snac(small_model, mode, calibration=[clip])
+
+    with torch.inference_mode():
+        expected = small_model.encode(clip)
+        codes = quantized.encode(clip)
+        audio = quantized.decode(codes)
+        expected_audio = small_model.decode(expected)
+
+    assert [code.shape for code in codes] == [code.shape for code in expected]
+    assert audio.shape == expected_audio.shape
+    # Linear層は動的量子化される
+    assert any(isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in quantized.modules())
+    if mode == "static":
+        assert any(isinstance(m, torch.ao.nn.quantized.Conv1d) for m in quantized.modules())
+
+def test_quantization_does_not_modify_model(small_model, clip):
+    with torch.inference_mode():
+        expected = small_model.encode(clip)
+    quantize_snac(small_model, "static", calibration=[clip])
+
+    # 量子化はコピーに対して行われ、元のモデルはfp32のまま
+    assert not any(isinstance(m, torch.ao.nn.quantized.Conv1d) for m in small_model.modules())
+    with torch.inference_mode():
+        assert all(torch.equal(a, b) for a, b in zip(small_model.encode(clip), expected))
+
+def test_unknown_mode(small_model):
+    with pytest.raises(ValueError):
+        quantize_snac(small_model, "int4")
+
+def test_signal_to_noise_ratio():
+    reference = np.sin(np.linspace(0, 100, 1000))
+
+    assert signal_to_noise_ratio(reference, reference * 0.9) == pytest.approx(20.0)
+    # 長さは短い方に揃える
+    assert signal_to_noise_ratio(reference, np.concatenate([reference * 0.9, np.ones(10)])) == pytest.approx(20.0)
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 import torchaudio
 from scripts.snac.snac_module import SNACDecoder, SNACEncoder
 
@@ -19,6 +20,37 @@ def test_encode_to_tokens(setup_encoder_decoder):
     assert tokens is not None
     assert len(tokens) > 0
 
+def test_encode_waveform(setup_encoder_decoder):
+    encoder, _ = setup_encoder_decoder
+
+    # 22.05kHzのステレオ波形をメモリ上で渡す
+    t = np.arange(22050, dtype=np.float32) / 22050
+    waveform = np.stack([np.sin(2 * np.pi * 440 * t), np.sin(2 * np.pi * 220 * t)]) * 0.5
+
+    tokens = encoder.encode_waveform(waveform, 22050)
+
+    # ダウンミックスとリサンプリングが行われ、4階層のコードが得られることを確認
+    assert len(tokens) == 4
+    assert all(code.size(0) == 1 for code in tokens)
+
+def test_encode_batch(setup_encoder_decoder):
+    encoder, _ = setup_encoder_decoder
+
+    # 長さの異なる音声をまとめてエンコード
+    rng = np.random.default_rng(0)
+    clips = [(rng.standard_normal(int(44100 * seconds)).astype(np.float32) * 0.1, 44100) for seconds in [1.0, 2.5, 0.5]]
+    batch_codes = encoder.encode_batch(clips, max_batch_size=2)
+
+    assert len(batch_codes) == len(clips)
+    for codes, (waveform, sample_rate) in zip(batch_codes, clips):
+        single_codes = encoder.encode_waveform(waveform, sample_rate)
+        # 単独でエンコードした場合と同じフレーム数で、音声のある区間のコードが一致することを確認
+        assert [c.size(-1) for c in codes] == [c.size(-1) for c in single_codes]
+        # 最後の粗いフレーム（パディングを含む区間）を除いて比較する
+        for c, single in zip(codes, single_codes):
+            per_frame = c.size(-1) // codes[0].size(-1)
+            assert (c[..., :-per_frame] == single[..., :-per_frame]).all()
+
 def test_make_snac_tokens(setup_encoder_decoder):
     encoder, _ = setup_encoder_decoder
     audio_path = "data/test_input_audio.wav"
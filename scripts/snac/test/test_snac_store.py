@@ -0,0 +1,75 @@
+import json
+import numpy as np
+import pytest
+import torch
+
+from scripts.snac.snac_store import SNACTokenStore, convert_json_to_store, convert_store_to_json, write_snac_store
+from scripts.utils.snac_utils import interleave_codes, render_snac_tokens
+from scripts.snac.test.bench_snac_tokens import random_codes
+
+
+def make_rows():
+    rows = [render_snac_tokens(interleave_codes(random_codes(n))) for n in (5, 1, 30)]
+    rows.insert(1, None)
+    return rows
+
+def test_store_roundtrip_raw(tmp_path):
+    rows = make_rows()
+    path = tmp_path / "answer_snac.snacbin"
+    assert write_snac_store(str(path), rows) == len(rows)
+
+    store = SNACTokenStore(str(path))
+    assert len(store) == len(rows)
+    # 文字列に戻すと元のトークンと完全に一致する
+    assert [store.get_tokens(i) for i in range(len(store))] == rows
+    assert store.is_null(1) and store[1] is None
+
+def test_store_codes_are_memmap_views(tmp_path):
+    codes = random_codes(8)
+    path = tmp_path / "answer_snac.snacbin"
+    write_snac_store(str(path), [interleave_codes(random_codes(3)), interleave_codes(codes)])
+
+    store = SNACTokenStore(str(path))
+    layers = store.get_codes(-1)
+    assert [len(layer) for layer in layers] == [8, 16, 32, 64]
+    assert all(layer.dtype == np.uint16 for layer in layers)
+    assert all(np.array_equal(layer, code[0].numpy()) for layer, code in zip(layers, codes))
+    # rawではファイル上の配列へのビューでありコピーされない
+    assert not layers[0].flags.owndata
+
+def test_store_24khz_and_empty_rows(tmp_path):
+    codes = [torch.arange(3).unsqueeze(0), torch.arange(6).unsqueeze(0) + 100, torch.arange(12).unsqueeze(0) + 200]
+    rows = [render_snac_tokens(interleave_codes(codes)), None]
+    path = tmp_path / "answer_snac.snacbin"
+    write_snac_store(str(path), rows)
+
+    store = SNACTokenStore(str(path))
+    assert store.frame_width == 7
+    assert store.get_frames(0).shape == (3, 7)
+    assert store.get_tokens(0) == rows[0]
+    with pytest.raises(IndexError):
+        store.get_codes(2)
+
+def test_store_rejects_mixed_frame_width(tmp_path):
+    codes_24k = [torch.arange(3).unsqueeze(0), torch.arange(6).unsqueeze(0), torch.arange(12).unsqueeze(0)]
+    rows = [interleave_codes(random_codes(2)), interleave_codes(codes_24k)]
+    with pytest.raises(ValueError):
+        write_snac_store(str(tmp_path / "answer_snac.snacbin"), rows)
+
+def test_store_roundtrip_zstd(tmp_path):
+    pytest.importorskip("zstandard")
+    rows = make_rows()
+    path = tmp_path / "answer_snac.snacbin"
+    write_snac_store(str(path), rows, codec="zstd")
+
+    store = SNACTokenStore(str(path))
+    assert [store.get_tokens(i) for i in range(len(store))] == rows
+
+def test_json_conversion(tmp_path):
+    rows = make_rows()
+    json_path = tmp_path / "answer_snac.json"
+    json_path.write_text(json.dumps(rows), encoding="utf-8")
+
+    convert_json_to_store(str(json_path), str(tmp_path / "answer_snac.snacbin"))
+    convert_store_to_json(str(tmp_path / "answer_snac.snacbin"), str(tmp_path / "restored.json"))
+    assert json.loads((tmp_path / "restored.json").read_text(encoding="utf-8")) == rows
@@ -0,0 +1,80 @@
+import json
+import numpy as np
+import pytest
+import torch
+
+from scripts.utils.snac_utils import interleave_codes, render_snac_tokens, reconstruct_tensors, parse_snac_codes
+from scripts.snac.test.bench_snac_tokens import legacy_make_snac_tokens, random_codes
+from scripts.snac.test.bench_reconstruct_tensors import legacy_reconstruct_tensors
+
+
+def test_interleave_matches_legacy_format():
+    codes = random_codes(50)
+
+    # 以前の実装とビット単位で同じ文字列になることを確認
+    assert render_snac_tokens(interleave_codes(codes)) == legacy_make_snac_tokens(codes)
+
+def test_interleave_shape_and_dtype():
+    codes = random_codes(12)
+    frames = interleave_codes(codes)
+
+    assert frames.shape == (12, 15)
+    assert frames.dtype.kind == "i"
+    # 各フレームの先頭は第1階層のコード
+    assert (frames[:, 0] == codes[0][0].numpy()).all()
+
+def test_interleave_24khz_layout():
+    codes = [torch.arange(3).unsqueeze(0), torch.arange(6).unsqueeze(0) + 100, torch.arange(12).unsqueeze(0) + 200]
+    frames = interleave_codes(codes)
+
+    # t1, t2[0], t3[0], t3[1], t2[1], t3[2], t3[3]
+    assert frames[0].tolist() == [0, 100, 200, 201, 101, 202, 203]
+    assert frames.shape == (3, 7)
+
+def test_reconstruct_roundtrip_44khz():
+    codes = random_codes(20)
+    snac_tokens = render_snac_tokens(interleave_codes(codes))
+
+    # 文字列からもsplit済みのリストからも元のコードに戻ることを確認
+    for flattened in (snac_tokens, snac_tokens.split(" ")):
+        reconstructed = reconstruct_tensors(flattened, torch.device("cpu"))
+        assert len(reconstructed) == 4
+        assert all(torch.equal(a, b) for a, b in zip(reconstructed, codes))
+
+def test_reconstruct_matches_legacy_on_dataset():
+    with open("data/dataset/answer_snac.json", "r", encoding="utf-8") as f:
+        rows = json.load(f)
+
+    for row in rows:
+        tokens = row.split(" ")
+        legacy = legacy_reconstruct_tensors(tokens, torch.device("cpu"))
+        reconstructed = reconstruct_tensors(tokens, torch.device("cpu"))
+        assert all(torch.equal(a, b) for a, b in zip(legacy, reconstructed))
+
+def test_reconstruct_24khz_layout():
+    codes = [torch.randint(0, 4096, (1, 5 * 2 ** i)) for i in range(3)]
+    frames = interleave_codes(codes)
+
+    # 7トークンのレイアウトでは3階層に戻る
+    reconstructed = reconstruct_tensors(parse_snac_codes(render_snac_tokens(frames)), torch.device("cpu"))
+    assert len(reconstructed) == 3
+    assert all(torch.equal(a, b) for a, b in zip(reconstructed, codes))
+
+def test_reconstruct_from_1d_array():
+    codes = random_codes(6)
+    tokens = np.array(render_snac_tokens(interleave_codes(codes)).split(" "))
+
+    # split済みのリストをnp.arrayにした1次元の配列からも元のコードに戻る
+    reconstructed = reconstruct_tensors(tokens, torch.device("cpu"))
+    assert all(torch.equal(a, b) for a, b in zip(reconstructed, codes))
+
+def test_reconstruct_malformed_input_raises():
+    # 不正な行は空のクリップとして扱わず、呼び出し元に伝える
+    with pytest.raises(ValueError):
+        reconstruct_tensors(["1", "2", "3"], torch.device("cpu"))
+    with pytest.raises(ValueError):
+        reconstruct_tensors("# 1 2 3 # 4 5 6", torch.device("cpu"))
+    with pytest.raises(ValueError):
+        reconstruct_tensors("# 1 2 x 4 5 6 7", torch.device("cpu"))
+    with pytest.raises(ValueError):
+        parse_snac_codes(np.arange(14))
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+import torch
+from snac import SNAC
+
+from scripts.snac.streaming import StreamingSNACDecoder, decode_chunked, encode_chunked, iter_decode_chunked
+from scripts.utils.snac_utils import interleave_codes
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    # 44kHzモデルと同じ構成（hop 384, vq_strides [8, 4, 2, 1], 窓32）の小さなモデル。
+    # デコード結果を比較するため、ノイズは無効にする
+    torch.manual_seed(0)
+    model = SNAC(
+        sampling_rate=44100,
+        encoder_dim=4,
+        encoder_rates=[2, 3, 8, 8],
+        decoder_dim=64,
+        decoder_rates=[8, 8, 3, 2],
+        attn_window_size=32,
+        vq_strides=[8, 4, 2, 1],
+        noise=False,
+    )
+    return model.eval()
+
+@pytest.fixture(scope="module")
+def waveform():
+    torch.manual_seed(1)
+    length = 44100 * 5 + 1234
+    t = torch.arange(length) / 44100
+    return (0.3 * torch.sin(2 * np.pi * 220 * t) + 0.05 * torch.randn(length)).view(1, 1, -1)
+
+def test_encode_chunked_matches_single_pass(small_model, waveform):
+    with torch.inference_mode():
+        expected = small_model.encode(waveform)
+
+    codes = encode_chunked(small_model, waveform, chunk_seconds=1.0, overlap_seconds=0.5)
+
+    # ユニット単位に揃えた十分な重なりがあれば、1回でエンコードした場合と同じコードになる
+    assert [code.shape for code in codes] == [code.shape for code in expected]
+    assert all(torch.equal(a, b) for a, b in zip(codes, expected))
+
+def test_decode_chunked_length_and_fidelity(small_model, waveform):
+    with torch.inference_mode():
+        codes = small_model.encode(waveform)
+        expected = small_model.decode(codes)
+
+    audio = decode_chunked(small_model, interleave_codes(codes), chunk_seconds=1.0, overlap_seconds=0.5)
+
+    assert audio.shape == expected.shape
+    correlation = torch.corrcoef(torch.stack([audio.flatten(), expected.flatten()]))[0, 1]
+    assert correlation > 0.99
+
+def test_streaming_decoder_outputs_before_flush(small_model, waveform):
+    with torch.inference_mode():
+        codes = small_model.encode(waveform)
+    frames = interleave_codes(codes)
+
+    decoder = StreamingSNACDecoder(small_model, chunk_seconds=1.0, overlap_seconds=0.3)
+    pieces = [decoder.push(frames[i:i + 5]) for i in range(0, len(frames), 5)]
+    # トークン列全体が揃う前に音声が出力される
+    assert sum(piece.size(-1) for piece in pieces) > 0
+    pieces.append(decoder.flush())
+
+    samples_per_frame = 384 * 8
+    assert sum(piece.size(-1) for piece in pieces) == len(frames) * samples_per_frame
+
+def test_decode_chunked_pads_partial_unit(small_model):
+    # アテンションの窓に揃わない長さ（6フレーム）でもデコードできる
+    frames = np.random.default_rng(0).integers(0, 4096, size=(6, 15))
+    audio = decode_chunked(small_model, frames)
+
+    assert audio.shape == (1, 1, 6 * 384 * 8)
+
+def test_iter_decode_chunked_pushes_one_chunk_at_a_time(small_model, waveform, monkeypatch):
+    with torch.inference_mode():
+        codes = small_model.encode(waveform)
+    frames = interleave_codes(codes)
+
+    pushed = []
+    push = StreamingSNACDecoder.push
+
+    def spy(self, snac_tokens):
+        audio = push(self, snac_tokens)
+        pushed.append((self.chunk_frames * self.samples_per_frame, audio.size(-1)))
+        return audio
+
+    monkeypatch.setattr(StreamingSNACDecoder, "push", spy)
+    pieces = list(iter_decode_chunked(small_model, frames, chunk_seconds=1.0, overlap_seconds=0.3))
+
+    # 1回のpushで返る音声は最大で1チャンク分
+    assert len(pushed) > 1
+    assert all(samples <= chunk for chunk, samples in pushed)
+    assert sum(piece.size(-1) for piece in pieces) == len(frames) * 384 * 8
+    assert torch.equal(torch.cat(pieces, dim=-1), decode_chunked(small_model, frames, chunk_seconds=1.0, overlap_seconds=0.3))
@@ -0,0 +1,188 @@
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager
+
+
+class AIMDConcurrencyLimiter:
+    """
+    Adaptive concurrency limit for one Style-Bert-VITS2 server (AIMD).
+
+    The limit grows additively (about +1 per round of `limit` completed requests) while
+    the observed latency stays close to the no-load latency, and is cut multiplicatively
+    when the latency spikes or a request fails. The limiter is thread-safe, since the
+    synthesis requests are blocking calls that run in worker threads.
+
+    Every request has a fixed overhead on top of a part that grows with its cost (e.g.
+    the number of characters), so the no-load latency is modelled as `a + b * cost`:
+    a least-squares line through the recent samples, shifted down to their lower
+    envelope. Each latency is compared with this baseline for its own cost, so a mix of
+    short and long segments does not look like a spike.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.3,
+        window: int = 100,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_limit (int): The concurrency limit to start with. Default is 2.
+            min_limit (int): The lowest limit. Default is 1.
+            max_limit (int): The highest limit. Default is 16.
+            decrease_factor (float): Factor applied to the limit on a latency spike or an error. Default is 0.5.
+            latency_tolerance (float): A smoothed latency above baseline * tolerance counts as a spike. Default is 2.0.
+            smoothing (float): Weight of the newest sample in the smoothed latency. Default is 0.3.
+            window (int): Number of recent samples kept for the baseline fit and the percentiles. Default is 100.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._latencies = deque(maxlen=window)
+        self._costs = deque(maxlen=window)
+        self._smoothed = None
+        self._completed = 0
+        self._errors = 0
+        self._since_decrease = int(self._limit)
+
+    @property
+    def limit(self) -> int:
+        """The current concurrency limit."""
+        return int(self._limit)
+
+    def acquire(self):
+        """
+        Block until a request slot is available.
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, latency: float, success: bool = True, cost: float = 1.0):
+        """
+        Release a request slot and update the limit from the outcome of the request.
+
+        Args:
+            latency (float): The latency of the request in seconds.
+            success (bool): Whether the request succeeded. Default is True.
+            cost (float): Size of the request (e.g. number of characters) used to pick the baseline latency.
+        """
+        with self._condition:
+            # The limit only matters if at least half of it was in use
+            was_saturated = self._in_flight * 2 >= int(self._limit)
+            self._in_flight -= 1
+            self._since_decrease += 1
+
+            if not success:
+                self._errors += 1
+                self._decrease()
+            else:
+                self._completed += 1
+                self._latencies.append(latency)
+                self._costs.append(float(cost))
+                # Latency relative to the no-load latency for a request of the same cost
+                ratio = latency / self._baseline(float(cost))
+                if self._smoothed is None:
+                    self._smoothed = ratio
+                else:
+                    self._smoothed += self.smoothing * (ratio - self._smoothed)
+
+                if self._smoothed > self.latency_tolerance:
+                    self._decrease()
+                elif was_saturated:
+                    # Additive increase: about +1 per round of `limit` completed requests
+                    self._limit = min(self._limit + 1.0 / self._limit, float(self.max_limit))
+
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, cost: float = 1.0):
+        """
+        Run a request inside a slot and record its latency and outcome.
+
+        Args:
+            cost (float): Size of the request used to pick the baseline latency.
+        """
+        self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.release(time.perf_counter() - start, success=False, cost=cost)
+            raise
+        self.release(time.perf_counter() - start, success=True, cost=cost)
+
+    def stats(self) -> dict:
+        """
+        Get the current limit and the observed latencies.
+
+        Returns:
+            dict: The limit, in-flight requests, counters and latency percentiles in seconds.
+        """
+        with self._condition:
+            latencies = sorted(self._latencies)
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "errors": self._errors,
+                "latency_p50": self._percentile(latencies, 0.5),
+                "latency_p95": self._percentile(latencies, 0.95),
+            }
+
+    def _baseline(self, cost: float) -> float:
+        """
+        The no-load latency of a request of the given cost.
+
+        Fits `latency = a + b * cost` to the recent samples by least squares and moves
+        the line down to the lowest residual, so it follows the fastest requests. With a
+        single distinct cost the line is flat, i.e. the lowest recent latency.
+        """
+        n = len(self._latencies)
+        mean_cost = sum(self._costs) / n
+        mean_latency = sum(self._latencies) / n
+        variance = sum((c - mean_cost) ** 2 for c in self._costs)
+        slope = 0.0
+        if variance > 0:
+            covariance = sum((c - mean_cost) * (l - mean_latency) for c, l in zip(self._costs, self._latencies))
+            slope = max(covariance / variance, 0.0)
+        intercept = min(l - slope * c for c, l in zip(self._costs, self._latencies))
+        baseline = intercept + slope * cost
+        # The fit says nothing useful for a cost far below the samples; fall back to the fastest request
+        return baseline if baseline > 0 else min(self._latencies)
+
+    def _decrease(self):
+        """
+        Cut the limit, at most once per round of requests.
+
+        Requests that were already in flight were sent under the old limit, so their
+        latencies are not used for another decrease.
+        """
+        if self._since_decrease < int(self._limit):
+            return
+        self._limit = max(self._limit * self.decrease_factor, float(self.min_limit))
+        self._since_decrease = -self._in_flight
+        # Let the smoothed latency settle again at the new limit
+        self._smoothed = None
+
+    @staticmethod
+    def _percentile(values: list, q: float):
+        """Percentile of sorted values, or None if there are none."""
+        if not values:
+            return None
+        return values[min(int(q * len(values)), len(values) - 1)]
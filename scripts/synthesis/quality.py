@@ -0,0 +1,145 @@
+import numpy as np
+
+from dataclasses import dataclass, asdict
+from typing import List, Optional, Tuple
+
+
+@dataclass
+class QCThresholds:
+    """
+    Thresholds of the audio quality gate.
+
+    Attributes:
+        min_rms_db (float): Minimum overall RMS in dBFS. Quieter clips are treated as silent.
+        max_clipped_ratio (float): Maximum ratio of samples at full scale.
+        clip_level (float): Absolute amplitude counted as clipped.
+        max_leading_silence (float): Maximum silence before the first voiced frame in seconds.
+        max_trailing_silence (float): Maximum silence after the last voiced frame in seconds.
+        min_sec_per_char (float): Minimum duration per character of the text in seconds.
+        max_sec_per_char (float): Maximum duration per character of the text in seconds.
+        silence_db (float): Frames below this RMS in dBFS count as silence.
+        frame_ms (float): Frame length used for the silence detection in milliseconds.
+    """
+    min_rms_db: float = -40.0
+    max_clipped_ratio: float = 0.001
+    clip_level: float = 0.999
+    max_leading_silence: float = 1.0
+    max_trailing_silence: float = 1.5
+    min_sec_per_char: float = 0.05
+    max_sec_per_char: float = 0.35
+    silence_db: float = -45.0
+    frame_ms: float = 20.0
+
+
+class AudioQualityGate:
+    """
+    A fast NumPy-based quality check of synthesized audio before SNAC encoding.
+
+    Silent clips, clipped clips and clips whose duration is far out of line with the
+    length of the text are rejected so they can be synthesized again instead of being
+    encoded into the dataset.
+    """
+
+    def __init__(self, thresholds: Optional[QCThresholds] = None):
+        """
+        Initialize the quality gate.
+
+        Args:
+            thresholds (QCThresholds, optional): The thresholds to use. Default is QCThresholds().
+        """
+        self.thresholds = thresholds or QCThresholds()
+
+    def compute_stats(self, waveform: np.ndarray, sample_rate: int, text: str) -> dict:
+        """
+        Compute the quality statistics of a clip.
+
+        Args:
+            waveform (np.ndarray): Samples in [-1, 1] with shape (samples,) or (channels, samples).
+            sample_rate (int): The sample rate of the clip.
+            text (str): The text the clip was synthesized from.
+
+        Returns:
+            dict: RMS and peak in dBFS, clipped ratio, leading/trailing silence and duration in
+                seconds, and seconds per character.
+        """
+        t = self.thresholds
+        samples = np.asarray(waveform, dtype=np.float32)
+        if samples.ndim == 2:
+            samples = samples.mean(axis=0)
+
+        duration = samples.size / sample_rate
+        abs_samples = np.abs(samples)
+        peak = float(abs_samples.max()) if samples.size else 0.0
+        rms = float(np.sqrt(np.mean(np.square(samples)))) if samples.size else 0.0
+        clipped_ratio = float(np.mean(abs_samples >= t.clip_level)) if samples.size else 0.0
+
+        # Frame-wise RMS in dBFS to find the first and last voiced frames
+        frame_length = max(int(sample_rate * t.frame_ms / 1000), 1)
+        n_frames = samples.size // frame_length
+        if n_frames > 0:
+            frames = samples[: n_frames * frame_length].reshape(n_frames, frame_length)
+            frame_db = 10 * np.log10(np.mean(np.square(frames), axis=1) + 1e-12)
+            voiced = np.flatnonzero(frame_db > t.silence_db)
+        else:
+            voiced = np.empty(0, dtype=np.int64)
+
+        if voiced.size:
+            leading_silence = voiced[0] * frame_length / sample_rate
+            trailing_silence = (n_frames - 1 - voiced[-1]) * frame_length / sample_rate
+        else:
+            leading_silence = trailing_silence = duration
+
+        n_chars = len("".join((text or "").split()))
+
+        return {
+            "duration": round(duration, 4),
+            "rms_db": round(20 * np.log10(rms + 1e-12), 2),
+            "peak_db": round(20 * np.log10(peak + 1e-12), 2),
+            "clipped_ratio": round(clipped_ratio, 6),
+            "leading_silence": round(float(leading_silence), 4),
+            "trailing_silence": round(float(trailing_silence), 4),
+            "sec_per_char": round(duration / n_chars, 4) if n_chars else None,
+        }
+
+    def check(self, waveform: np.ndarray, sample_rate: int, text: str) -> Tuple[bool, dict]:
+        """
+        Check a clip against the thresholds.
+
+        Args:
+            waveform (np.ndarray): Samples in [-1, 1] with shape (samples,) or (channels, samples).
+            sample_rate (int): The sample rate of the clip.
+            text (str): The text the clip was synthesized from.
+
+        Returns:
+            Tuple[bool, dict]: Whether the clip passed, and its statistics with the list of
+                failed checks under "failures".
+        """
+        t = self.thresholds
+        stats = self.compute_stats(waveform, sample_rate, text)
+
+        failures: List[str] = []
+        if stats["rms_db"] < t.min_rms_db:
+            failures.append("silent")
+        if stats["clipped_ratio"] > t.max_clipped_ratio:
+            failures.append("clipped")
+        if stats["leading_silence"] > t.max_leading_silence:
+            failures.append("leading_silence")
+        if stats["trailing_silence"] > t.max_trailing_silence:
+            failures.append("trailing_silence")
+        if stats["sec_per_char"] is not None:
+            if stats["sec_per_char"] < t.min_sec_per_char:
+                failures.append("too_short")
+            elif stats["sec_per_char"] > t.max_sec_per_char:
+                failures.append("too_long")
+
+        stats["failures"] = failures
+        return not failures, stats
+
+    def to_dict(self) -> dict:
+        """
+        Get the thresholds as a dictionary, e.g. to record them with the results.
+
+        Returns:
+            dict: The thresholds.
+        """
+        return asdict(self.thresholds)
@@ -0,0 +1,203 @@
+import random
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+
+@dataclass
+class SynthesisJob:
+    """
+    A single synthesis request planned by the scheduler.
+
+    Attributes:
+        index (int): Position of the text in the input list.
+        text (str): The text to synthesize.
+        model (str): The voice (model name) assigned to the text.
+        endpoint (str): Base URL of the Style-Bert-VITS2 server the request is sent to.
+    """
+    index: int
+    text: str
+    model: str
+    endpoint: str
+
+
+class ModelAffinityScheduler:
+    """
+    Plan synthesis requests so that each server keeps working on the same model.
+
+    Style-Bert-VITS2 swaps model weights whenever consecutive requests use different
+    models, which throws away its warm caches. This scheduler assigns voices up front
+    with a balanced distribution, orders the requests so that requests for the same
+    model run back to back, and pins every model to a fixed set of servers when
+    several endpoints are available.
+    """
+
+    def __init__(self, models: List[str], endpoints: List[str], seed: Optional[int] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            models (List[str]): Names of the voices that can be assigned.
+            endpoints (List[str]): Base URLs of the available servers.
+            seed (int, optional): Seed for the voice assignment. Default is None.
+
+        Raises:
+            ValueError: If no model or no endpoint is given.
+        """
+        if not models:
+            raise ValueError("At least one model is required.")
+        if not endpoints:
+            raise ValueError("At least one endpoint is required.")
+
+        self.models = list(models)
+        self.endpoints = list(endpoints)
+        self._rng = random.Random(seed)
+
+    def assign_models(self, n_items: int) -> List[str]:
+        """
+        Assign a voice to each item with a balanced distribution.
+
+        Every model is used either floor(n / m) or ceil(n / m) times, and the models
+        that receive the extra item as well as the order of assignments are random.
+
+        Args:
+            n_items (int): The number of items to assign.
+
+        Returns:
+            List[str]: The model name for each item.
+        """
+        base, remainder = divmod(n_items, len(self.models))
+        assignments = []
+        for model in self.models:
+            assignments.extend([model] * base)
+        assignments.extend(self._rng.sample(self.models, remainder))
+        self._rng.shuffle(assignments)
+        return assignments
+
+    def pin_endpoints(self, models: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """
+        Pin every model to a fixed set of endpoints.
+
+        With at least as many endpoints as models, the endpoints are dealt out round-robin
+        so that each model owns one or more servers exclusively. Otherwise the models are
+        dealt out over the endpoints so that each server only loads a subset of the models.
+
+        Args:
+            models (List[str], optional): The models to pin. Pass only the models a plan
+                actually uses, so that no endpoint is left to an unused model.
+                Default is every model of the scheduler.
+
+        Returns:
+            Dict[str, List[str]]: The endpoints each model is pinned to.
+        """
+        models = list(models) if models else self.models
+        pinned = {model: [] for model in models}
+        if len(self.endpoints) >= len(models):
+            for i, endpoint in enumerate(self.endpoints):
+                pinned[models[i % len(models)]].append(endpoint)
+        else:
+            for i, model in enumerate(models):
+                pinned[model].append(self.endpoints[i % len(self.endpoints)])
+        return pinned
+
+    def plan(
+        self,
+        texts: List[str],
+        model: str = None,
+        is_random: bool = False,
+        longest_first: bool = True,
+        lengths: Optional[Sequence[float]] = None,
+    ) -> List[SynthesisJob]:
+        """
+        Build the ordered list of synthesis jobs.
+
+        Jobs are grouped by model so that consecutive requests to a server use the same
+        weights. When a model is pinned to several endpoints, its jobs are spread over
+        them round-robin. With longest_first, the longest texts of each group are
+        dispatched first, so the last requests to finish are short ones and the run does
+        not wait on a single long text at the tail.
+
+        Args:
+            texts (List[str]): The texts to synthesize.
+            model (str, optional): Use this model for every text.
+            is_random (bool, optional): If True, assign the voices with a balanced random distribution.
+                Otherwise the first model is used.
+            longest_first (bool, optional): If True, dispatch the longest texts of each group first.
+            lengths (Sequence[float], optional): Length of each text used to order the jobs, e.g. the
+                estimated duration of the speech. Default is the number of characters.
+
+        Returns:
+            List[SynthesisJob]: The jobs in dispatch order.
+        """
+        if model:
+            assignments = [model] * len(texts)
+        elif is_random:
+            assignments = self.assign_models(len(texts))
+        else:
+            assignments = [self.models[0]] * len(texts)
+
+        groups = OrderedDict((name, []) for name in self.models)
+        for index, (text, name) in enumerate(zip(texts, assignments)):
+            groups.setdefault(name, []).append((index, text))
+        # Share the endpoints only among the models that have jobs, so a fixed voice uses every server
+        pinned = self.pin_endpoints([name for name, items in groups.items() if items])
+
+        if lengths is None:
+            lengths = [len(text or "") for text in texts]
+
+        jobs = []
+        for name, items in groups.items():
+            if longest_first:
+                items.sort(key=lambda item: lengths[item[0]], reverse=True)
+            endpoints = pinned.get(name) or self.endpoints
+            for i, (index, text) in enumerate(items):
+                jobs.append(SynthesisJob(index, text, name, endpoints[i % len(endpoints)]))
+        return jobs
+
+    def plan_fan_out(
+        self, texts: List[str], models: Optional[List[str]] = None, longest_first: bool = True
+    ) -> List[SynthesisJob]:
+        """
+        Build the jobs to synthesize every text with every voice.
+
+        Jobs are grouped by model as in `plan`, so each server finishes one voice before
+        loading the next one, and each model is sent to its pinned endpoints.
+
+        Args:
+            texts (List[str]): The texts to synthesize.
+            models (List[str], optional): The voices to use. Default is every model of the scheduler.
+            longest_first (bool, optional): If True, dispatch the longest texts of each voice first.
+
+        Returns:
+            List[SynthesisJob]: One job per text and voice in dispatch order. `index` is the
+                position of the text in `texts`.
+        """
+        models = list(models) if models else self.models
+        order = list(range(len(texts)))
+        if longest_first:
+            order.sort(key=lambda index: len(texts[index] or ""), reverse=True)
+
+        pinned = self.pin_endpoints(models)
+        jobs = []
+        for name in models:
+            endpoints = pinned.get(name) or self.endpoints
+            for i, index in enumerate(order):
+                jobs.append(SynthesisJob(index, texts[index], name, endpoints[i % len(endpoints)]))
+        return jobs
+
+    @staticmethod
+    def group_by_endpoint(jobs: List[SynthesisJob]) -> Dict[str, List[SynthesisJob]]:
+        """
+        Split the planned jobs into one queue per endpoint, keeping the dispatch order.
+
+        Args:
+            jobs (List[SynthesisJob]): The jobs returned by `plan`.
+
+        Returns:
+            Dict[str, List[SynthesisJob]]: The jobs to send to each endpoint.
+        """
+        queues = OrderedDict()
+        for job in jobs:
+            queues.setdefault(job.endpoint, []).append(job)
+        return queues
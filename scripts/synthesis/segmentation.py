@@ -0,0 +1,94 @@
+from typing import List
+
+# Characters after which a text may be split, in the same spirit as the Style-Bert-VITS2 auto split.
+DELIMITERS = "、。,. "
+
+# Remove spaces and put a line break after each punctuation mark in a single pass.
+_NORMALIZE_TABLE = str.maketrans({
+    " ": None,
+    "、": "、\n",
+    "。": "。\n",
+    ",": ",\n",
+    ".": ".\n",
+})
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a text segment before sending it to the API.
+
+    Spaces are removed and a line break is inserted after every punctuation mark so the
+    server splits the segment at natural pauses. This is a single `str.translate` call
+    instead of a chain of `str.replace` calls.
+
+    Args:
+        text (str): The text segment to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    return text.translate(_NORMALIZE_TABLE)
+
+
+def plan_segments(text: str, max_length: int = 100, delimiters: str = DELIMITERS) -> List[str]:
+    """
+    Split text into as few segments as possible, with lengths balanced within max_length.
+
+    Splitting greedily at the last delimiter before max_length often leaves a tiny trailing
+    segment that still costs a full request round trip. This planner first finds the
+    minimum number of segments and then, among the splits with that many segments,
+    chooses the one whose segment lengths are the most even (minimum sum of squares).
+    Cuts are only made right after a delimiter; if a stretch longer than max_length has
+    no delimiter, it is forcibly cut every max_length characters.
+
+    Args:
+        text (str): The text to split.
+        max_length (int): The maximum length of each text segment.
+        delimiters (str): Characters after which the text may be split.
+
+    Returns:
+        list: A list of text segments.
+    """
+    if len(text) <= max_length:
+        return [text] if text.strip() else []
+
+    # Allowed cut positions: the start, right after each delimiter, and the end
+    positions = [0]
+    for i, char in enumerate(text):
+        if char in delimiters:
+            positions.append(i + 1)
+    if positions[-1] != len(text):
+        positions.append(len(text))
+
+    # Add forced cut positions inside stretches without any delimiter
+    cuts = [0]
+    for position in positions[1:]:
+        while position - cuts[-1] > max_length:
+            cuts.append(cuts[-1] + max_length)
+        if position != cuts[-1]:
+            cuts.append(position)
+
+    # best[j] = (number of segments, sum of squared lengths, previous cut) for text[:cuts[j]]
+    inf = (float("inf"), float("inf"), -1)
+    best = [inf] * len(cuts)
+    best[0] = (0, 0, -1)
+    for j in range(1, len(cuts)):
+        i = j - 1
+        while i >= 0 and cuts[j] - cuts[i] <= max_length:
+            if best[i][0] != float("inf"):
+                length = cuts[j] - cuts[i]
+                candidate = (best[i][0] + 1, best[i][1] + length * length, i)
+                if candidate[:2] < best[j][:2]:
+                    best[j] = candidate
+            i -= 1
+
+    segments = []
+    j = len(cuts) - 1
+    while j > 0:
+        i = best[j][2]
+        segments.append(text[cuts[i]:cuts[j]])
+        j = i
+    segments.reverse()
+
+    # Segments made only of spaces would be sent as empty requests
+    return [segment for segment in segments if segment.strip()]
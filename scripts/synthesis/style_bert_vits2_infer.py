@@ -3,10 +3,16 @@ import os
 import io
 import random
 import requests
+import numpy as np
 
+from typing import List, Optional, Tuple
 from pydub import AudioSegment
 from dotenv import load_dotenv
 
+from scripts.synthesis.concurrency import AIMDConcurrencyLimiter
+from scripts.synthesis.scheduler import ModelAffinityScheduler
+from scripts.synthesis.segmentation import normalize_text, plan_segments
+
 
 class VoiceSynthesizer:
     """
@@ -18,15 +24,25 @@ class VoiceSynthesizer:
     automatically splits the text before synthesis.
     """
 
-    def __init__(self, is_debug: bool = False, silent_interval_ms: int = 300):
+    def __init__(
+        self,
+        is_debug: bool = False,
+        silent_interval_ms: int = 300,
+        initial_concurrency: int = 2,
+        max_concurrency: int = 16,
+    ):
         """
         Initialize the VoiceSynthesizer.
 
         Loads the available models from 'model_list.json' and retrieves model information
-        from the API. Also loads the base URL from environment variables.
+        from the API. Also loads the base URL from environment variables. Several servers
+        can be given as a comma-separated list; they are expected to serve the same models.
 
         Args:
             is_debug (bool): Enable debug mode if True. Default is False.
+            silent_interval_ms (int): Silence inserted between segments in milliseconds. Default is 300.
+            initial_concurrency (int): Concurrent requests allowed per server at start. Default is 2.
+            max_concurrency (int): Upper bound of the adaptive concurrency per server. Default is 16.
 
         Raises:
             EnvironmentError: If the API base URL is not set in environment variables.
@@ -34,6 +50,7 @@ class VoiceSynthesizer:
         """
         self.is_debug = is_debug
         self.silent_interval_ms = silent_interval_ms
+        self.max_concurrency = max_concurrency
         # Load environment variables
         load_dotenv()
 
@@ -42,6 +59,15 @@ class VoiceSynthesizer:
         if base_url is None:
             raise EnvironmentError("Environment variable 'STYLE_BERT_VITS2_API_LOCAL_URL' is not set.")
 
+        self.endpoints = [url.strip() for url in base_url.split(",") if url.strip()]
+        base_url = self.endpoints[0]
+
+        # Adaptive (AIMD) concurrency limit for each server
+        self.limiters = {
+            endpoint: AIMDConcurrencyLimiter(initial_limit=initial_concurrency, max_limit=max_concurrency)
+            for endpoint in self.endpoints
+        }
+
         self.voice_synthesizer_url = f"{base_url}/voice"
         self.doc_url = f"{base_url}/docs"
         self.models_info_url = f"{base_url}/models/info"
@@ -68,7 +94,15 @@ class VoiceSynthesizer:
         # Check if the server is ready
         self.check_server_ready()
 
-    def synthesize(self, text: str, save_path: str, model: str = None, is_random: bool = False):
+    def synthesize(
+        self,
+        text: str,
+        save_path: str,
+        model: str = None,
+        is_random: bool = False,
+        endpoint: str = None,
+        segments: Optional[List[str]] = None,
+    ):
         """
         Synthesize speech from text and save it to a specified path.
 
@@ -77,6 +111,9 @@ class VoiceSynthesizer:
             save_path (str): The file path where the synthesized audio will be saved.
             model (str, optional): The model name to use for synthesis. If not specified, the default model is used.
             is_random (bool, optional): If True, select a random model from available models.
+            endpoint (str, optional): Base URL of the server to send the requests to. Default is the first server.
+            segments (List[str], optional): Segments returned by `prepare_segments` for this text.
+                If given, the text is not split and normalized again.
 
         Raises:
             ValueError: If the specified model does not exist.
@@ -86,6 +123,96 @@ class VoiceSynthesizer:
             f"Synthesize called with text: '{text}', save_path: '{save_path}', model: '{model}', is_random: {is_random}"
         )
 
+        combined_audio = self._synthesize_audio(text, model, is_random, endpoint, segments)
+
+        # Write the combined audio data to the output file
+        combined_audio.export(save_path, format="wav")
+        self._debug_print(f"Synthesized audio saved to '{save_path}'")
+
+    def synthesize_to_array(
+        self,
+        text: str,
+        model: str = None,
+        is_random: bool = False,
+        save_path: Optional[str] = None,
+        endpoint: str = None,
+        segments: Optional[List[str]] = None,
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Synthesize speech from text and return the PCM samples in memory.
+
+        This lets the caller hand the audio straight to the SNAC encoder without a
+        round trip through a WAV file. Writing the WAV is kept as an optional side output.
+
+        Args:
+            text (str): The text to be synthesized.
+            model (str, optional): The model name to use for synthesis. If not specified, the default model is used.
+            is_random (bool, optional): If True, select a random model from available models.
+            save_path (str, optional): If given, the synthesized audio is also saved to this path.
+            endpoint (str, optional): Base URL of the server to send the requests to. Default is the first server.
+            segments (List[str], optional): Segments returned by `prepare_segments` for this text.
+                If given, the text is not split and normalized again.
+
+        Returns:
+            Tuple[np.ndarray, int]: Float32 samples in [-1, 1] with shape (channels, samples), and the sample rate.
+
+        Raises:
+            ValueError: If the specified model does not exist.
+            Exception: If an error occurs during API calls.
+        """
+        self._debug_print(
+            f"Synthesize to array called with text: '{text}', model: '{model}', is_random: {is_random}"
+        )
+
+        combined_audio = self._synthesize_audio(text, model, is_random, endpoint, segments)
+
+        if save_path:
+            combined_audio.export(save_path, format="wav")
+            self._debug_print(f"Synthesized audio saved to '{save_path}'")
+
+        return self._audio_segment_to_array(combined_audio), combined_audio.frame_rate
+
+    def prepare_segments(self, text: str, max_length: int = 100) -> List[str]:
+        """
+        Split and normalize a text once, so that it can be synthesized with several voices.
+
+        The result can be passed as `segments` to `synthesize` and `synthesize_to_array`
+        for every voice, instead of splitting and normalizing the same text per request.
+
+        Args:
+            text (str): The text to prepare.
+            max_length (int): The maximum length of each text segment.
+
+        Returns:
+            List[str]: The normalized segments, sent to the API as they are.
+        """
+        return [normalize_text(segment) for segment in self._split_text(text, max_length)]
+
+    def _synthesize_audio(
+        self,
+        text: str,
+        model: str = None,
+        is_random: bool = False,
+        endpoint: str = None,
+        segments: Optional[List[str]] = None,
+    ) -> AudioSegment:
+        """
+        Synthesize all segments of the text and concatenate them with silent intervals.
+
+        Args:
+            text (str): The text to be synthesized.
+            model (str, optional): The model name to use for synthesis.
+            is_random (bool, optional): If True, select a random model from available models.
+            endpoint (str, optional): Base URL of the server to send the requests to.
+            segments (List[str], optional): Normalized segments from `prepare_segments`.
+
+        Returns:
+            AudioSegment: The combined audio.
+
+        Raises:
+            ValueError: If the specified model does not exist.
+            Exception: If an error occurs during API calls.
+        """
         # Select the model
         if model:
             if model not in self.models_name_map:
@@ -98,19 +225,29 @@ class VoiceSynthesizer:
             selected_model = list(self.models_name_map.keys())[0]  # Default model
             self._debug_print(f"Using default model: {selected_model}")
 
+        endpoint = endpoint or self.endpoints[0]
+        voice_url = f"{endpoint}/voice"
+        limiter = self.limiters.get(endpoint)
+        if limiter is None:
+            limiter = self.limiters.setdefault(endpoint, AIMDConcurrencyLimiter(max_limit=self.max_concurrency))
+
         # Split text into segments if necessary
-        segments = self._split_text(text)
+        normalized = segments is not None
+        if not normalized:
+            segments = self._split_text(text)
         self._debug_print(f"Text segments: {segments}")
 
         # Synthesize each segment and collect audio data
         combined_audio = AudioSegment.empty()
         silent_segment = AudioSegment.silent(duration=self.silent_interval_ms)  # 無音
         for idx, segment in enumerate(segments):
-            params = self._get_params(segment, self.models_name_map[selected_model])
+            params = self._get_params(segment, self.models_name_map[selected_model], normalized=normalized)
             self._debug_print(f"API parameters: {params}")
             try:
-                response = requests.get(self.voice_synthesizer_url, params=params)
-                response.raise_for_status()
+                # The limiter waits for a free slot and records the latency of the request
+                with limiter.slot(cost=len(segment)):
+                    response = requests.get(voice_url, params=params)
+                    response.raise_for_status()
                 audio_segment = AudioSegment.from_file(io.BytesIO(response.content), format="wav")
                 combined_audio += audio_segment
                 self._debug_print(f"Synthesized segment with length {len(response.content)} bytes")
@@ -124,9 +261,22 @@ class VoiceSynthesizer:
             except Exception as e:
                 raise Exception(f"Audio data processing failed: {e}")
 
-        # Write the combined audio data to the output file
-        combined_audio.export(save_path, format="wav")
-        self._debug_print(f"Synthesized audio saved to '{save_path}'")
+        return combined_audio
+
+    @staticmethod
+    def _audio_segment_to_array(audio: AudioSegment) -> np.ndarray:
+        """
+        Convert an AudioSegment into float32 samples.
+
+        Args:
+            audio (AudioSegment): The audio to convert.
+
+        Returns:
+            np.ndarray: Samples in [-1, 1] with shape (channels, samples).
+        """
+        samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+        samples = samples.reshape(-1, audio.channels).T
+        return samples / float(1 << (8 * audio.sample_width - 1))
 
     def _get_models_info(self) -> dict:
         """
@@ -146,19 +296,20 @@ class VoiceSynthesizer:
         except requests.RequestException as e:
             raise Exception(f"Failed to retrieve model information: {e}")
 
-    def _get_params(self, text: str, model_id: str) -> dict:
+    def _get_params(self, text: str, model_id: str, normalized: bool = False) -> dict:
         """
         Generate parameters for the API call.
 
         Args:
             text (str): The text segment to synthesize.
             model_id (str): The ID of the model to use.
+            normalized (bool): If True, the segment was already normalized by `prepare_segments`.
 
         Returns:
             dict: A dictionary of parameters for the API call.
         """
         params = {
-            "text": text.replace(" ", "").replace("、", "、\n").replace("。", "。\n").replace(",", ",\n").replace(".", ".\n").replace(" ", " \n"),
+            "text": text if normalized else normalize_text(text),
             "model_id": model_id,
             "encoding": "utf-8",
             "speaker_id": 0,
@@ -196,8 +347,9 @@ class VoiceSynthesizer:
         """
         Split text into segments not exceeding max_length characters.
 
-        If no specified delimiters are found, the method will forcibly split at max_length.
-        This ensures that all segments are within the max_length limit, handling potential errors.
+        The number of segments is kept to the minimum and their lengths are balanced, so
+        no tiny trailing segment costs an extra request. If no delimiter is found within
+        max_length characters, the text is forcibly split at max_length.
 
         Args:
             text (str): The text to split.
@@ -206,24 +358,7 @@ class VoiceSynthesizer:
         Returns:
             list: A list of text segments.
         """
-        delimiters = ["、", "。", ",", ".", " ", " "]
-        segments = []
-        while text:
-            if len(text) <= max_length:
-                segments.append(text)
-                break
-            
-            split_index = max_length
-            for delim in reversed(delimiters):
-                index = text.rfind(delim, 0, max_length)
-                if index != -1:
-                    split_index = index + 1
-                    break
-            
-            segments.append(text[:split_index])
-            text = text[split_index:]
-        
-        return segments
+        return plan_segments(text, max_length)
 
     def _debug_print(self, message: str):
         """
@@ -242,12 +377,13 @@ class VoiceSynthesizer:
         Raises:
             Exception: If the server is not ready.
         """
-        try:
-            response = requests.get(self.doc_url)
-            response.raise_for_status()
-            self._debug_print("Server is ready.")
-        except requests.RequestException as e:
-            raise Exception(f"Server is not ready: {e}")
+        for endpoint in self.endpoints:
+            try:
+                response = requests.get(f"{endpoint}/docs")
+                response.raise_for_status()
+                self._debug_print(f"Server '{endpoint}' is ready.")
+            except requests.RequestException as e:
+                raise Exception(f"Server is not ready: {e}")
 
     def get_usable_models(self) -> list:
         """
@@ -258,3 +394,23 @@ class VoiceSynthesizer:
         """
         return list(self.models_name_map.keys())
 
+    def get_concurrency_stats(self) -> dict:
+        """
+        Get the current concurrency limit and observed latencies of each server.
+
+        Returns:
+            dict: The stats of each server's limiter, keyed by base URL.
+        """
+        return {endpoint: limiter.stats() for endpoint, limiter in self.limiters.items()}
+
+    def create_scheduler(self, seed: int = None) -> ModelAffinityScheduler:
+        """
+        Create a scheduler that assigns voices and servers to synthesis requests.
+
+        Args:
+            seed (int, optional): Seed for the voice assignment. Default is None.
+
+        Returns:
+            ModelAffinityScheduler: A scheduler over the usable models and the configured servers.
+        """
+        return ModelAffinityScheduler(self.get_usable_models(), self.endpoints, seed=seed)
@@ -0,0 +1,98 @@
+import random
+import sys
+
+sys.path.insert(0, './')
+
+from scripts.synthesis.concurrency import AIMDConcurrencyLimiter
+
+
+def _run_round(limiter, latency):
+    """Fill every slot and release them all with the given latency."""
+    n = limiter.limit
+    for _ in range(n):
+        limiter.acquire()
+    for _ in range(n):
+        limiter.release(latency)
+
+
+def _run_round_with_costs(limiter, rng, latency_of):
+    """Fill every slot and release them with segments of random length."""
+    n = limiter.limit
+    for _ in range(n):
+        limiter.acquire()
+    for _ in range(n):
+        cost = rng.randint(5, 100)
+        limiter.release(latency_of(cost), cost=cost)
+
+
+class TestAIMDConcurrencyLimiter:
+    """
+    Test cases for the AIMDConcurrencyLimiter class.
+    """
+
+    def test_limit_increases_while_latency_is_flat(self):
+        """
+        Test that the limit grows additively while the latency stays flat.
+        """
+        limiter = AIMDConcurrencyLimiter(initial_limit=2, max_limit=8)
+        for _ in range(20):
+            _run_round(limiter, 0.5)
+        assert limiter.limit == 8
+
+    def test_limit_decreases_on_latency_spike(self):
+        """
+        Test that the limit is cut when the latency rises far above the baseline.
+        """
+        limiter = AIMDConcurrencyLimiter(initial_limit=8, max_limit=8)
+        _run_round(limiter, 0.5)
+        _run_round(limiter, 5.0)
+        assert limiter.limit == 4
+
+    def test_limit_holds_when_lengths_vary_without_load(self):
+        """
+        Test that a fixed per-request overhead does not make short segments look like a spike.
+        """
+        limiter = AIMDConcurrencyLimiter(initial_limit=8, max_limit=8)
+        rng = random.Random(0)
+        limits = []
+        for _ in range(50):
+            _run_round_with_costs(limiter, rng, lambda cost: 0.3 + 0.01 * cost)
+            limits.append(limiter.limit)
+        assert min(limits) == 8
+
+    def test_limit_decreases_on_spike_when_lengths_vary(self):
+        """
+        Test that a real slowdown is still detected with segments of varying length.
+        """
+        limiter = AIMDConcurrencyLimiter(initial_limit=8, max_limit=8)
+        rng = random.Random(0)
+        for _ in range(5):
+            _run_round_with_costs(limiter, rng, lambda cost: 0.3 + 0.01 * cost)
+        _run_round_with_costs(limiter, rng, lambda cost: 3 * (0.3 + 0.01 * cost))
+        assert limiter.limit == 4
+
+    def test_limit_decreases_on_error(self):
+        """
+        Test that a failed request cuts the limit and is counted.
+        """
+        limiter = AIMDConcurrencyLimiter(initial_limit=4)
+        try:
+            with limiter.slot():
+                raise RuntimeError("timeout")
+        except RuntimeError:
+            pass
+        stats = limiter.stats()
+        assert stats["limit"] == 2
+        assert stats["errors"] == 1
+        assert stats["in_flight"] == 0
+
+    def test_stats_report_latencies(self):
+        """
+        Test that the observed latencies are exported.
+        """
+        limiter = AIMDConcurrencyLimiter(initial_limit=2)
+        with limiter.slot(cost=10):
+            pass
+        stats = limiter.stats()
+        assert stats["completed"] == 1
+        assert stats["latency_p50"] is not None
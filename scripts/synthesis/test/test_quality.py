@@ -0,0 +1,73 @@
+import sys
+import numpy as np
+
+sys.path.insert(0, './')
+
+from scripts.synthesis.quality import AudioQualityGate, QCThresholds
+
+SAMPLE_RATE = 44100
+TEXT = "これはテストです。音声合成が正しく動作するか確認します。"  # 28 characters
+
+
+def _speech_like(seconds: float, amplitude: float = 0.3) -> np.ndarray:
+    """A tone with a short silence at both ends."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    wave = amplitude * np.sin(2 * np.pi * 220 * t).astype(np.float32)
+    pad = np.zeros(int(0.1 * SAMPLE_RATE), dtype=np.float32)
+    return np.concatenate([pad, wave, pad])
+
+
+class TestAudioQualityGate:
+    """
+    Test cases for the AudioQualityGate class.
+    """
+
+    def test_good_clip_passes(self):
+        """
+        Test that a clip with a plausible duration passes and records its stats.
+        """
+        passed, stats = AudioQualityGate().check(_speech_like(4.0), SAMPLE_RATE, TEXT)
+        assert passed, stats["failures"]
+        assert abs(stats["leading_silence"] - 0.1) < 0.03
+        assert abs(stats["trailing_silence"] - 0.1) < 0.03
+
+    def test_silent_clip_fails(self):
+        """
+        Test that a silent clip is rejected.
+        """
+        passed, stats = AudioQualityGate().check(np.zeros(SAMPLE_RATE * 4, dtype=np.float32), SAMPLE_RATE, TEXT)
+        assert not passed
+        assert "silent" in stats["failures"]
+
+    def test_clipped_clip_fails(self):
+        """
+        Test that a clipped clip is rejected.
+        """
+        clip = np.clip(_speech_like(4.0, amplitude=3.0), -1.0, 1.0)
+        passed, stats = AudioQualityGate().check(clip, SAMPLE_RATE, TEXT)
+        assert not passed
+        assert "clipped" in stats["failures"]
+
+    def test_duration_out_of_line_fails(self):
+        """
+        Test that a clip far too long for its text is rejected.
+        """
+        passed, stats = AudioQualityGate().check(_speech_like(30.0), SAMPLE_RATE, TEXT)
+        assert not passed
+        assert "too_long" in stats["failures"]
+
+    def test_thresholds_are_configurable(self):
+        """
+        Test that the thresholds can be changed.
+        """
+        gate = AudioQualityGate(QCThresholds(max_sec_per_char=2.0))
+        passed, _ = gate.check(_speech_like(30.0), SAMPLE_RATE, TEXT)
+        assert passed
+
+    def test_stereo_input(self):
+        """
+        Test that a (channels, samples) clip is accepted.
+        """
+        mono = _speech_like(4.0)
+        passed, _ = AudioQualityGate().check(np.stack([mono, mono]), SAMPLE_RATE, TEXT)
+        assert passed
@@ -0,0 +1,125 @@
+import sys
+import pytest
+from collections import Counter
+
+sys.path.insert(0, './')
+
+from scripts.synthesis.scheduler import ModelAffinityScheduler
+
+MODELS = ["jvnv-F1-jp", "jvnv-F2-jp", "jvnv-M1-jp", "jvnv-M2-jp"]
+
+
+class TestModelAffinityScheduler:
+    """
+    Test cases for the ModelAffinityScheduler class.
+    """
+
+    def test_assign_models_is_balanced(self):
+        """
+        Test that every model is assigned floor(n / m) or ceil(n / m) times.
+        """
+        scheduler = ModelAffinityScheduler(MODELS, ["http://127.0.0.1:5000"], seed=0)
+        counts = Counter(scheduler.assign_models(103))
+        assert set(counts) == set(MODELS)
+        assert max(counts.values()) - min(counts.values()) <= 1
+        assert sum(counts.values()) == 103
+
+    def test_plan_groups_jobs_by_model(self):
+        """
+        Test that jobs for the same model are dispatched back to back.
+        """
+        scheduler = ModelAffinityScheduler(MODELS, ["http://127.0.0.1:5000"], seed=0)
+        jobs = scheduler.plan([f"text {i}" for i in range(20)], is_random=True)
+
+        models_in_order = [job.model for job in jobs]
+        switches = sum(1 for a, b in zip(models_in_order, models_in_order[1:]) if a != b)
+        assert switches == len(MODELS) - 1
+        assert sorted(job.index for job in jobs) == list(range(20))
+
+    def test_models_are_pinned_to_endpoints(self):
+        """
+        Test that each model is always sent to the same server when there are fewer servers than models.
+        """
+        endpoints = ["http://server-a:5000", "http://server-b:5000"]
+        scheduler = ModelAffinityScheduler(MODELS, endpoints, seed=0)
+        jobs = scheduler.plan([f"text {i}" for i in range(40)], is_random=True)
+
+        endpoints_per_model = {}
+        for job in jobs:
+            endpoints_per_model.setdefault(job.model, set()).add(job.endpoint)
+        assert all(len(urls) == 1 for urls in endpoints_per_model.values())
+
+        queues = scheduler.group_by_endpoint(jobs)
+        assert set(queues) == set(endpoints)
+        assert sum(len(queue) for queue in queues.values()) == 40
+
+    def test_fixed_model(self):
+        """
+        Test that a fixed model is used for every job.
+        """
+        scheduler = ModelAffinityScheduler(MODELS, ["http://127.0.0.1:5000"])
+        jobs = scheduler.plan(["a", "b", "c"], model="jvnv-M2-jp")
+        assert [job.model for job in jobs] == ["jvnv-M2-jp"] * 3
+
+    def test_fixed_model_uses_every_endpoint(self):
+        """
+        Test that a fixed model is spread over every server instead of being pinned to one.
+        """
+        endpoints = ["http://server-a:5000", "http://server-b:5000"]
+        scheduler = ModelAffinityScheduler(MODELS, endpoints)
+        jobs = scheduler.plan([f"text {i}" for i in range(10)], model="jvnv-M2-jp")
+
+        queues = scheduler.group_by_endpoint(jobs)
+        assert set(queues) == set(endpoints)
+        assert [len(queue) for queue in queues.values()] == [5, 5]
+
+    def test_plan_orders_by_given_lengths(self):
+        """
+        Test that the given lengths are used instead of the number of characters.
+        """
+        scheduler = ModelAffinityScheduler(MODELS, ["http://127.0.0.1:5000"])
+        jobs = scheduler.plan(["a", "bb", "ccc"], model="jvnv-M2-jp", lengths=[3.0, 1.0, 2.0])
+        assert [job.index for job in jobs] == [0, 2, 1]
+
+    def test_plan_fan_out_covers_every_text_and_model(self):
+        """
+        Test that the fan-out plan has one job per text and voice, grouped by voice.
+        """
+        endpoints = ["http://server-a:5000", "http://server-b:5000"]
+        scheduler = ModelAffinityScheduler(MODELS, endpoints, seed=0)
+        texts = ["short", "a much longer text", "medium text"]
+        jobs = scheduler.plan_fan_out(texts)
+
+        assert sorted((job.index, job.model) for job in jobs) == sorted(
+            (index, model) for index in range(len(texts)) for model in MODELS
+        )
+        models_in_order = [job.model for job in jobs]
+        assert models_in_order == [model for model in MODELS for _ in texts]
+        assert [job.index for job in jobs[:len(texts)]] == [1, 2, 0]
+
+        pinned = scheduler.pin_endpoints()
+        assert all(job.endpoint in pinned[job.model] for job in jobs)
+
+    def test_plan_fan_out_with_selected_models(self):
+        """
+        Test that the fan-out plan only uses the given voices.
+        """
+        scheduler = ModelAffinityScheduler(MODELS, ["http://127.0.0.1:5000"])
+        jobs = scheduler.plan_fan_out(["a", "b"], models=["jvnv-F1-jp"])
+        assert [(job.index, job.model) for job in jobs] == [(0, "jvnv-F1-jp"), (1, "jvnv-F1-jp")]
+
+    def test_plan_fan_out_with_selected_models_uses_every_endpoint(self):
+        """
+        Test that the selected voices share every server.
+        """
+        endpoints = ["http://server-a:5000", "http://server-b:5000"]
+        scheduler = ModelAffinityScheduler(MODELS, endpoints)
+        jobs = scheduler.plan_fan_out(["a", "b", "c", "d"], models=["jvnv-F1-jp"])
+        assert {job.endpoint for job in jobs} == set(endpoints)
+
+    def test_requires_models(self):
+        """
+        Test that a ValueError is raised without models.
+        """
+        with pytest.raises(ValueError):
+            ModelAffinityScheduler([], ["http://127.0.0.1:5000"])
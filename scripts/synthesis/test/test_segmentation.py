@@ -0,0 +1,62 @@
+import sys
+
+sys.path.insert(0, './')
+
+from scripts.synthesis.segmentation import normalize_text, plan_segments
+from scripts.synthesis.scheduler import ModelAffinityScheduler
+
+
+def _replace_chain(text: str) -> str:
+    """The normalization previously done in VoiceSynthesizer._get_params."""
+    return text.replace(" ", "").replace("、", "、\n").replace("。", "。\n").replace(",", ",\n").replace(".", ".\n").replace(" ", " \n")
+
+
+class TestSegmentation:
+    """
+    Test cases for the segmentation planner.
+    """
+
+    def test_normalize_matches_replace_chain(self):
+        """
+        Test that the single-pass normalization gives the same result as the replace chain.
+        """
+        text = "こんにちは、世界。 Hello, world. これは テスト です。"
+        assert normalize_text(text) == _replace_chain(text)
+
+    def test_short_text_is_not_split(self):
+        """
+        Test that a text within max_length is returned as a single segment.
+        """
+        assert plan_segments("短いテキストです。", max_length=100) == ["短いテキストです。"]
+
+    def test_segments_are_balanced(self):
+        """
+        Test that segments stay within max_length, keep the text, and leave no tiny tail.
+        """
+        text = "これは非常に長いテキストです。" * 8  # 120 characters
+        segments = plan_segments(text, max_length=100)
+
+        assert "".join(segments) == text
+        assert len(segments) == 2
+        assert all(len(segment) <= 100 for segment in segments)
+        assert min(len(segment) for segment in segments) >= 45
+
+    def test_forced_split_without_delimiters(self):
+        """
+        Test that a text without delimiters is forcibly split at max_length.
+        """
+        text = "あ" * 250
+        segments = plan_segments(text, max_length=100)
+
+        assert "".join(segments) == text
+        assert all(len(segment) <= 100 for segment in segments)
+        assert len(segments) == 3
+
+    def test_longest_first_order(self):
+        """
+        Test that the longest texts of a model group are dispatched first.
+        """
+        scheduler = ModelAffinityScheduler(["jvnv-M2-jp"], ["http://127.0.0.1:5000"])
+        texts = ["あ", "あああ", "ああ"]
+        jobs = scheduler.plan(texts, model="jvnv-M2-jp")
+        assert [job.index for job in jobs] == [1, 2, 0]
@@ -0,0 +1,179 @@
+"""
+フィラー付き口語変換で、すべての例文を含むシステムプロンプトと、入力に近い例文だけを選んだシステムプロンプトを比較するスクリプト。
+
+- 入力トークン数（APIを呼ばずに数える）
+- --live を指定した場合、最初のトークンまでの時間（TTFT）と全体の時間
+- --live を指定した場合、品質の目安（全例文の出力との文字n-gramの一致度、入力に対する出力の長さ、フィラーの数）
+
+使用例:
+    python -m scripts.translation.compare_few_shot --input questions.json --limit 50
+    OPENAI_API_KEY=... python -m scripts.translation.compare_few_shot --input questions.json --limit 20 --live
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import List, Optional
+
+from .few_shot import FewShotSelector, char_ngrams
+from .prompts import FILLERS, get_translate_text2spoken_filler_system_prompt, translate_text2spoken_prompt
+from .token_budget import TokenCounter
+
+SAMPLE_TEXTS = [
+    "こんにちは",
+    "毎朝の通勤電車が混んでいて疲れます。何か良い過ごし方はありますか？",
+    "お風呂に入るとリラックスできます。",
+    "紅白歌合戦について教えてください。",
+    "The quick brown fox jumps over the lazy dog.",
+]
+
+
+def ngram_f1(reference: str, hypothesis: str) -> float:
+    """
+    2つのテキストの文字n-gram（2〜3文字）の一致度をF値で返す。
+
+    Args:
+        reference (str): 基準のテキスト
+        hypothesis (str): 比較するテキスト
+
+    Returns:
+        float: 0〜1のF値
+    """
+    ref, hyp = char_ngrams(reference), char_ngrams(hypothesis)
+    overlap = sum((ref & hyp).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(hyp.values())
+    recall = overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def count_fillers(text: str) -> int:
+    """テキストに含まれるフィラーの数を返す。"""
+    return sum(text.count(filler) for filler in FILLERS)
+
+
+def load_texts(input_path: Optional[str], limit: int) -> List[str]:
+    """JSON配列のファイルからテキストを読み込む。指定がなければサンプルを返す。"""
+    if input_path is None:
+        return SAMPLE_TEXTS[:limit]
+    with open(input_path, "r", encoding="utf-8") as f:
+        return [text for text in json.load(f) if text][:limit]
+
+
+def compare_prompt_tokens(texts: List[str], selector: FewShotSelector, counter: TokenCounter) -> dict:
+    """
+    入力ごとのシステムプロンプトのトークン数を比較する。
+
+    Args:
+        texts (List[str]): 入力テキスト
+        selector (FewShotSelector): 例文を選ぶクラス
+        counter (TokenCounter): トークン数を数えるクラス
+
+    Returns:
+        dict: 全例文と選んだ例文のトークン数の統計
+    """
+    full = counter.count_messages([get_translate_text2spoken_filler_system_prompt(), translate_text2spoken_prompt])
+    retrieved = [
+        counter.count_messages([selector.build_system_prompt(text), translate_text2spoken_prompt]) for text in texts
+    ]
+    return {
+        "exact_tokenizer": counter.exact,
+        "full_prompt_tokens": full,
+        "retrieved_prompt_tokens_mean": statistics.mean(retrieved),
+        "retrieved_prompt_tokens_max": max(retrieved),
+        "reduction": 1 - statistics.mean(retrieved) / full,
+    }
+
+
+async def _stream(llm, messages) -> dict:
+    start = time.perf_counter()
+    first_token = None
+    chunks = []
+    async for chunk in llm.astream(messages):
+        if first_token is None and chunk.content:
+            first_token = time.perf_counter() - start
+        chunks.append(chunk.content)
+    return {"text": "".join(chunks), "ttft": first_token, "latency": time.perf_counter() - start}
+
+
+async def compare_live(texts: List[str], api_key: str, model: str) -> dict:
+    """
+    両方のプロンプトで同じ入力を変換し、TTFT・時間・品質の目安を比較する。
+
+    フィラーの候補はランダムに選ばれるため、同じ入力では両方のプロンプトに同じ候補を使う。
+
+    Args:
+        texts (List[str]): 入力テキスト
+        api_key (str): OpenAI APIキー
+        model (str): 使用する言語モデル
+
+    Returns:
+        dict: 各指標の平均と入力ごとの結果
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_openai import ChatOpenAI
+
+    from .prompts import build_translate_text2spoken_filler_system_prompt, sample_fillers
+    from .prompts import TEXT2SPOKEN_CAUTION_EXAMPLES, TEXT2SPOKEN_FILLER_EXAMPLES
+
+    llm = ChatOpenAI(api_key=api_key, model=model, temperature=0)
+    prompt = ChatPromptTemplate.from_messages([("system", "{system_prompt}"), ("user", translate_text2spoken_prompt)])
+    selector = FewShotSelector()
+
+    rows = []
+    for text in texts:
+        fillers = sample_fillers()
+        full_system = build_translate_text2spoken_filler_system_prompt(
+            TEXT2SPOKEN_FILLER_EXAMPLES, TEXT2SPOKEN_CAUTION_EXAMPLES, fillers
+        )
+        retrieved_system = selector.build_system_prompt(text, fillers)
+        full = await _stream(llm, prompt.format_messages(system_prompt=full_system, written_text=text))
+        retrieved = await _stream(llm, prompt.format_messages(system_prompt=retrieved_system, written_text=text))
+        rows.append({
+            "input": text,
+            "full": full,
+            "retrieved": retrieved,
+            "agreement": ngram_f1(full["text"], retrieved["text"]),
+        })
+
+    def mean(values):
+        values = [value for value in values if value is not None]
+        return statistics.mean(values) if values else None
+
+    summary = {"agreement_mean": mean(row["agreement"] for row in rows)}
+    for name in ("full", "retrieved"):
+        summary[name] = {
+            "ttft_mean": mean(row[name]["ttft"] for row in rows),
+            "latency_mean": mean(row[name]["latency"] for row in rows),
+            "length_ratio_mean": mean(len(row[name]["text"]) / len(row["input"]) for row in rows),
+            "fillers_mean": mean(count_fillers(row[name]["text"]) for row in rows),
+        }
+    return {"summary": summary, "rows": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and retrieved few-shot prompts for text2spoken with fillers")
+    parser.add_argument("--input", help="JSON array of input texts (default: built-in samples)")
+    parser.add_argument("--limit", type=int, default=20, help="Number of texts to compare")
+    parser.add_argument("--model", default="gpt-4o-mini", help="OpenAI model")
+    parser.add_argument("--live", action="store_true", help="Call the API and compare TTFT, latency and outputs")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    texts = load_texts(args.input, args.limit)
+    counter = TokenCounter(args.model)
+    report = {"prompt_tokens": compare_prompt_tokens(texts, FewShotSelector(token_counter=counter), counter)}
+    if args.live:
+        report["live"] = asyncio.run(compare_live(texts, os.environ["OPENAI_API_KEY"], args.model))
+
+    print(json.dumps({key: value.get("summary", value) for key, value in report.items()}, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+入力に近い例文だけを選んでシステムプロンプトに入れるモジュール。
+
+フィラー付きの口語変換のシステムプロンプトは、すべての例文（SAMPLES）を毎回埋め込むため、
+3語の質問でも数千トークンになる。ここでは例文を文字n-gramのTF-IDFで索引し、
+入力に近いものをトークン数の上限まで選ぶ。
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .prompts import (
+    TEXT2SPOKEN_CAUTION_EXAMPLES,
+    TEXT2SPOKEN_FILLER_EXAMPLES,
+    build_translate_text2spoken_filler_system_prompt,
+    format_caution_samples,
+    format_filler_samples,
+)
+from .token_budget import TokenCounter
+
+# 質問や依頼で終わる入力（回答してしまう誤りの例を含める）
+_REQUEST_PATTERN = re.compile(r"(ください|なさい|下さい|教えて|答えて|して|ますか|ですか|か|[?？])[。.!！\s]*$")
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (2, 3)) -> Counter:
+    """
+    テキストの文字n-gramを数える。NFKCで正規化し、空白は取り除く。
+
+    Args:
+        text (str): テキスト
+        ngram_range (Tuple[int, int], optional): n-gramの長さの範囲。デフォルトは (2, 3)
+
+    Returns:
+        Counter: n-gramごとの出現回数
+    """
+    text = re.sub(r"\s+", "", unicodedata.normalize("NFKC", text or "").lower())
+    counts = Counter()
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        counts.update(text[i:i + n] for i in range(len(text) - n + 1))
+    return counts
+
+
+class CharNgramTfidfIndex:
+    """
+    文字n-gramのTF-IDFとコサイン類似度で文書を検索する軽量な索引。
+
+    日本語は単語の区切りがないため、形態素解析の代わりに文字n-gramを使う。
+    """
+
+    def __init__(self, documents: Sequence[str], ngram_range: Tuple[int, int] = (2, 3)):
+        """
+        Args:
+            documents (Sequence[str]): 索引する文書
+            ngram_range (Tuple[int, int], optional): n-gramの長さの範囲。デフォルトは (2, 3)
+        """
+        self.ngram_range = ngram_range
+        counts = [char_ngrams(document, ngram_range) for document in documents]
+        document_frequency = Counter(ngram for count in counts for ngram in count)
+        n_documents = len(documents)
+        # scikit-learnのsmooth_idfと同じ重み
+        self.idf = {
+            ngram: math.log((1 + n_documents) / (1 + frequency)) + 1 for ngram, frequency in document_frequency.items()
+        }
+        self._default_idf = math.log(1 + n_documents) + 1
+        self.vectors = [self._vectorize(count) for count in counts]
+
+    def _vectorize(self, counts: Counter) -> Dict[str, float]:
+        vector = {ngram: count * self.idf.get(ngram, self._default_idf) for ngram, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {ngram: value / norm for ngram, value in vector.items()} if norm else {}
+
+    def search(self, query: str, k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        クエリに近い文書を探す。
+
+        Args:
+            query (str): クエリ
+            k (int, optional): 返す件数。デフォルトはすべて
+
+        Returns:
+            List[Tuple[int, float]]: (文書の番号, コサイン類似度) を類似度の高い順に並べたリスト
+        """
+        query_vector = self._vectorize(char_ngrams(query, self.ngram_range))
+        scores = [
+            (index, sum(weight * vector.get(ngram, 0.0) for ngram, weight in query_vector.items()))
+            for index, vector in enumerate(self.vectors)
+        ]
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores[:k] if k is not None else scores
+
+
+def is_request(text: str) -> bool:
+    """入力が質問や依頼の文で終わっているかを簡易的に判定する。"""
+    return bool(_REQUEST_PATTERN.search((text or "").strip()))
+
+
+class FewShotSelector:
+    """
+    入力に近い例文を、トークン数の上限の範囲で選ぶクラス。
+
+    質問や依頼の入力には、回答してしまう誤りの例（caution_examples）を優先して1件含める。
+    """
+
+    def __init__(
+        self,
+        examples: Sequence[dict] = TEXT2SPOKEN_FILLER_EXAMPLES,
+        caution_examples: Sequence[dict] = TEXT2SPOKEN_CAUTION_EXAMPLES,
+        token_counter: Optional[TokenCounter] = None,
+        max_examples: int = 2,
+        token_cap: int = 600,
+        min_score: float = 0.05,
+    ):
+        """
+        Args:
+            examples (Sequence[dict]): 変換の例（"from", "to"）
+            caution_examples (Sequence[dict]): 誤りの例（"from", "wrong", "to"）
+            token_counter (TokenCounter, optional): トークン数を数えるクラス。デフォルトは "gpt-4o-mini" 用
+            max_examples (int, optional): 選ぶ変換の例の最大数。デフォルトは2
+            token_cap (int, optional): 選んだ例文のトークン数の上限。デフォルトは600
+            min_score (float, optional): 変換の例を選ぶ類似度の下限。下回る例しかない場合は、形式を示すために
+                最もトークン数の少ない例を1件だけ含める。デフォルトは0.05
+        """
+        self.examples = list(examples)
+        self.caution_examples = list(caution_examples)
+        self.token_counter = token_counter or TokenCounter()
+        self.max_examples = max_examples
+        self.token_cap = token_cap
+        self.min_score = min_score
+        self.index = CharNgramTfidfIndex([example["from"] for example in self.examples])
+        self.caution_index = CharNgramTfidfIndex([example["from"] for example in self.caution_examples])
+        # 例文ごとのトークン数（プロンプトに入れたときの形式で数える）
+        self.example_tokens = [self.token_counter.count(format_filler_samples([example])) for example in self.examples]
+        self.caution_tokens = [
+            self.token_counter.count(format_caution_samples([example])) for example in self.caution_examples
+        ]
+
+    def select(self, text: str) -> Tuple[List[dict], List[dict]]:
+        """
+        入力に近い例文を選ぶ。
+
+        Args:
+            text (str): 変換する入力テキスト
+
+        Returns:
+            Tuple[List[dict], List[dict]]: 選んだ変換の例と誤りの例
+        """
+        budget = self.token_cap
+        cautions = []
+        if self.caution_examples and is_request(text):
+            (index, _), = self.caution_index.search(text, 1)
+            if self.caution_tokens[index] <= budget:
+                cautions.append(self.caution_examples[index])
+                budget -= self.caution_tokens[index]
+
+        examples = []
+        for index, score in self.index.search(text):
+            if len(examples) >= self.max_examples or score < self.min_score:
+                break
+            if self.example_tokens[index] <= budget:
+                examples.append(self.examples[index])
+                budget -= self.example_tokens[index]
+
+        if not examples and self.examples:
+            index = min(range(len(self.examples)), key=lambda i: self.example_tokens[i])
+            if self.example_tokens[index] <= budget:
+                examples.append(self.examples[index])
+        return examples, cautions
+
+    def build_system_prompt(self, text: str, fillers: Optional[list] = None) -> str:
+        """
+        入力に合わせて選んだ例文だけを含むシステムプロンプトを作る。
+
+        Args:
+            text (str): 変換する入力テキスト
+            fillers (list, optional): 使用できるフィラー。デフォルトはランダムに選ぶ
+
+        Returns:
+            str: システムプロンプト
+        """
+        examples, cautions = self.select(text)
+        return build_translate_text2spoken_filler_system_prompt(examples, cautions, fillers)
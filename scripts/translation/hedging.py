@@ -0,0 +1,162 @@
+"""
+LLMのリクエストのテイルレイテンシを抑えるためのヘッジ（重複リクエスト）を行うモジュール。
+
+バッチ内は並列に実行されるため、ごく一部の遅いリクエストがバッチ全体の時間を決めてしまう。
+ここでは、リクエストのレイテンシの分布を直近のサンプルから学習し、指定したパーセンタイルの時間を過ぎても
+終わらないリクエストに対して同じリクエストをもう1つ送り、先に終わった方の結果を使う（もう一方はキャンセルする）。
+追加のリクエストの数はヘッジの予算（リクエスト数に対する割合）で制限する。
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class HedgePolicy:
+    """
+    レイテンシのパーセンタイルを学習し、リクエストをヘッジするクラス。
+
+    使用例:
+        policy = HedgePolicy(percentile=0.95, budget=0.05)
+        result = await policy.run(lambda: chain.ainvoke(inputs))
+        print(policy.stats())
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget: float = 0.05,
+        window: int = 200,
+        min_samples: int = 20,
+        min_delay: float = 0.0,
+    ):
+        """
+        Args:
+            percentile (float, optional): このパーセンタイルのレイテンシを過ぎたらヘッジする。デフォルトは0.95
+            budget (float, optional): ヘッジできるリクエストの割合の上限。デフォルトは0.05
+            window (int, optional): パーセンタイルの計算に使う直近のサンプル数。デフォルトは200
+            min_samples (int, optional): この数のサンプルが集まるまではヘッジしない。デフォルトは20
+            min_delay (float, optional): ヘッジするまでの最短の時間（秒）。デフォルトは0
+        """
+        if not 0 < percentile < 1:
+            raise ValueError("percentileは0より大きく1より小さい値を指定してください。")
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies = deque(maxlen=window)
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.cancelled = 0
+        self.failures = 0
+        self.saved_seconds = 0.0
+
+    def observe(self, latency: float):
+        """
+        成功したリクエストのレイテンシを記録する。
+
+        Args:
+            latency (float): レイテンシ（秒）
+        """
+        self._latencies.append(latency)
+
+    def threshold(self) -> Optional[float]:
+        """
+        ヘッジするまでの時間を返す。
+
+        Returns:
+            Optional[float]: 直近のレイテンシのパーセンタイル（秒）。サンプルが足りない場合はNone
+        """
+        if len(self._latencies) < self.min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        value = latencies[min(int(self.percentile * len(latencies)), len(latencies) - 1)]
+        return max(value, self.min_delay)
+
+    def _can_hedge(self) -> bool:
+        return self.hedged < self.budget * self.requests
+
+    def _expected_latency(self, elapsed: float) -> Optional[float]:
+        """elapsed秒を過ぎても終わっていないリクエストのレイテンシの期待値を、直近のサンプルから求める。"""
+        slower = [latency for latency in self._latencies if latency > elapsed]
+        return sum(slower) / len(slower) if slower else None
+
+    async def _timed(self, call: Callable[[], Awaitable[T]]) -> T:
+        start = time.perf_counter()
+        result = await call()
+        self.observe(time.perf_counter() - start)
+        return result
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        リクエストを実行し、閾値を過ぎても終わらなければ同じリクエストをもう1つ送る。
+
+        先に成功した方の結果を返し、もう一方はキャンセルする。一方が失敗した場合はもう一方の結果を待つ。
+        両方が失敗した場合は最初のリクエストの例外を送出する。
+
+        Args:
+            call (Callable[[], Awaitable[T]]): リクエストを作る関数（呼ぶたびに新しいリクエストを返すこと）
+
+        Returns:
+            T: 先に成功したリクエストの結果
+        """
+        self.requests += 1
+        threshold = self.threshold()
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(self._timed(call))
+        tasks = {primary}
+        try:
+            if threshold is not None:
+                done, _ = await asyncio.wait(tasks, timeout=threshold)
+                if not done and self._can_hedge():
+                    self.hedged += 1
+                    hedge = asyncio.ensure_future(self._timed(call))
+                    tasks.add(hedge)
+                    pending = set(tasks)
+                    while pending:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        winner = next((task for task in done if task.exception() is None), None)
+                        if winner is None:
+                            continue
+                        if winner is hedge:
+                            self.hedge_wins += 1
+                            elapsed = time.perf_counter() - start
+                            expected = self._expected_latency(elapsed)
+                            if expected is not None:
+                                self.saved_seconds += expected - elapsed
+                        return winner.result()
+                    self.failures += 1
+                    return primary.result()
+            try:
+                return await primary
+            except Exception:
+                self.failures += 1
+                raise
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    self.cancelled += 1
+
+    def stats(self) -> dict:
+        """
+        ヘッジの結果を返す。
+
+        Returns:
+            dict: リクエスト数、ヘッジした数と割合、ヘッジが先に終わった数、キャンセルした数、
+                短縮できたと見積もった時間（秒）、現在の閾値（秒）
+        """
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "cancelled": self.cancelled,
+            "failures": self.failures,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "threshold": self.threshold(),
+        }
@@ -1,7 +1,7 @@
-
 # 一括でインポートできるようにするため、以下のように変更します
 from .translate_en2ja_prompt import *
 from .translate_text2spoken_prompt import *
+from .text2spoken_examples import *
 
 # __all__リストを更新して、すべてのインポートされた変数を含めます
 __all__ = [
@@ -9,5 +9,12 @@ __all__ = [
     "translate_en2ja_system_prompt",
     "translate_text2spoken_prompt",
     "translate_text2spoken_system_prompt",
-    "translate_text2spoken_filler_system_prompt"
-]
\ No newline at end of file
+    "get_translate_text2spoken_filler_system_prompt",
+    "build_translate_text2spoken_filler_system_prompt",
+    "format_caution_samples",
+    "format_filler_samples",
+    "sample_fillers",
+    "FILLERS",
+    "TEXT2SPOKEN_FILLER_EXAMPLES",
+    "TEXT2SPOKEN_CAUTION_EXAMPLES",
+]
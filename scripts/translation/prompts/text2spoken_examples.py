@@ -0,0 +1,45 @@
+"""
+フィラー付きの口語変換で使う例文のライブラリ。
+
+get_translate_text2spoken_filler_system_prompt は、すべての例文をシステムプロンプトに埋め込む。
+こちらは例文を1件ずつのデータとして持ち、入力に近いものだけを選んでプロンプトに入れるために使う
+（scripts/translation/few_shot.py）。
+"""
+
+# 書き言葉から、フィラーを含む話し言葉への変換の例
+TEXT2SPOKEN_FILLER_EXAMPLES = [
+    {
+        "from": "ここ数年前から、マクドナルドや丸亀製麺などの企業が「シニア世代」の採用を積極的に行っている理由はなんですか。 （ここでは、少子高齢化や人生100年時代、高年齢者雇用安定法の改正などは問題とせず、自主的に積極的に取り組んでいる企業について述べることとする）（2023年現在）",
+        "to": "あのー、なぜマクドナルドなどの企業は積極的にシニア世代の採用を行っているのでしょうか？えぇー、ちなみに、ここでは法改正の影響というよりは、そのー、自主的な企業の方針に焦点を当てて答えてください。",
+    },
+    {
+        "from": "お風呂の下の方だけ冷たくなるのは、水の重さが熱によって変わるからです。 水は熱によって膨張し、比重が軽くなった水が上部に集まります。反対に、冷たく重い水が下にたまります。そのため、上の方が熱く、下の方が冷たくなります。",
+        "to": "まぁー、お湯は温かいほど膨張して密度が下がるので上に行き、えぇー、冷たい水は反対に密度が下がり下に沈むから、うん。お風呂は上が熱くて下が冷たいんだよ。",
+    },
+    {
+        "from": "朝の山手線の通勤ラッシュを改善するにはどうしたらいいか100字以内で答えて",
+        "to": "山手線の朝の通勤ラッシュはどうすれば改善できるのかを、えぇー、百字以内で教えて",
+    },
+    {
+        "from": "2022年までの紅白歌合戦歴代出場回数のトップ１０は以下のようになります。 １）北島三郎ー51回 ２）五木ひろしー50回 ３）森進一ー48回 ４）石川さゆりー39回 ５）細川たかしー40回 ６）和田アキ子ー39回 ７）島倉千代子ー35回、郷ひろみー35回 ９）小林幸子ー34回、坂本冬美ー34回",
+        "to": "うーん、2022年までの紅白歌合戦の歴代出場回数トップ10は、えぇー、最多出場は北島三郎の51回、で、次いで五木ひろしの50回、森進一の48回が続きます。また、石川さゆりが39回、細川たかしが40回、あとは、和田アキ子が39回と続き、島倉千代子と郷ひろみは各35回の出場です。んー、そして、小林幸子と坂本冬美が34回ずつの出場を果たしています。",
+    },
+    {
+        "from": "「医療観察制度」について、以下の文章を参考に要点をまとめなさい。 「医療観察制度」は、心身喪失または心神耗弱の状態で、殺人・放火などの重大な他害行為を行なった人の社会復帰を促進するための制度である。「心神喪失等の状態で重大な他害行為を行なったものの医療及び観察等に関する法律」（以下、医療観察法）に基づき、適切な処遇を決定するための審判手続が設けられ、指定入院医療期間による手厚い専門的医療の提供や、地域における医療確保や生活環境の調整などの支援が行われる。審判により対象者が通院又は退院許可決定を受けると、地域社会における処遇の段階に入る。対象者の円滑な社会復帰を促進するためには、地域社会における「医療」「精神保健観察」「援助」が統一的な方針のもとで、適正に実施されることが非常に重要であり、それぞれを担う機関が互いの役割や組織の現状を理解し合いながら、医療観察法の理念を共有し連携協力して取り組むことが求められる",
+        "to": "医療観察制度について、この後話す内容を参考にして要約してください。医療観察制度っていうのは、あぁ、心の問題で殺人や放火など重大なことをしちゃった人が、社会に戻るのを助ける制度だよ。専門の病院で治療を受けたり、地域で医療や生活のサポートを受けるんだ。スムーズに社会復帰するために、医療や支援が一つの方針で行われて、関係する機関が協力することが大事なんだ。",
+    },
+]
+
+# 質問を翻訳せずに回答してしまう誤りの例（質問や依頼の入力に対して選ばれる）
+TEXT2SPOKEN_CAUTION_EXAMPLES = [
+    {
+        "from": "スペースデブリが今後、地上にいる私たちにどのような影響を与えるかについて論じなさい。",
+        "wrong": "スペースデブリは1億以上あり、人工衛星への衝突で通信やGPSに障害を起こしたりすることで、地上への落下で人々に危険を及ぼす可能性があります。また、星の観測も妨げています。",
+        "to": "スペースデブリが今後、地上にいる私たちにどのような影響を与えるかについて話してください。",
+    },
+    {
+        "from": "老舗百貨店の店員として、以下のお客様からの要望を満たす品物を選び、５００文字以内で簡潔に文章にまとめてください。 海外からのお客様にお渡しするお土産として、軽くてかさばらず、持ち帰る際に壊れにくい、日本の伝統的な品物を選んでください。当方は４０代女性で、お渡し先は６０代の欧米人のご夫婦です。",
+        "wrong": "老舗百貨店の店員として、海外からのお客様に渡すお土産を選ぶんですね。軽くてかさばらず、壊れにくい日本の伝統的な品物が求められています。例えば、和風の手ぬぐいや、陶器の小物入れ、または、伝統的な和菓子の詰め合わせなんかがいいかもしれませんね。...",
+        "to": "老舗百貨店の店員として、お客様からの要望を満たす品物を選び、５００語以内で簡潔にまとめてください。 海外からのお客様にお渡しするお土産として、軽くてかさばらず、持ち帰る際に壊れにくい、日本の伝統的な品物を選んでください。当方は４０代女性で、お渡し先は６０代の欧米人のご夫婦です。",
+    },
+]
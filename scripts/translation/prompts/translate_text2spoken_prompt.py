@@ -1,5 +1,7 @@
 import random
 
+from .text2spoken_examples import TEXT2SPOKEN_CAUTION_EXAMPLES, TEXT2SPOKEN_FILLER_EXAMPLES
+
 translate_text2spoken_prompt = """
 ### Written Text
 {written_text}
@@ -7,19 +9,19 @@ translate_text2spoken_prompt = """
 ### Spoken Text
 """
 
-def get_translate_text2spoken_filler_system_prompt() -> str:
-    FILLERS = [
-        "あのー",
-        "えぇー",
-        "そのー",
-        "まぁー",
-        "うん。",
-        "んー",
-        "はい",
-        "あぁ"
-    ]
-    fillers = random.sample(FILLERS, random.randint(1, max(len(FILLERS), len(FILLERS)//3)))
-    return f"""
+FILLERS = [
+    "あのー",
+    "えぇー",
+    "そのー",
+    "まぁー",
+    "うん。",
+    "んー",
+    "はい",
+    "あぁ"
+]
+
+# フィラー付きの口語変換の指示（KEY POINTSとCOUTION）
+TEXT2SPOKEN_FILLER_INSTRUCTIONS = """
     あなたは日本語の舞台作家です。以下の<WRITTEN TEXT>の文章を口頭で話すのに適したセリフに翻訳してください。別の言葉でいうとあなたの仕事は端的に言い換えること！です。
     また実際の自然な人間の発話に似せるために、適宜フィーラーを挿入してください。使用できるフィラーの種類は以下の<Filler>を参照してください。(あまり多用しすぎず、過剰になりすぎない程度で）
     また、その時は以下の<KEY POINTS>に従うとより良いものになるはずです。<COUTION>にはくれぐれも注意してください。
@@ -43,67 +45,77 @@ def get_translate_text2spoken_filler_system_prompt() -> str:
     - あなたの仕事は、書き言葉の文章を同じ内容で端的な話し言葉に翻訳することです。しばしば、書き言葉の質問を翻訳するときに、翻訳ではなく回答を作成してしまう重大な誤りが多発しているので、きわめて注意して「書き言葉」から「話し言葉」への翻訳に注力してください。言い換えれば、新しいアドリブの内容が増えることは絶対に絶対にあり得ません。
     より具体的には「以下の条件でXXXしてください, (条件詳細の長文)...」というような質問を翻訳するときに、いつもの癖でついつい直接回答してしまい「では条件に沿って、XXXしてみます。...」としてしまうイメージです。きわめて破壊的で絶望的です。あるべき出力は「この後に述べるの条件でXXXしてください, (条件詳細の要約)...」というようなものです。実例を以下の<COUTION/SAMPLE>に示すので、これらも参考にしてください。
     以下の例では、質問の翻訳のはずが、回答を作成してしまう破壊的な例を示しています。絶対に良い例の形式に従いましょう。
-        ### SAMPLES 
-            ### BAD1
+"""
+
+def format_caution_samples(examples: list) -> str:
+    """質問に回答してしまう誤りの例を、システムプロンプトの<COUTION/SAMPLE>の形式にする。"""
+    if not examples:
+        return ""
+    blocks = [
+        f"""            ### BAD{i}
                 ### WRITTEN QUESTION
-                スペースデブリが今後、地上にいる私たちにどのような影響を与えるかについて論じなさい。
+                {example["from"]}
 
                 ### WRONG SPOKEN TRANSLATION (WORST)
-                スペースデブリは1億以上あり、人工衛星への衝突で通信やGPSに障害を起こしたりすることで、地上への落下で人々に危険を及ぼす可能性があります。また、星の観測も妨げています。
+                {example["wrong"]}
 
                 ### CORRECT SPOKEN TRANSLATION (GOOD)
-                スペースデブリが今後、地上にいる私たちにどのような影響を与えるかについて話してください。
-        
-            ### BAD2
-                ### WRITTEN QUESTION
-                老舗百貨店の店員として、以下のお客様からの要望を満たす品物を選び、５００文字以内で簡潔に文章にまとめてください。 海外からのお客様にお渡しするお土産として、軽くてかさばらず、持ち帰る際に壊れにくい、日本の伝統的な品物を選んでください。当方は４０代女性で、お渡し先は６０代の欧米人のご夫婦です。
+                {example["to"]}
+"""
+        for i, example in enumerate(examples, 1)
+    ]
+    return "        ### SAMPLES\n" + "\n".join(blocks) + "\n"
 
-                ### WRONG SPOKEN TRANSLATION (WORST)
-                老舗百貨店の店員として、海外からのお客様に渡すお土産を選ぶんですね。軽くてかさばらず、壊れにくい日本の伝統的な品物が求められています。例えば、和風の手ぬぐいや、陶器の小物入れ、または、伝統的な和菓子の詰め合わせなんかがいいかもしれませんね。...
-                
-                ### CORRECT SPOKEN TRANSLATION (GOOD)
-                老舗百貨店の店員として、お客様からの要望を満たす品物を選び、５００語以内で簡潔にまとめてください。 海外からのお客様にお渡しするお土産として、軽くてかさばらず、持ち帰る際に壊れにくい、日本の伝統的な品物を選んでください。当方は４０代女性で、お渡し先は６０代の欧米人のご夫婦です。
-            
-    ### FILLER
-    {fillers}
 
-    ### SAMPLES
-        ### 1
+def format_filler_samples(examples: list) -> str:
+    """変換の例を、システムプロンプトの<SAMPLES>の形式にする。"""
+    if not examples:
+        return ""
+    blocks = [
+        f"""        ### {i}
             ### FROM
-            ここ数年前から、マクドナルドや丸亀製麺などの企業が「シニア世代」の採用を積極的に行っている理由はなんですか。 （ここでは、少子高齢化や人生100年時代、高年齢者雇用安定法の改正などは問題とせず、自主的に積極的に取り組んでいる企業について述べることとする）（2023年現在）
-            
-            ### TO
-            あのー、なぜマクドナルドなどの企業は積極的にシニア世代の採用を行っているのでしょうか？えぇー、ちなみに、ここでは法改正の影響というよりは、そのー、自主的な企業の方針に焦点を当てて答えてください。
-
-        ### 2
-            ### FROM
-            お風呂の下の方だけ冷たくなるのは、水の重さが熱によって変わるからです。 水は熱によって膨張し、比重が軽くなった水が上部に集まります。反対に、冷たく重い水が下にたまります。そのため、上の方が熱く、下の方が冷たくなります。
+            {example["from"]}
 
             ### TO
-            まぁー、お湯は温かいほど膨張して密度が下がるので上に行き、えぇー、冷たい水は反対に密度が下がり下に沈むから、うん。お風呂は上が熱くて下が冷たいんだよ。
-
-        ### 3
-            ### FROM
-            朝の山手線の通勤ラッシュを改善するにはどうしたらいいか100字以内で答えて
+            {example["to"]}
+"""
+        for i, example in enumerate(examples, 1)
+    ]
+    return "    ### SAMPLES\n" + "\n".join(blocks) + "\n"
 
-            ### TO
-            山手線の朝の通勤ラッシュはどうすれば改善できるのかを、えぇー、百字以内で教えて
 
-        ### 4
-            ### FROM
-            2022年までの紅白歌合戦歴代出場回数のトップ１０は以下のようになります。 １）北島三郎ー51回 ２）五木ひろしー50回 ３）森進一ー48回 ４）石川さゆりー39回 ５）細川たかしー40回 ６）和田アキ子ー39回 ７）島倉千代子ー35回、郷ひろみー35回 ９）小林幸子ー34回、坂本冬美ー34回
+def sample_fillers(rng: random.Random = None) -> list:
+    """プロンプトに含めるフィラーをランダムに選ぶ。rngを指定した場合はその乱数で選ぶ。"""
+    rng = rng or random
+    return rng.sample(FILLERS, rng.randint(1, max(len(FILLERS), len(FILLERS)//3)))
 
-            ### TO
-            うーん、2022年までの紅白歌合戦の歴代出場回数トップ10は、えぇー、最多出場は北島三郎の51回、で、次いで五木ひろしの50回、森進一の48回が続きます。また、石川さゆりが39回、細川たかしが40回、あとは、和田アキ子が39回と続き、島倉千代子と郷ひろみは各35回の出場です。んー、そして、小林幸子と坂本冬美が34回ずつの出場を果たしています。
 
-        ### 5
-            ### FROM
-            「医療観察制度」について、以下の文章を参考に要点をまとめなさい。 「医療観察制度」は、心身喪失または心神耗弱の状態で、殺人・放火などの重大な他害行為を行なった人の社会復帰を促進するための制度である。「心神喪失等の状態で重大な他害行為を行なったものの医療及び観察等に関する法律」（以下、医療観察法）に基づき、適切な処遇を決定するための審判手続が設けられ、指定入院医療期間による手厚い専門的医療の提供や、地域における医療確保や生活環境の調整などの支援が行われる。審判により対象者が通院又は退院許可決定を受けると、地域社会における処遇の段階に入る。対象者の円滑な社会復帰を促進するためには、地域社会における「医療」「精神保健観察」「援助」が統一的な方針のもとで、適正に実施されることが非常に重要であり、それぞれを担う機関が互いの役割や組織の現状を理解し合いながら、医療観察法の理念を共有し連携協力して取り組むことが求められる
+def build_translate_text2spoken_filler_system_prompt(
+    examples: list, caution_examples: list, fillers: list = None
+) -> str:
+    """
+    指定した例文だけを含むフィラー付き口語変換のシステムプロンプトを作る。
 
-            ### TO
-            医療観察制度について、この後話す内容を参考にして要約してください。医療観察制度っていうのは、あぁ、心の問題で殺人や放火など重大なことをしちゃった人が、社会に戻るのを助ける制度だよ。専門の病院で治療を受けたり、地域で医療や生活のサポートを受けるんだ。スムーズに社会復帰するために、医療や支援が一つの方針で行われて、関係する機関が協力することが大事なんだ。
+    Args:
+        examples (list): <SAMPLES>に含める変換の例（TEXT2SPOKEN_FILLER_EXAMPLESの要素）
+        caution_examples (list): <COUTION/SAMPLE>に含める誤りの例（TEXT2SPOKEN_CAUTION_EXAMPLESの要素）
+        fillers (list, optional): 使用できるフィラー。デフォルトはランダムに選ぶ
 
+    Returns:
+        str: システムプロンプト
     """
+    fillers = fillers or sample_fillers()
+    return (
+        TEXT2SPOKEN_FILLER_INSTRUCTIONS
+        + format_caution_samples(caution_examples)
+        + f"    ### FILLER\n    {fillers}\n\n"
+        + format_filler_samples(examples)
+        + "    "
+    )
+
+
+def get_translate_text2spoken_filler_system_prompt() -> str:
+    return build_translate_text2spoken_filler_system_prompt(TEXT2SPOKEN_FILLER_EXAMPLES, TEXT2SPOKEN_CAUTION_EXAMPLES)
 
 
 translate_text2spoken_system_prompt = """
@@ -0,0 +1,74 @@
+import pytest
+
+from scripts.translation.compare_few_shot import count_fillers, ngram_f1
+from scripts.translation.few_shot import CharNgramTfidfIndex, FewShotSelector, char_ngrams, is_request
+from scripts.translation.prompts import (
+    TEXT2SPOKEN_CAUTION_EXAMPLES,
+    TEXT2SPOKEN_FILLER_EXAMPLES,
+    build_translate_text2spoken_filler_system_prompt,
+    get_translate_text2spoken_filler_system_prompt,
+)
+from scripts.translation.token_budget import TokenCounter
+
+
+def test_char_ngrams_normalizes_width_and_spaces():
+    assert char_ngrams("ＡＢ c") == char_ngrams("abc")
+    assert char_ngrams("a") == {}
+
+def test_index_ranks_similar_documents_first():
+    index = CharNgramTfidfIndex(["今日は良い天気です", "電車が混んでいます", "お風呂に入ります"])
+    (best, score), *_ = index.search("朝の電車は混んでいる")
+    assert best == 1 and score > 0
+    assert index.search("xyz", 1)[0][1] == 0
+
+def test_is_request():
+    assert is_request("紅白歌合戦について教えてください。")
+    assert is_request("何か良い方法はありますか？")
+    assert not is_request("お風呂に入るとリラックスできます。")
+
+def test_selector_respects_limits():
+    counter = TokenCounter()
+    selector = FewShotSelector(token_counter=counter, max_examples=2, token_cap=600)
+    for text in ["こんにちは", "通勤電車が混んでいて疲れます。", "お風呂の入り方を教えてください。"]:
+        examples, cautions = selector.select(text)
+        assert 1 <= len(examples) <= 2
+        assert len(cautions) <= 1
+        selected = [selector.example_tokens[TEXT2SPOKEN_FILLER_EXAMPLES.index(e)] for e in examples]
+        selected += [selector.caution_tokens[TEXT2SPOKEN_CAUTION_EXAMPLES.index(e)] for e in cautions]
+        assert sum(selected) <= 600 or len(selected) == 1
+
+def test_selector_adds_caution_for_requests_only():
+    selector = FewShotSelector()
+    assert selector.select("紅白歌合戦について教えてください。")[1]
+    assert not selector.select("お風呂に入るとリラックスできます。")[1]
+
+def test_retrieved_prompt_is_shorter_than_full_prompt():
+    counter = TokenCounter()
+    selector = FewShotSelector(token_counter=counter)
+    full = counter.count(get_translate_text2spoken_filler_system_prompt())
+    assert counter.count(selector.build_system_prompt("こんにちは")) < full / 2
+
+def test_full_prompt_contains_every_example():
+    fillers = ["えっと"]
+    prompt = build_translate_text2spoken_filler_system_prompt(
+        TEXT2SPOKEN_FILLER_EXAMPLES, TEXT2SPOKEN_CAUTION_EXAMPLES, fillers
+    )
+    for example in TEXT2SPOKEN_FILLER_EXAMPLES + TEXT2SPOKEN_CAUTION_EXAMPLES:
+        assert example["from"].strip() in prompt
+
+def test_quality_metrics():
+    assert ngram_f1("今日は良い天気", "今日は良い天気") == 1.0
+    assert ngram_f1("今日は良い天気", "xyz") == 0.0
+    assert count_fillers("あのー、まぁー、そうですね") == 2
+
+def test_counted_prompt_is_the_prompt_sent():
+    pytest.importorskip("langchain_openai")
+    from scripts.translation.translator import RetrievalTextToSpokenWithFillerTranslator
+
+    translator = RetrievalTextToSpokenWithFillerTranslator(api_key="test", model="gpt-4o-mini")
+    text = "お風呂の入り方を教えてください。"
+    # フィラーの候補は入力ごとに決まるため、数えたプロンプトと送るプロンプトが一致する
+    sent = {translator._prompt_inputs(text)["system_prompt"] for _ in range(10)}
+    assert len(sent) == 1
+    counts = {translator.count_prompt_tokens(text) for _ in range(10)}
+    assert counts == {translator._template_tokens + translator.token_counter.count(sent.pop())}
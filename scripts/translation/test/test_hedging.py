@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from scripts.translation.hedging import HedgePolicy
+
+
+def make_call(latencies, calls):
+    """呼ばれるたびにlatenciesの順に待ってから結果を返すリクエストを作る"""
+    async def call():
+        n = len(calls)
+        calls.append(n)
+        await asyncio.sleep(latencies[n])
+        return n
+    return call
+
+def warm_policy(**kwargs):
+    policy = HedgePolicy(min_samples=5, **kwargs)
+    for _ in range(5):
+        policy.observe(0.01)
+    return policy
+
+def test_no_hedge_until_enough_samples():
+    policy = HedgePolicy(min_samples=5)
+    calls = []
+    assert policy.threshold() is None
+    assert asyncio.run(policy.run(make_call([0.01], calls))) == 0
+    assert policy.stats()["hedged"] == 0 and len(policy._latencies) == 1
+
+def test_slow_request_is_hedged_and_loser_cancelled():
+    policy = warm_policy(budget=1.0)
+    calls = []
+    assert asyncio.run(policy.run(make_call([1.0, 0.01], calls))) == 1
+    stats = policy.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1 and stats["cancelled"] == 1
+
+def test_primary_can_still_win_after_hedge():
+    policy = warm_policy(budget=1.0)
+    calls = []
+    assert asyncio.run(policy.run(make_call([0.05, 1.0], calls))) == 0
+    stats = policy.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 0 and stats["cancelled"] == 1
+
+def test_budget_caps_hedges():
+    policy = warm_policy(budget=0.5)
+
+    async def run_all():
+        calls = []
+        latencies = [0.1] * 20
+        return await asyncio.gather(*[policy.run(make_call(latencies, calls)) for _ in range(4)])
+
+    asyncio.run(run_all())
+    assert policy.stats()["hedged"] <= 2
+
+def test_failed_primary_falls_back_to_hedge():
+    policy = warm_policy(budget=1.0)
+
+    async def run():
+        calls = []
+
+        async def call():
+            calls.append(None)
+            if len(calls) == 1:
+                await asyncio.sleep(0.05)
+                raise RuntimeError("primary failed")
+            await asyncio.sleep(0.1)
+            return "hedge"
+
+        return await policy.run(call)
+
+    assert asyncio.run(run()) == "hedge"
+
+def test_both_failures_raise():
+    policy = warm_policy(budget=1.0)
+
+    async def call():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(policy.run(call))
+    assert policy.stats()["failures"] == 1
+
+def test_invalid_percentile():
+    with pytest.raises(ValueError):
+        HedgePolicy(percentile=1.0)
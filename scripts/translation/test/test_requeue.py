@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+from scripts.translation import translator as translator_module
+from scripts.translation.translator import EnglishToJapaneseTranslator
+
+
+class FlakyTranslator(EnglishToJapaneseTranslator):
+    """指定した回数だけ失敗してから成功する翻訳器"""
+
+    def __init__(self, failures):
+        super().__init__(api_key="test", model="gpt-4o-mini")
+        self.failures = dict(failures)
+        self.calls = []
+
+    async def translate_with_error(self, text, is_retry=False):
+        self.calls.append(text)
+        if self.failures.get(text, 0) > 0:
+            self.failures[text] -= 1
+            return None, TimeoutError(text)
+        return text.upper(), None
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    real_sleep = asyncio.sleep
+
+    async def sleep(_):
+        await real_sleep(0)
+
+    monkeypatch.setattr(translator_module.asyncio, "sleep", sleep)
+
+
+def test_only_failed_items_are_requeued():
+    translator = FlakyTranslator({"b": 1})
+    results, errors = asyncio.run(translator.batch_translate_with_errors(["a", "b", "c"], max_size=2))
+    assert results == ["A", "B", "C"]
+    assert errors == [None, None, None]
+    assert translator.calls == ["a", "b", "c", "b"]
+
+def test_errors_are_returned_after_requeue():
+    translator = FlakyTranslator({"b": 5})
+    results, errors = asyncio.run(translator.batch_translate_with_errors(["a", "b"], max_size=10))
+    assert results == ["A", None]
+    assert errors[0] is None and isinstance(errors[1], TimeoutError)
+
+def test_none_inputs_are_skipped():
+    translator = FlakyTranslator({})
+    results, errors = asyncio.run(translator.batch_translate_with_errors([None, "a", ""], max_size=10))
+    assert results == [None, "A", None]
+    assert errors == [None, None, None]
+    assert translator.calls == ["a"]
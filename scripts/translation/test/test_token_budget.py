@@ -0,0 +1,41 @@
+import pytest
+
+from scripts.translation.prompts import get_translate_text2spoken_filler_system_prompt, translate_en2ja_system_prompt
+from scripts.translation.token_budget import TokenCounter, estimate_tokens_heuristic, plan_token_windows
+
+
+def test_heuristic_counts_ascii_and_japanese():
+    assert estimate_tokens_heuristic("") == 0
+    assert estimate_tokens_heuristic("abcd" * 10) == 10
+    assert estimate_tokens_heuristic("こんにちは") == 5
+    assert estimate_tokens_heuristic("hi こんにちは") == 1 + 5
+
+def test_counter_handles_empty_and_messages():
+    counter = TokenCounter()
+    assert counter.count(None) == 0
+    text = "The weather is nice today."
+    assert counter.count_messages([text, text]) == 2 * counter.count(text) + 2 * 4 + 3
+
+def test_system_prompts_dominate_short_inputs():
+    counter = TokenCounter()
+    filler = counter.count(get_translate_text2spoken_filler_system_prompt())
+    assert filler > counter.count(translate_en2ja_system_prompt) > counter.count("How are you?")
+
+@pytest.mark.parametrize("costs, budget, expected", [
+    ([10, 10, 10, 10], 25, [[0, 1], [2, 3]]),
+    ([5, 100, 5, 5], 50, [[0], [1], [2, 3]]),
+    ([], 50, []),
+    ([1] * 5, 100, [[0, 1, 2, 3, 4]]),
+])
+def test_plan_token_windows(costs, budget, expected):
+    assert plan_token_windows(costs, budget) == expected
+
+def test_plan_token_windows_max_items():
+    assert plan_token_windows([1] * 5, 100, max_items=2) == [[0, 1], [2, 3], [4]]
+
+def test_windows_respect_budget_and_order():
+    costs = [50, 1200, 30, 30, 900, 400, 10] * 20
+    windows = plan_token_windows(costs, 2000)
+    assert [i for window in windows for i in window] == list(range(len(costs)))
+    for window in windows:
+        assert len(window) == 1 or sum(costs[i] for i in window) <= 2000
@@ -0,0 +1,126 @@
+"""
+LLMのリクエストをトークン数の予算で分割するモジュール。
+
+件数（max_size）でバッチを分けると、短い質問10件と2,000文字の回答10件が同じ負荷として扱われ、
+TPM（1分あたりのトークン数）の上限を使い切れなかったり超えたりする。
+ここでは、システムプロンプトを含む入力トークンと、出力の予想トークンを1件ずつ数え、
+1つのウィンドウに含めるトークン数が予算を超えないように分割する。
+
+トークン数はtiktokenで数える。tiktokenが使えない場合は文字の種類から概算する。
+"""
+import math
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+# 1つのメッセージに加わるトークン数（ロールや区切り）
+MESSAGE_OVERHEAD_TOKENS = 4
+# リクエスト全体に加わるトークン数（応答の開始）
+REQUEST_OVERHEAD_TOKENS = 3
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # エンコーディングのファイルを取得できない環境では概算を使う
+        return None
+
+
+def estimate_tokens_heuristic(text: str) -> int:
+    """
+    tiktokenを使わずにトークン数を概算する。
+
+    英数字などのASCII文字は約4文字で1トークン、日本語などそれ以外の文字は1文字で約1トークンとして数える。
+    実際より多めになるため、予算を超えにくい。
+
+    Args:
+        text (str): テキスト
+
+    Returns:
+        int: 概算のトークン数
+    """
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+class TokenCounter:
+    """
+    テキストのトークン数を数えるクラス。
+
+    Attributes:
+        model (str): トークナイザーを選ぶためのモデル名
+        exact (bool): tiktokenで数えている場合はTrue、概算の場合はFalse
+    """
+
+    def __init__(self, model: str = "gpt-4o-mini"):
+        """
+        Args:
+            model (str, optional): 使用する言語モデル。デフォルトは "gpt-4o-mini"
+        """
+        self.model = model
+        self._encoding = _get_encoding(model)
+        self.exact = self._encoding is not None
+
+    def count(self, text: Optional[str]) -> int:
+        """
+        テキストのトークン数を数える。
+
+        Args:
+            text (str): テキスト。Noneの場合は0
+
+        Returns:
+            int: トークン数
+        """
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return estimate_tokens_heuristic(text)
+
+    def count_messages(self, messages: Sequence[str]) -> int:
+        """
+        チャット形式のリクエストの入力トークン数を数える。
+
+        Args:
+            messages (Sequence[str]): 各メッセージの本文
+
+        Returns:
+            int: メッセージの区切りを含む入力トークン数
+        """
+        return sum(self.count(message) + MESSAGE_OVERHEAD_TOKENS for message in messages) + REQUEST_OVERHEAD_TOKENS
+
+
+def plan_token_windows(costs: Sequence[int], budget: float, max_items: Optional[int] = None) -> List[List[int]]:
+    """
+    入力の順序を保ったまま、トークン数の合計が予算を超えないようにウィンドウに分ける。
+
+    1件で予算を超える項目は、その項目だけのウィンドウにする。
+
+    Args:
+        costs (Sequence[int]): 各項目のトークン数
+        budget (float): 1つのウィンドウのトークン数の上限
+        max_items (int, optional): 1つのウィンドウの最大件数。デフォルトは制限なし
+
+    Returns:
+        List[List[int]]: ウィンドウごとの項目の番号
+    """
+    windows: List[List[int]] = []
+    current: List[int] = []
+    total = 0
+    for index, cost in enumerate(costs):
+        full = max_items is not None and len(current) >= max_items
+        if current and (total + cost > budget or full):
+            windows.append(current)
+            current, total = [], 0
+        current.append(index)
+        total += cost
+    if current:
+        windows.append(current)
+    return windows
@@ -1,6 +1,11 @@
 import asyncio
 import json
-from typing import List, Optional
+import math
+import os
+import random
+import time
+import zlib
+from typing import List, Optional, Tuple
 from abc import ABC, abstractmethod
 
 from langchain_core.output_parsers import StrOutputParser
@@ -12,8 +17,12 @@ from .prompts import (
     translate_en2ja_system_prompt,
     translate_text2spoken_prompt, 
     translate_text2spoken_system_prompt, 
-    get_translate_text2spoken_filler_system_prompt
+    get_translate_text2spoken_filler_system_prompt,
+    sample_fillers
 )
+from .few_shot import FewShotSelector
+from .hedging import HedgePolicy
+from .token_budget import TokenCounter, plan_token_windows
 
 
 class BaseTranslator(ABC):
@@ -24,19 +33,32 @@ class BaseTranslator(ABC):
         llm (ChatOpenAI): 言語モデルのインスタンス
         prompt (ChatPromptTemplate): 翻訳用のプロンプトテンプレート
         input_variable_name (str): 翻訳時に使用する入力変数名
+        tokens_per_minute (Optional[int]): 1分あたりのトークン数の上限。指定した場合はトークン数でバッチを分割します
+        completion_ratio (float): 入力テキストのトークン数に対する、出力の予想トークン数の比率
+        hedge (Optional[HedgePolicy]): 指定した場合、遅いリクエストをヘッジします
     """
 
-    def __init__(self, api_key: str, model: str):
+    completion_ratio = 1.5
+
+    def __init__(
+        self, api_key: str, model: str, tokens_per_minute: Optional[int] = None, hedge: Optional[HedgePolicy] = None
+    ):
         """
         BaseTranslatorを初期化します。
 
         Args:
             api_key (str): OpenAI APIキー
             model (str): 使用する言語モデル
+            tokens_per_minute (Optional[int]): 1分あたりのトークン数の上限（デフォルト: None）
+            hedge (Optional[HedgePolicy]): 遅いリクエストをヘッジする設定（デフォルト: None）
         """
         self.llm = ChatOpenAI(model=model, temperature=0, openai_api_key=api_key)
         self.prompt = self._create_prompt()
         self.input_variable_name = self._get_input_variable_name()
+        self.tokens_per_minute = tokens_per_minute
+        self.token_counter = TokenCounter(model)
+        self._prompt_tokens = None
+        self.hedge = hedge
 
     @abstractmethod
     def _create_prompt(self) -> ChatPromptTemplate:
@@ -62,6 +84,9 @@ class BaseTranslator(ABC):
         """
         単一のテキストを翻訳します。
 
+        hedgeを指定した場合、学習したレイテンシのパーセンタイルを過ぎても終わらないリクエストは
+        同じリクエストをもう1つ送り、先に終わった方の結果を使います。
+
         Args:
             text (str): 翻訳するテキスト
             is_retry (bool): リトライ試行かどうか
@@ -69,42 +94,177 @@ class BaseTranslator(ABC):
         Returns:
             Optional[str]: 翻訳されたテキスト、失敗時はNone
         """
+        result, _ = await self.translate_with_error(text, is_retry)
+        return result
+
+    async def translate_with_error(self, text: str, is_retry: bool = False) -> Tuple[Optional[str], Optional[Exception]]:
+        """
+        単一のテキストを翻訳し、失敗した場合は最後の例外も返します。
+
+        Args:
+            text (str): 翻訳するテキスト
+            is_retry (bool): リトライ試行かどうか
+
+        Returns:
+            Tuple[Optional[str], Optional[Exception]]: 翻訳されたテキストと例外。成功時の例外、失敗時のテキストはNone
+        """
         try:
             chain = self.prompt | self.llm | StrOutputParser()
-            result = await chain.ainvoke({self.input_variable_name: text})
-            return result
+            inputs = self._prompt_inputs(text)
+            if self.hedge is not None:
+                return await self.hedge.run(lambda: chain.ainvoke(inputs)), None
+            result = await chain.ainvoke(inputs)
+            return result, None
         except Exception as e:
             import traceback
             traceback.print_exc()
             if is_retry:
-                return None
+                return None, e
             else:
-                return await self.translate(text, is_retry=True)
+                return await self.translate_with_error(text, is_retry=True)
 
-    async def batch_translate(self, texts: List[str], max_size: int) -> List[Optional[str]]:
+    def _prompt_inputs(self, text: str) -> dict:
+        """
+        プロンプトテンプレートに渡す値を返します。
+
+        Args:
+            text (str): 翻訳するテキスト
+
+        Returns:
+            dict: プロンプトテンプレートの変数と値
+        """
+        return {self.input_variable_name: text}
+
+    def count_prompt_tokens(self, text: str) -> int:
+        """
+        入力テキストを除いたプロンプト（システムプロンプトとテンプレート）のトークン数を数えます。
+
+        Args:
+            text (str): 翻訳するテキスト
+
+        Returns:
+            int: プロンプトのトークン数
+        """
+        if self._prompt_tokens is None:
+            # テンプレートのトークン数は一度だけ数える
+            messages = self.prompt.format_messages(**{self.input_variable_name: ""})
+            self._prompt_tokens = self.token_counter.count_messages([message.content for message in messages])
+        return self._prompt_tokens
+
+    def estimate_tokens(self, text: str) -> int:
+        """
+        1件のリクエストで消費するトークン数を見積もります。
+
+        システムプロンプトとユーザープロンプトのテンプレート、入力テキスト、出力の予想トークン数の合計です。
+
+        Args:
+            text (str): 翻訳するテキスト
+
+        Returns:
+            int: 見積もったトークン数
+        """
+        text_tokens = self.token_counter.count(text)
+        return self.count_prompt_tokens(text) + text_tokens + math.ceil(text_tokens * self.completion_ratio)
+
+    async def batch_translate(
+        self,
+        texts: List[str],
+        max_size: int,
+        tokens_per_minute: Optional[int] = None,
+        window_seconds: float = 10.0,
+    ) -> List[Optional[str]]:
         """
         複数のテキストを並列で翻訳します。ただし、指定されたmax_sizeごとにバッチを分割し、
         各バッチ内は並列、バッチ間は直列に処理します。
 
+        tokens_per_minuteを指定した場合（またはTranslatorの初期化時に指定した場合）は、件数ではなく
+        トークン数でバッチを分割します。window_seconds秒ごとに、1分あたりの上限のwindow_seconds/60を
+        超えない範囲でできるだけ多くのテキストを送るため、TPMの上限に近いスループットになります。
+        このときmax_sizeは使用しません。
+
         Args:
             texts (List[str]): 翻訳するテキストのリスト
             max_size (int): 一度に処理するテキストの最大数
+            tokens_per_minute (Optional[int]): 1分あたりのトークン数の上限（デフォルト: None）
+            window_seconds (float): トークン数で分割する場合の、1つのバッチの間隔（秒）（デフォルト: 10.0）
 
         Returns:
             List[Optional[str]]: 翻訳されたテキストのリスト
         """
-        results = []
-        # テキストをmax_sizeごとに分割
-        for i in range(0, len(texts), max_size):
-            batch = texts[i:i + max_size]
-            tasks = [self.translate(text) for text in batch]
+        results, _ = await self.batch_translate_with_errors(texts, max_size, tokens_per_minute, window_seconds)
+        return results
+
+    async def batch_translate_with_errors(
+        self,
+        texts: List[Optional[str]],
+        max_size: int,
+        tokens_per_minute: Optional[int] = None,
+        window_seconds: float = 10.0,
+        requeue: bool = True,
+    ) -> Tuple[List[Optional[str]], List[Optional[Exception]]]:
+        """
+        batch_translateと同じように翻訳し、失敗したテキストの例外も返します。
+
+        Noneや空のテキスト（前の段階で失敗した行など）は送らず、結果も例外もNoneのままにします。
+        requeue=Trueの場合、失敗したテキストだけを最後にもう一度翻訳します。バッチ全体はやり直しません。
+
+        Args:
+            texts (List[Optional[str]]): 翻訳するテキストのリスト
+            max_size (int): 一度に処理するテキストの最大数
+            tokens_per_minute (Optional[int]): 1分あたりのトークン数の上限（デフォルト: None）
+            window_seconds (float): トークン数で分割する場合の、1つのバッチの間隔（秒）（デフォルト: 10.0）
+            requeue (bool): Trueの場合、失敗したテキストを最後にもう一度翻訳します（デフォルト: True）
+
+        Returns:
+            Tuple[List[Optional[str]], List[Optional[Exception]]]: 翻訳されたテキストのリストと、各テキストの例外のリスト
+        """
+        results = [None] * len(texts)
+        errors = [None] * len(texts)
+        indices = [i for i, text in enumerate(texts) if text]
+        await self._run_batches(texts, indices, results, errors, max_size, tokens_per_minute, window_seconds)
+
+        failed = [i for i in indices if errors[i] is not None]
+        if requeue and failed:
+            print(f"失敗した{len(failed)}件を再翻訳します。")
+            await self._run_batches(texts, failed, results, errors, max_size, tokens_per_minute, window_seconds)
+        return results, errors
+
+    async def _run_batches(
+        self,
+        texts: List[str],
+        indices: List[int],
+        results: List[Optional[str]],
+        errors: List[Optional[Exception]],
+        max_size: int,
+        tokens_per_minute: Optional[int],
+        window_seconds: float,
+    ):
+        """
+        indicesのテキストをバッチに分割して翻訳し、結果と例外をresultsとerrorsに書き込みます。
+        """
+        tokens_per_minute = tokens_per_minute or self.tokens_per_minute
+        if tokens_per_minute:
+            budget = tokens_per_minute * window_seconds / 60
+            windows = plan_token_windows([self.estimate_tokens(texts[i]) for i in indices], budget)
+            batches = [[indices[j] for j in window] for window in windows]
+        else:
+            # テキストをmax_sizeごとに分割
+            batches = [indices[i:i + max_size] for i in range(0, len(indices), max_size)]
+
+        for n, batch in enumerate(batches):
+            start = time.monotonic()
+            tasks = [self.translate_with_error(texts[i]) for i in batch]
             # バッチ内は並列に実行
             batch_results = await asyncio.gather(*tasks)
-            results.extend(batch_results)
+            for i, (result, error) in zip(batch, batch_results):
+                results[i] = result
+                errors[i] = error
 
-            await asyncio.sleep(10)
-        
-        return results
+            if not tokens_per_minute:
+                await asyncio.sleep(10)
+            elif n < len(batches) - 1:
+                # 次のバッチまでの残りの時間だけ待つ
+                await asyncio.sleep(max(window_seconds - (time.monotonic() - start), 0))
 
 class EnglishToJapaneseTranslator(BaseTranslator):
     """英語から日本語への翻訳を行うクラス"""
@@ -124,6 +284,8 @@ class EnglishToJapaneseTranslator(BaseTranslator):
 class TextToSpokenTranslator(BaseTranslator):
     """書き言葉を話し言葉スタイルに変換するクラス"""
 
+    completion_ratio = 1.2
+
     def _create_prompt(self) -> ChatPromptTemplate:
         """書き言葉から話し言葉への変換用ChatPromptTemplateを作成します。"""
         return ChatPromptTemplate.from_messages([
@@ -139,6 +301,9 @@ class TextToSpokenTranslator(BaseTranslator):
 class TextToSpokenWithFillerTranslator(BaseTranslator):
     """フィラーを含む口語スタイルへの翻訳を行うクラス"""
 
+    # フィラーの分だけ出力が長くなる
+    completion_ratio = 1.6
+
     def _create_prompt(self) -> ChatPromptTemplate:
         """フィラーを含む口語翻訳用のChatPromptTemplateを作成します。"""
         return ChatPromptTemplate.from_messages([
@@ -151,6 +316,63 @@ class TextToSpokenWithFillerTranslator(BaseTranslator):
         return "written_text"
 
 
+class RetrievalTextToSpokenWithFillerTranslator(TextToSpokenWithFillerTranslator):
+    """
+    フィラーを含む口語スタイルへの翻訳を、入力に近い例文だけを含むシステムプロンプトで行うクラス
+
+    すべての例文を埋め込む代わりに、例文のライブラリから文字n-gramのTF-IDFで近いものを
+    トークン数の上限まで選ぶため、短い入力の入力トークン数と最初のトークンまでの時間が減ります。
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        tokens_per_minute: Optional[int] = None,
+        hedge: Optional[HedgePolicy] = None,
+        selector: Optional[FewShotSelector] = None,
+    ):
+        """
+        Args:
+            api_key (str): OpenAI APIキー
+            model (str): 使用する言語モデル
+            tokens_per_minute (Optional[int]): 1分あたりのトークン数の上限（デフォルト: None）
+            hedge (Optional[HedgePolicy]): 遅いリクエストをヘッジする設定（デフォルト: None）
+            selector (Optional[FewShotSelector]): 例文を選ぶクラス（デフォルト: 2件・600トークンまで）
+        """
+        super().__init__(api_key, model, tokens_per_minute, hedge)
+        self.selector = selector or FewShotSelector(token_counter=self.token_counter)
+        self._template_tokens = None
+
+    def _create_prompt(self) -> ChatPromptTemplate:
+        """システムプロンプトを入力ごとに差し込むChatPromptTemplateを作成します。"""
+        return ChatPromptTemplate.from_messages([
+            ("system", "{system_prompt}"),
+            ("user", translate_text2spoken_prompt)
+        ])
+
+    def _system_prompt(self, text: str) -> str:
+        """
+        入力に近い例文を選んだシステムプロンプトを作ります。
+
+        フィラーの候補は入力テキストから決まる乱数で選ぶため、count_prompt_tokensで数えるプロンプトと
+        実際に送るプロンプトは同じになります。
+        """
+        rng = random.Random(zlib.crc32(text.encode("utf-8")))
+        return self.selector.build_system_prompt(text, sample_fillers(rng))
+
+    def _prompt_inputs(self, text: str) -> dict:
+        """入力に近い例文を選んだシステムプロンプトと入力テキストを返します。"""
+        return {"system_prompt": self._system_prompt(text), self.input_variable_name: text}
+
+    def count_prompt_tokens(self, text: str) -> int:
+        """入力ごとに選んだシステムプロンプトとテンプレートのトークン数を数えます。"""
+        if self._template_tokens is None:
+            messages = self.prompt.format_messages(system_prompt="", **{self.input_variable_name: ""})
+            self._template_tokens = self.token_counter.count_messages([message.content for message in messages])
+        return self._template_tokens + self.token_counter.count(self._system_prompt(text))
+
+
 class Translator:
     """
     メイン翻訳クラス：異なるタイプの翻訳器をカプセル化します。
@@ -161,17 +383,56 @@ class Translator:
         text2spoken_with_filler_translator (TextToSpokenWithFillerTranslator): フィラー付き口語変換器
     """
 
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        tokens_per_minute: Optional[int] = None,
+        retrieve_examples: bool = False,
+        hedge_percentile: Optional[float] = None,
+        hedge_budget: float = 0.05,
+    ):
         """
         Translatorを初期化し、各種翻訳器を設定します。
 
         Args:
             api_key (str): OpenAI APIキー
             model (str): 使用する言語モデル（デフォルト: "gpt-4o-mini")
+            tokens_per_minute (Optional[int]): 1分あたりのトークン数の上限。指定した場合、バッチ翻訳は件数ではなく
+                トークン数でバッチを分割します（デフォルト: None）
+            retrieve_examples (bool): Trueの場合、フィラー付き口語変換では入力に近い例文だけを
+                システムプロンプトに含めます（デフォルト: False）
+            hedge_percentile (Optional[float]): 指定した場合、レイテンシがこのパーセンタイル（例: 0.95）を
+                過ぎても終わらないリクエストをヘッジします。レイテンシの分布は翻訳器ごとに学習します（デフォルト: None）
+            hedge_budget (float): ヘッジできるリクエストの割合の上限（デフォルト: 0.05）
         """
-        self.en2ja_translator = EnglishToJapaneseTranslator(api_key, model)
-        self.text2spoken_translator = TextToSpokenTranslator(api_key, model)
-        self.text2spoken_with_filler_translator = TextToSpokenWithFillerTranslator(api_key, model)
+        def make_hedge():
+            return HedgePolicy(hedge_percentile, hedge_budget) if hedge_percentile else None
+
+        self.en2ja_translator = EnglishToJapaneseTranslator(api_key, model, tokens_per_minute, make_hedge())
+        self.text2spoken_translator = TextToSpokenTranslator(api_key, model, tokens_per_minute, make_hedge())
+        filler_translator_class = (
+            RetrievalTextToSpokenWithFillerTranslator if retrieve_examples else TextToSpokenWithFillerTranslator
+        )
+        self.text2spoken_with_filler_translator = filler_translator_class(
+            api_key, model, tokens_per_minute, make_hedge()
+        )
+
+    def get_hedge_stats(self) -> dict:
+        """
+        翻訳器ごとのヘッジの結果を返します。
+
+        Returns:
+            dict: 翻訳器の名前とHedgePolicy.statsの結果。ヘッジしない場合は空の辞書
+        """
+        translators = {
+            "en2ja": self.en2ja_translator,
+            "text2spoken": self.text2spoken_translator,
+            "text2spoken_with_filler": self.text2spoken_with_filler_translator,
+        }
+        return {
+            name: translator.hedge.stats() for name, translator in translators.items() if translator.hedge is not None
+        }
 
     async def translate_en2ja(self, english_text: str) -> Optional[str]:
         """
@@ -273,4 +534,20 @@ class JSONWriter:
         with open(filename, "w", encoding="utf-8") as f:
             json.dump(existing_data, f, ensure_ascii=False, indent=4)
 
-        print("JSONファイルへの書き込みが完了しました")
\ No newline at end of file
+        print("JSONファイルへの書き込みが完了しました")
+
+    @staticmethod
+    def replace_json(data: list, filename: str):
+        """
+        データでJSONファイルを置き換える。write_to_jsonと違い、既存のデータには追記しない。
+
+        一時ファイルに書き込んでから置き換えるため、途中で止まっても元のファイルは壊れない。
+
+        Args:
+            data (list): 書き込むデータ
+            filename (str): 出力するJSONファイルの名前
+        """
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_filename, filename)
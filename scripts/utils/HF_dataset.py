@@ -2,32 +2,69 @@ import os
 import asyncio
 import json
 import torch
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 from dotenv import load_dotenv  
-from datasets import Dataset, load_dataset
+from datasets import Audio, Dataset, load_dataset
+
+from scripts.utils.json_stream import iter_json_records
+
+# 翻訳だけを行う場合に必要な列（音声の列は読み込まない）
+TEXT_COLUMNS = ["split_name", "question", "answer"]
+
+
 class DatasetModule:
     """データセットの処理を行うクラス。"""
 
     @staticmethod
-    def load_dataset(dataset_name: str, split: str = "train") -> Dataset:
+    def load_dataset(
+        dataset_name: str, split: str = "train", columns: Optional[List[str]] = None, decode_audio: bool = True
+    ) -> Dataset:
         """
         指定されたデータセットを読み込む。
 
         Args:
             dataset_name (str): 読み込むデータセットの名前
             split (str, optional): データセットのスプリット。デフォルトは"train"
+            columns (List[str], optional): 使用する列。指定した場合は他の列を取り除く（音声の列も含む）
+            decode_audio (bool, optional): Falseの場合、音声の列をデコードせずにバイト列とパスのまま返す
 
         Returns:
             Dataset: 読み込まれたデータセット
         """
-        return load_dataset(dataset_name, split=split)
+        dataset = load_dataset(dataset_name, split=split)
+        return DatasetModule.project_dataset(dataset, columns, decode_audio)
+
+    @staticmethod
+    def project_dataset(dataset: Dataset, columns: Optional[List[str]] = None, decode_audio: bool = True) -> Dataset:
+        """
+        データセットの列を絞り込む。どちらの処理もメモリマップされたArrowのテーブルをコピーしない。
+
+        Args:
+            dataset (Dataset): 対象のデータセット
+            columns (List[str], optional): 残す列。デフォルトはすべての列
+            decode_audio (bool, optional): Falseの場合、音声の列をデコードしないようにする
+
+        Returns:
+            Dataset: 列を絞り込んだデータセット
+        """
+        if columns is not None:
+            dataset = dataset.select_columns(list(columns))
+        if not decode_audio:
+            for name, feature in dataset.features.items():
+                if isinstance(feature, Audio) and feature.decode:
+                    dataset = dataset.cast_column(
+                        name, Audio(sampling_rate=feature.sampling_rate, mono=feature.mono, decode=False)
+                    )
+        return dataset
 
     @staticmethod
     def filter_dataset(dataset: Dataset, split_name: str) -> Dataset:
         """
         データセットをフィルタリングする。
 
+        "split_name" の列だけを読み込んで判定するため、音声の列はデコードされない。
+
         Args:
             dataset (Dataset): フィルタリングするデータセット
             split_name (str): フィルタリングに使用するsplit_name
@@ -35,48 +72,104 @@ class DatasetModule:
         Returns:
             Dataset: フィルタリングされたデータセット
         """
-        return dataset.filter(lambda example: example["split_name"] == split_name)
+        return dataset.filter(
+            lambda names: [name == split_name for name in names], input_columns="split_name", batched=True
+        )
+
+    @staticmethod
+    def iter_column(dataset: Dataset, column: str, batch_size: int = 1000) -> Iterator:
+        """
+        データセットの1つの列を、batch_size行ずつArrowのテーブルから読み出しながら1行ずつ返す。
+
+        Args:
+            dataset (Dataset): 対象のデータセット
+            column (str): 列の名前
+            batch_size (int, optional): 一度に読み出す行数。デフォルトは1000
+
+        Returns:
+            Iterator: 列の値のイテレーター
+        """
+        for batch in dataset.select_columns([column]).iter(batch_size=batch_size):
+            yield from batch[column]
 
     @staticmethod
-    def extract_questions(dataset: Dataset) -> List[str]:
+    def _extract(dataset, column: str, lazy: bool):
+        # dataset[1200:1500] のようにスライスした結果（列ごとのリストの辞書）も受け付ける
+        if isinstance(dataset, dict):
+            return iter(dataset[column]) if lazy else dataset[column]
+        if lazy:
+            return DatasetModule.iter_column(dataset, column)
+        return dataset.select_columns([column])[column]
+
+    @staticmethod
+    def extract_questions(dataset: Dataset, lazy: bool = False) -> List[str]:
         """
         データセットから質問テキストを抽出する。
 
         Args:
             dataset (Dataset): 質問を抽出するデータセット
+            lazy (bool, optional): Trueの場合、リストを作らずにイテレーターを返す
 
         Returns:
             List[str]: 抽出された質問のリスト
         """
-        return dataset["question"]
+        return DatasetModule._extract(dataset, "question", lazy)
     
     @staticmethod
-    def extract_snac_tokens(dataset: Dataset) -> List[torch.Tensor]:
+    def extract_snac_tokens(dataset: Dataset, lazy: bool = False) -> List[torch.Tensor]:
         """
         データセットからSNACトークンを抽出する。
 
         Args:
             dataset (Dataset): SNACトークンを抽出するデータセット
+            lazy (bool, optional): Trueの場合、リストを作らずにイテレーターを返す
 
         Returns:
             List[str]: 抽出されたSNACトークンのリスト
         """
-        return dataset["answer_snac"]
+        return DatasetModule._extract(dataset, "answer_snac", lazy)
     
     @staticmethod
-    def extract_answers(dataset: Dataset) -> List[torch.Tensor]:
+    def extract_answers(dataset: Dataset, lazy: bool = False) -> List[torch.Tensor]:
         """
         データセットから回答テキストを抽出する。
 
         Args:
             dataset (Dataset): SNACトークンを抽出するデータセット
+            lazy (bool, optional): Trueの場合、リストを作らずにイテレーターを返す
 
         Returns:
             List[str]: 抽出されたSNACトークンのリスト
         """
-        return dataset["answer"]
+        return DatasetModule._extract(dataset, "answer", lazy)
     
-    def load_text_from_json(self, filename: str) -> List[str]:
-        with open(filename, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data  # List[str]として返す
\ No newline at end of file
+    def load_text_from_json(self, filename: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """
+        JSON配列またはJSONLのファイルからテキストを読み込む。
+
+        Args:
+            filename (str): 読み込むファイル
+            start (int, optional): 読み始める行番号。デフォルトは0
+            stop (int, optional): この行番号の手前で読み終える。デフォルトは最後まで
+
+        Returns:
+            List[str]: 読み込まれたテキストのリスト
+        """
+        return list(self.iter_text_from_json(filename, start, stop))
+
+    @staticmethod
+    def iter_text_from_json(filename: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """
+        JSON配列またはJSONLのファイルからテキストを1行ずつ読み込む。ファイル全体をメモリに載せない。
+
+        start行目からの読み込みは、サイドカーのインデックス（`<filename>.idx`）でシークする（scripts/utils/json_stream.py）。
+
+        Args:
+            filename (str): 読み込むファイル
+            start (int, optional): 読み始める行番号。デフォルトは0
+            stop (int, optional): この行番号の手前で読み終える。デフォルトは最後まで
+
+        Returns:
+            Iterator[str]: テキストのイテレーター
+        """
+        return iter_json_records(filename, start, stop)
\ No newline at end of file
@@ -0,0 +1,62 @@
+from functools import lru_cache
+from typing import Union
+
+import numpy as np
+import torch
+import torchaudio
+
+
+@lru_cache(maxsize=16)
+def get_resampler(orig_freq: int, new_freq: int, device: str = "cpu") -> torchaudio.transforms.Resample:
+    """
+    サンプリングレート変換用のResamplerを取得する。
+
+    Resampleは初期化時に補間カーネルを計算するため、同じ変換元・変換先・デバイスの
+    組み合わせではインスタンスを使い回す。
+
+    Args:
+        orig_freq (int): 変換元のサンプリングレート
+        new_freq (int): 変換先のサンプリングレート
+        device (str, optional): カーネルを配置するデバイス。デフォルトは"cpu"
+
+    Returns:
+        torchaudio.transforms.Resample: キャッシュされたResampler
+    """
+    return torchaudio.transforms.Resample(orig_freq=orig_freq, new_freq=new_freq).to(device)
+
+
+def prepare_snac_input(
+    waveform: Union[np.ndarray, torch.Tensor],
+    sample_rate: int,
+    target_sample_rate: int,
+    device: torch.device,
+) -> torch.Tensor:
+    """
+    波形をSNACモデルの入力形式 (1, 1, T) に変換する。
+
+    チャンネル数が2以上の場合は平均を取ってモノラルに変換し、
+    サンプリングレートが異なる場合はキャッシュされたResamplerで変換する。
+
+    Args:
+        waveform (Union[np.ndarray, torch.Tensor]): 形状が (T,) または (C, T) の波形
+        sample_rate (int): 入力波形のサンプリングレート
+        target_sample_rate (int): モデルが期待するサンプリングレート
+        device (torch.device): 出力テンソルを配置するデバイス
+
+    Returns:
+        torch.Tensor: 形状が (1, 1, T') のfloat32テンソル
+    """
+    if isinstance(waveform, np.ndarray):
+        waveform = torch.from_numpy(np.ascontiguousarray(waveform))
+    waveform = waveform.to(device=device, dtype=torch.float32)
+
+    if waveform.dim() == 1:
+        waveform = waveform.unsqueeze(0)
+    if waveform.size(0) > 1:
+        waveform = waveform.mean(dim=0, keepdim=True)
+
+    if sample_rate != target_sample_rate:
+        resampler = get_resampler(sample_rate, target_sample_rate, str(device))
+        waveform = resampler(waveform)
+
+    return waveform.unsqueeze(0)
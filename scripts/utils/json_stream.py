@@ -0,0 +1,271 @@
+"""
+大きなJSON配列・JSONLファイルを1行ずつ読み込むモジュール。
+
+json.loadのようにファイル全体をメモリに載せず、少しずつ読み込んでパースする。
+各行の先頭のバイト位置をサイドカーのインデックスファイル（`<ファイル名>.idx`）に保存しておくと、
+途中の行から読み始める場合に、それより前の行をパースせずにシークできる。
+
+- JSON配列: `[ "a", "b", ... ]`（JSONWriter.write_to_jsonの出力）
+- JSONL: 1行に1つのJSON値
+"""
+import codecs
+import json
+import os
+import struct
+from typing import Iterator, List, Optional
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"JSONIDX1"
+# マジック、元のファイルのサイズ、更新時刻（ns）、行数
+_INDEX_HEADER = struct.Struct("<8sqqq")
+_OFFSET = struct.Struct("<q")
+
+_WHITESPACE = " \t\r\n"
+_CHUNK_SIZE = 1 << 16
+
+
+def detect_format(filename: str) -> str:
+    """
+    ファイルの形式を判定する。
+
+    Args:
+        filename (str): JSON配列またはJSONLのファイル
+
+    Returns:
+        str: 最初の空白以外の文字が "[" であれば "array"、それ以外は "jsonl"
+    """
+    with open(filename, "rb") as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                return "jsonl"
+            stripped = chunk.lstrip(b" \t\r\n\xef\xbb\xbf")
+            if stripped:
+                return "array" if stripped[:1] == b"[" else "jsonl"
+
+
+def _iter_jsonl(f, offset: int) -> Iterator[tuple]:
+    f.seek(offset)
+    position = offset
+    for line in f:
+        start = position
+        position += len(line)
+        if line.strip():
+            yield start, json.loads(line)
+
+
+def _iter_array(f, offset: Optional[int]) -> Iterator[tuple]:
+    """
+    JSON配列の要素を (先頭のバイト位置, 値) の形で1つずつ返す。
+    offsetがNoneの場合はファイルの先頭（"[" の前）から、それ以外は要素の先頭から読み始める。
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    position = offset or 0  # bufferの先頭のバイト位置
+    f.seek(position)
+    if offset is None:
+        # BOMは読み飛ばし、各要素の位置はBOMを含むファイルの先頭からのバイト数にする
+        if f.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+            position = len(codecs.BOM_UTF8)
+        else:
+            f.seek(0)
+    buffer = ""
+    eof = False
+    opened = offset is not None
+
+    def consume(n: int):
+        nonlocal buffer, position
+        position += len(buffer[:n].encode("utf-8"))
+        buffer = buffer[n:]
+
+    def fill() -> bool:
+        nonlocal buffer, eof
+        if eof:
+            return False
+        chunk = f.read(_CHUNK_SIZE)
+        eof = not chunk
+        buffer += text_decoder.decode(chunk, final=eof)
+        return not eof
+
+    while True:
+        # 要素の間の空白とカンマを読み飛ばす
+        stripped = buffer.lstrip(_WHITESPACE + ("," if opened else ""))
+        consume(len(buffer) - len(stripped))
+        if not buffer:
+            if fill():
+                continue
+            raise ValueError("JSON配列が途中で終わっています。")
+
+        if not opened:
+            if buffer[0] != "[":
+                raise ValueError("JSON配列ではありません。")
+            consume(1)
+            opened = True
+            continue
+        if buffer[0] == "]":
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if fill():
+                continue
+            raise
+        # 数値などはバッファの末尾で途切れている可能性があるため、続きを読んでからパースし直す
+        if end == len(buffer) and fill():
+            continue
+
+        yield position, value
+        consume(end)
+
+
+def _read_index_header(index_path: str, filename: str) -> Optional[int]:
+    """インデックスが元のファイルと一致していれば行数を返す。"""
+    try:
+        with open(index_path, "rb") as f:
+            header = f.read(_INDEX_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != _INDEX_HEADER.size:
+        return None
+    magic, size, mtime_ns, count = _INDEX_HEADER.unpack(header)
+    stat = os.stat(filename)
+    if magic != INDEX_MAGIC or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None
+    return count
+
+
+def build_offset_index(filename: str, index_path: Optional[str] = None) -> int:
+    """
+    各行の先頭のバイト位置をサイドカーのインデックスファイルに書き出す。
+
+    インデックスには元のファイルのサイズと更新時刻を記録し、ファイルが変更された場合は作り直す。
+
+    Args:
+        filename (str): JSON配列またはJSONLのファイル
+        index_path (str, optional): インデックスファイルのパス。デフォルトは `<filename>.idx`
+
+    Returns:
+        int: 行数
+    """
+    index_path = index_path or filename + INDEX_SUFFIX
+    stat = os.stat(filename)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+
+    count = 0
+    with open(filename, "rb") as src, open(tmp_path, "wb") as dst:
+        dst.write(_INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, 0))
+        records = _iter_array(src, None) if detect_format(filename) == "array" else _iter_jsonl(src, 0)
+        for offset, _ in records:
+            dst.write(_OFFSET.pack(offset))
+            count += 1
+        dst.seek(0)
+        dst.write(_INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, count))
+    os.replace(tmp_path, index_path)
+    return count
+
+
+def _ensure_index(filename: str, index_path: str) -> Optional[int]:
+    count = _read_index_header(index_path, filename)
+    if count is None:
+        try:
+            count = build_offset_index(filename, index_path)
+        except OSError:
+            # 書き込みできない場所ではインデックスを使わない
+            return None
+    return count
+
+
+def count_records(filename: str, use_index: bool = True) -> int:
+    """
+    ファイルの行数を返す。インデックスがあれば値をパースせずに返す。
+
+    Args:
+        filename (str): JSON配列またはJSONLのファイル
+        use_index (bool, optional): Trueの場合、インデックスを使う（なければ作成する）
+
+    Returns:
+        int: 行数
+    """
+    if use_index:
+        count = _ensure_index(filename, filename + INDEX_SUFFIX)
+        if count is not None:
+            return count
+    return sum(1 for _ in iter_json_records(filename, use_index=False))
+
+
+def iter_json_records(
+    filename: str, start: int = 0, stop: Optional[int] = None, use_index: bool = True
+) -> Iterator:
+    """
+    JSON配列またはJSONLのファイルを1行ずつ読み込む。
+
+    startが0より大きい場合、インデックス（なければ作成する）でstart行目の先頭にシークする。
+    インデックスの作成には1度だけファイル全体を読む必要があるが、2回目以降はどの行からでもすぐに読み始められる。
+
+    Args:
+        filename (str): JSON配列またはJSONLのファイル
+        start (int, optional): 読み始める行番号。デフォルトは0
+        stop (int, optional): この行番号の手前で読み終える。デフォルトは最後まで
+        use_index (bool, optional): Trueの場合、シークにインデックスを使う
+
+    Yields:
+        各行の値
+    """
+    if stop is not None and stop <= start:
+        return
+    is_array = detect_format(filename) == "array"
+
+    offset = None
+    skip = start
+    if start > 0 and use_index:
+        index_path = filename + INDEX_SUFFIX
+        count = _ensure_index(filename, index_path)
+        if count is not None:
+            if start >= count:
+                return
+            with open(index_path, "rb") as f:
+                f.seek(_INDEX_HEADER.size + start * _OFFSET.size)
+                (offset,) = _OFFSET.unpack(f.read(_OFFSET.size))
+            skip = 0
+
+    remaining = None if stop is None else stop - start
+    with open(filename, "rb") as f:
+        if is_array:
+            records = _iter_array(f, offset)
+        else:
+            records = _iter_jsonl(f, offset or 0)
+        for _, value in records:
+            if skip:
+                skip -= 1
+                continue
+            yield value
+            if remaining is not None:
+                remaining -= 1
+                if remaining <= 0:
+                    return
+
+
+def iter_json_batches(
+    filename: str, batch_size: int, start: int = 0, stop: Optional[int] = None
+) -> Iterator[List]:
+    """
+    iter_json_recordsの結果をbatch_size行ずつのリストにまとめて返す。
+
+    Args:
+        filename (str): JSON配列またはJSONLのファイル
+        batch_size (int): 1つのリストの行数
+        start (int, optional): 読み始める行番号。デフォルトは0
+        stop (int, optional): この行番号の手前で読み終える。デフォルトは最後まで
+
+    Yields:
+        List: 最大batch_size行のリスト
+    """
+    batch = []
+    for value in iter_json_records(filename, start, stop):
+        batch.append(value)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -6,6 +6,7 @@
 
 
 
+import math
 import torch
 import time
 import numpy as np
@@ -20,6 +21,17 @@ class SnacConfig:
 snac_config = SnacConfig()    
 
 
+# Order of the codes inside one frame, as column indices into the per-frame
+# concatenation [layer1 | layer2 | layer3 (| layer4)].
+SNAC_FRAME_ORDERS = {
+    # 24kHz: t1, t2[0], t3[0], t3[1], t2[1], t3[2], t3[3]
+    7: np.array([0, 1, 3, 4, 2, 5, 6]),
+    # 44kHz: t1, t2[0], t3[0], t4[0], t4[1], t3[1], t4[2], t4[3],
+    #        t2[1], t3[2], t4[4], t4[5], t3[3], t4[6], t4[7]
+    15: np.array([0, 1, 3, 7, 8, 4, 9, 10, 2, 5, 11, 12, 6, 13, 14]),
+}
+
+
 def get_time_str():
     time_str = time.strftime("%Y%m%d_%H%M%S", time.localtime())
     return time_str
@@ -29,6 +41,48 @@ def layershift(input_id, layer, stride=4160, shift=152000):
     return input_id + shift + layer * stride
 
 
+def get_pad_multiple(snacmodel):
+    """Number of samples the model pads its input to a multiple of (see SNAC.preprocess)."""
+    lcm = math.lcm(snacmodel.vq_strides[0], snacmodel.attn_window_size or 1)
+    return int(snacmodel.hop_length) * lcm
+
+
+def get_code_lengths(num_samples, snacmodel):
+    """Number of codes per layer that SNAC.encode returns for a clip of num_samples."""
+    pad_to = get_pad_multiple(snacmodel)
+    latent_frames = math.ceil(num_samples / pad_to) * pad_to // int(snacmodel.hop_length)
+    return [latent_frames // stride for stride in snacmodel.vq_strides]
+
+
+def interleave_codes(codes):
+    """
+    Interleaves the per-layer SNAC codes into one row per coarse frame.
+
+    Returns an integer array of shape (frames, 7) for the 3-layer (24kHz) model
+    or (frames, 15) for the 4-layer (44kHz) model.
+    """
+    layers = []
+    for code in codes:
+        if isinstance(code, torch.Tensor):
+            code = code.detach().cpu().numpy()
+        code = np.asarray(code)
+        layers.append(code[0] if code.ndim == 2 else code)
+
+    n_frames = len(layers[0])
+    per_frame = [len(layer) // n_frames for layer in layers]
+    frames = np.concatenate(
+        [layer[: n_frames * n].reshape(n_frames, n) for layer, n in zip(layers, per_frame)], axis=1
+    )
+    return frames[:, SNAC_FRAME_ORDERS[frames.shape[1]]]
+
+
+def render_snac_tokens(frames):
+    """Renders interleaved frames as the '#'-separated string used in the dataset."""
+    # One %-format over the whole array is much cheaper than str() per value
+    frame_format = " ".join(["#"] + ["%d"] * frames.shape[1])
+    return " ".join([frame_format] * frames.shape[0]) % tuple(frames.ravel().tolist())
+
+
 def generate_audio_data(snac_tokens, snacmodel, device=None):
     audio = reconstruct_tensors(snac_tokens, device)
     #print("output_tensor", audio)
@@ -61,96 +115,80 @@ def reconstruct_snac(output_list):
     return output
 
 
+def parse_snac_codes(flattened_output):
+    """
+    Parses SNAC tokens into an integer array with one row per frame.
+
+    Accepts the '#'-delimited string, the list returned by str.split (also as a
+    1-D array of strings), or an already interleaved (frames, 7 | 15) array.
+    Tokens before the first '#' and a trailing incomplete frame are dropped.
+
+    Raises ValueError if the input has no '#' or is otherwise malformed.
+    """
+    if isinstance(flattened_output, np.ndarray):
+        if flattened_output.ndim == 2:
+            return flattened_output.astype(np.int64, copy=False)
+        if flattened_output.ndim != 1 or flattened_output.dtype.kind not in "USO":
+            # A flat array of codes has no frame boundaries to split on
+            raise ValueError(f"Expected tokens or a (frames, n) array, got shape {flattened_output.shape}")
+        flattened_output = flattened_output.tolist()
+
+    if isinstance(flattened_output, str):
+        flattened_output = flattened_output.split()
+
+    try:
+        first_index = flattened_output.index("#")
+    except ValueError:
+        raise ValueError("List does not contain the symbol '#'")
+    tokens = flattened_output[first_index:]
+
+    try:
+        n_tensors = tokens.index("#", 1) - 1
+    except ValueError:
+        # A single frame
+        n_tensors = len(tokens) - 1
+
+    n_frames = len(tokens) // (n_tensors + 1)
+    table = np.array(tokens[: n_frames * (n_tensors + 1)], dtype=str).reshape(n_frames, n_tensors + 1)
+    if not (table[:, 0] == "#").all():
+        raise ValueError("Frames are not all the same length")
+    return table[:, 1:].astype(np.int64)
+
+
+def deinterleave_frames(frames):
+    """Splits (frames, 7 | 15) interleaved codes back into the per-layer arrays."""
+    order = SNAC_FRAME_ORDERS[frames.shape[1]]
+    concatenated = np.empty_like(frames)
+    concatenated[:, order] = frames
+
+    layers = []
+    start = 0
+    per_frame = 1
+    while start < frames.shape[1]:
+        layers.append(concatenated[:, start:start + per_frame].reshape(-1))
+        start += per_frame
+        per_frame *= 2
+    return layers
+
+
 def reconstruct_tensors(flattened_output, device=None):
-    """Reconstructs the list of tensors from the flattened output."""
+    """
+    Reconstructs the list of tensors from the flattened output.
+
+    Raises ValueError for malformed input instead of returning an empty clip,
+    so callers can tell a bad row from a short one.
+    """
 
     if device is None:
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-    def count_elements_between_hashes(lst):
-        try:
-            # Find the index of the first '#'
-            first_index = lst.index("#")
-            # Find the index of the second '#' after the first
-            second_index = lst.index("#", first_index + 1)
-            # Count the elements between the two indices
-            return second_index - first_index - 1
-        
-        except ValueError:
-            # Handle the case where there aren't enough '#' symbols
-            return "List does not contain two '#' symbols"
-
-    def remove_elements_before_hash(flattened_list):
-        try:
-            # Find the index of the first '#'
-            first_hash_index = flattened_list.index("#")
-            # Return the list starting from the first '#'
-            return flattened_list[first_hash_index:]
-
-        except ValueError:
-            # Handle the case where there is no '#'
-            return "List does not contain the symbol '#'"
-
-    def list_to_torch_tensor(tensor1):
-        # Convert the list to a torch tensor
-        tensor = torch.tensor(tensor1)
-        # Reshape the tensor to have size (1, n)
-        tensor = tensor.unsqueeze(0)
-        return tensor
-
-    flattened_output = remove_elements_before_hash(flattened_output)
-    codes = []
-    tensor1 = []
-    tensor2 = []
-    tensor3 = []
-    tensor4 = []
-
-    n_tensors = count_elements_between_hashes(flattened_output)
-    if n_tensors == 7:
-        for i in range(0, len(flattened_output), 8):
-
-            tensor1.append(int(flattened_output[i + 1]))
-            tensor2.append(int(flattened_output[i + 2]))
-            tensor3.append(int(flattened_output[i + 3]))
-            tensor3.append(int(flattened_output[i + 4]))
-
-            tensor2.append(int(flattened_output[i + 5]))
-            tensor3.append(int(flattened_output[i + 6]))
-            tensor3.append(int(flattened_output[i + 7]))
-            codes = [
-                list_to_torch_tensor(tensor1).to(device),
-                list_to_torch_tensor(tensor2).to(device),
-                list_to_torch_tensor(tensor3).to(device),
-            ]
-
-    if n_tensors == 15:
-        for i in range(0, len(flattened_output), 16):
-
-            tensor1.append(int(flattened_output[i + 1]))
-            tensor2.append(int(flattened_output[i + 2]))
-            tensor3.append(int(flattened_output[i + 3]))
-            tensor4.append(int(flattened_output[i + 4]))
-            tensor4.append(int(flattened_output[i + 5]))
-            tensor3.append(int(flattened_output[i + 6]))
-            tensor4.append(int(flattened_output[i + 7]))
-            tensor4.append(int(flattened_output[i + 8]))
-
-            tensor2.append(int(flattened_output[i + 9]))
-            tensor3.append(int(flattened_output[i + 10]))
-            tensor4.append(int(flattened_output[i + 11]))
-            tensor4.append(int(flattened_output[i + 12]))
-            tensor3.append(int(flattened_output[i + 13]))
-            tensor4.append(int(flattened_output[i + 14]))
-            tensor4.append(int(flattened_output[i + 15]))
-
-            codes = [
-                list_to_torch_tensor(tensor1).to(device),
-                list_to_torch_tensor(tensor2).to(device),
-                list_to_torch_tensor(tensor3).to(device),
-                list_to_torch_tensor(tensor4).to(device),
-            ]
-
-    return codes
+    frames = parse_snac_codes(flattened_output)
+
+    # Only the 7-token (24kHz) and 15-token (44kHz) layouts are supported
+    if frames.shape[1] not in SNAC_FRAME_ORDERS:
+        raise ValueError(f"Unsupported SNAC frame layout: {frames.shape[1]} tokens per frame")
+
+    return [torch.from_numpy(layer).unsqueeze(0).to(device) for layer in deinterleave_frames(frames)]
 
 def log_device_info(device):
     print(f"Using device: {device}")
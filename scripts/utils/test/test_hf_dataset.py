@@ -0,0 +1,62 @@
+import io
+
+import numpy as np
+import pytest
+
+datasets = pytest.importorskip("datasets")
+sf = pytest.importorskip("soundfile")
+
+from scripts.utils.HF_dataset import TEXT_COLUMNS, DatasetModule
+
+
+def wav_bytes(seconds=0.1, sample_rate=16000):
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(int(seconds * sample_rate), dtype=np.float32), sample_rate, format="WAV")
+    return buffer.getvalue()
+
+@pytest.fixture
+def dataset():
+    n = 10
+    data = {
+        "split_name": ["identity" if i % 2 == 0 else "other" for i in range(n)],
+        "question": [f"question {i}" for i in range(n)],
+        "question_audio": [{"bytes": wav_bytes(), "path": f"q{i}.wav"} for i in range(n)],
+        "answer": [f"answer {i}" for i in range(n)],
+        "answer_snac": [f"# {i} #" for i in range(n)],
+    }
+    features = datasets.Features({
+        "split_name": datasets.Value("string"),
+        "question": datasets.Value("string"),
+        "question_audio": datasets.Audio(sampling_rate=16000),
+        "answer": datasets.Value("string"),
+        "answer_snac": datasets.Value("string"),
+    })
+    return datasets.Dataset.from_dict(data, features=features)
+
+def test_project_columns(dataset):
+    projected = DatasetModule.project_dataset(dataset, TEXT_COLUMNS)
+    assert projected.column_names == TEXT_COLUMNS
+
+def test_audio_is_not_decoded(dataset):
+    projected = DatasetModule.project_dataset(dataset, decode_audio=False)
+    audio = projected[0]["question_audio"]
+    assert audio["path"] == "q0.wav"
+    assert isinstance(audio["bytes"], bytes)
+
+def test_filter_and_lazy_extraction(dataset):
+    filtered = DatasetModule.filter_dataset(DatasetModule.project_dataset(dataset, TEXT_COLUMNS), "identity")
+    expected = [f"question {i}" for i in range(0, 10, 2)]
+    assert DatasetModule.extract_questions(filtered) == expected
+
+    lazy = DatasetModule.extract_questions(filtered, lazy=True)
+    assert not isinstance(lazy, list)
+    assert list(lazy) == expected
+    assert list(DatasetModule.iter_column(filtered, "answer", batch_size=2)) == [f"answer {i}" for i in range(0, 10, 2)]
+
+def test_filter_does_not_read_audio(dataset):
+    # 音声の列を含むデータセットでも、split_nameの列だけで判定する
+    assert len(DatasetModule.filter_dataset(dataset, "other")) == 5
+
+def test_extract_from_slice(dataset):
+    projected = DatasetModule.project_dataset(dataset, TEXT_COLUMNS)
+    assert DatasetModule.extract_answers(projected[2:4]) == ["answer 2", "answer 3"]
@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+from scripts.utils.json_stream import (
+    INDEX_SUFFIX,
+    build_offset_index,
+    count_records,
+    detect_format,
+    iter_json_batches,
+    iter_json_records,
+)
+
+
+ROWS = ["こんにちは", None, "数値の後: 12", {"text": "辞書, カンマ [括弧]"}, 1234567, "", ["a", "b"], "最後の行"]
+
+
+@pytest.fixture(params=["array", "jsonl"])
+def rows_file(request, tmp_path):
+    path = tmp_path / f"rows.{request.param}"
+    with open(path, "w", encoding="utf-8") as f:
+        if request.param == "array":
+            json.dump(ROWS, f, ensure_ascii=False, indent=4)
+        else:
+            for row in ROWS:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return str(path), request.param
+
+def test_iter_matches_json_load(rows_file):
+    path, fmt = rows_file
+    assert detect_format(path) == fmt
+    assert list(iter_json_records(path, use_index=False)) == ROWS
+    assert not os.path.exists(path + INDEX_SUFFIX)
+
+@pytest.mark.parametrize("start, stop", [(0, 3), (3, None), (5, 7), (7, 100), (8, None), (4, 4)])
+def test_seek_with_index(rows_file, start, stop):
+    path, _ = rows_file
+    assert list(iter_json_records(path, start, stop)) == ROWS[start:stop]
+    # 途中から読み始める場合だけインデックスを作成する
+    assert os.path.exists(path + INDEX_SUFFIX) == (0 < start < (stop or len(ROWS) + 1))
+    # インデックスを使わない場合と同じ結果になる
+    assert list(iter_json_records(path, start, stop, use_index=False)) == ROWS[start:stop]
+
+def test_index_is_rebuilt_when_file_changes(rows_file):
+    path, fmt = rows_file
+    assert build_offset_index(path) == len(ROWS)
+    rows = ROWS + ["追加した行"]
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "array":
+            json.dump(rows, f, ensure_ascii=False)
+        else:
+            f.write("\n".join(json.dumps(row, ensure_ascii=False) for row in rows))
+    assert count_records(path) == len(rows)
+    assert list(iter_json_records(path, 7)) == rows[7:]
+
+def test_long_records_across_chunks(tmp_path):
+    rows = ["あ" * 50000, list(range(30000)), 3.14159, "い" * 70001]
+    path = tmp_path / "long.json"
+    path.write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+    assert list(iter_json_records(str(path), use_index=False)) == rows
+    assert list(iter_json_records(str(path), 2)) == rows[2:]
+
+def test_batches(rows_file):
+    path, _ = rows_file
+    batches = list(iter_json_batches(path, 3, start=1))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert sum(batches, []) == ROWS[1:]
+
+def test_truncated_array_raises(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text('["a", "b"', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_records(str(path)))
+
+@pytest.mark.parametrize("fmt", ["array", "jsonl"])
+def test_utf8_bom(tmp_path, fmt):
+    path = tmp_path / f"bom.{fmt}"
+    if fmt == "array":
+        # 空白がないと、位置が3バイトずれた場合に要素の途中から読んでしまう
+        text = json.dumps(ROWS, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = "\n".join(json.dumps(row, ensure_ascii=False) for row in ROWS)
+    path.write_text(text, encoding="utf-8-sig")
+    assert detect_format(str(path)) == fmt
+    assert list(iter_json_records(str(path), use_index=False)) == ROWS
+    # インデックスの位置はBOMを含むファイルの先頭からのバイト数
+    assert list(iter_json_records(str(path), 1)) == ROWS[1:]